@@ -1,9 +1,19 @@
-from os import path
+from os import path, makedirs
 from flask import Flask
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     app.config['SECRET_KEY'] = 'my cat ate my homework'
+    app.config['JOBS_DATABASE'] = path.join(app.instance_path, 'jobs.sqlite3')
+    app.config['STORAGE_BACKEND'] = 'sqlite' # or 'memory', e.g. for tests
+    app.config['STORAGE_DATABASE'] = path.join(app.instance_path, 'workspaces.sqlite3')
+    app.config['TRACE_DIRECTORY'] = path.join(app.instance_path, 'traces') # or None, to not trace the completion jobs
+    app.config['TRACE_LEVEL'] = 'info' # 'debug', 'info' or 'warning'
+    app.config['JOB_PROCESSES'] = 1 # worker processes of every completion job, 1 to run it in its thread
+    app.config.update(config or {})
+    makedirs(app.instance_path, exist_ok=True)
+    if app.config['TRACE_DIRECTORY']:
+        makedirs(app.config['TRACE_DIRECTORY'], exist_ok=True)
 
     from .views import views
 
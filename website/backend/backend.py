@@ -1,11 +1,24 @@
-from typing import Optional, List
-from flask import flash
+import time
+from typing import Optional, List, Dict, Callable, Union
 from .variables import *
 from .functions import *
 from .node import Node
 from .representation_changes import *
 from .substitutions import *
 from .database import *
+from .term import *
+from .positions import Position, Positions, GetSubterm, ReplaceSubterm, PositionToString, StringToPosition, ToPosition, ListPositions, GetPositionFromListIndex, GetSubtermAtPosition, ReplaceSubtermAtPosition
+from .exceptions import *
+from .signature import Signature, GetSignature
+from .rules import CompiledRule, CompileRule, ApplyVariableSubstitution
+from .unification import Unify, UnifyAll, MostGeneralUnifier, UnificationError
+from .critical_pairs import CriticalPairQueue, GetNewRuleCombinations, FIFO, SMALLEST_FIRST, HEURISTICS
+from .discrimination_tree import DiscriminationTree
+from .normalize import Normalizer, Normalize, NormalizeMany, NormalFormCache, INNERMOST
+from .parallel import OverlapPool, NormalizerPool, GetOverlapPool
+from .orderings import Precedence, ReductionOrdering, LexicographicPathOrder, KnuthBendixOrder, LoadOrdering, ORDERINGS, GREATER, LESS, EQUAL, INCOMPARABLE
+from .trace import Tracer, GetTracer, DEBUG, INFO, WARNING
+from .profiling import Profiled, RecordCache, ORDERING, CRITICAL_PAIRS, NORMALIZATION
 
 
 def CountArguments(function_str: str) -> int:
@@ -145,8 +158,7 @@ def PrintTree(head: Node, spacing: int = 2, current_level: int = 0) -> str:
         node, level, node_pos = stack.pop()
 
         if node == None:
-            flash("ERROR: Could not create tree.", category="error")
-            return
+            raise ParseError("Could not create tree.")
         
         tree_repr += (' ' * (spacing + 1) * (level - 1) + ('+' + '-' * spacing) * (level > 0) + node.value) + \
                         (f" ({node_pos})" if node != head else "") + '\n'
@@ -162,318 +174,56 @@ def PrintTree(head: Node, spacing: int = 2, current_level: int = 0) -> str:
     return tree_repr
 
 
-def GetPositionFromListIndex(term: List, index: int) -> str:
+@Profiled(ORDERING)
+def LexicographicPathOrdering(term1: List, term2: List, precedence: Optional[Precedence] = None,
+                              signature: Optional[Signature] = None) -> int:
     """
-    This function takes in an index from the term (imagine it as one long non-nested list)
-    and returns the position of the element taking into consideration our nested list encoding.
+    This function compares two terms in the lexicographic path ordering.
 
     Args:
-        term (List): list representing a term
-        index (int): the index of the subterm we'd like to get 
+        term1 (List): list representing the first term
+        term2 (List): list representing the second term
+        precedence (Optional[Precedence]): the precedence of the function symbols.
+                                            If None, the precedence of {signature} is used
+        signature (Optional[Signature]): the functions and variables of our language
 
     Returns:
-        str: position of the subterm you'd like to get (in format "{number}_{number}_{number}").
-                If you want to get the root, position is = ""
+        int: returns 1 if term1 > term2, 0 if they are equal and -1 otherwise
     """
-    position = ""
-    
-    if index == 0:
-        return position
-    
-    term = term[1:]
-    if len(term) == 1:
-        term = term[0]
-    
-    while index != 0:
-        curr_position = 0
-        for item in term:
-            if type(item) == list:
-                flatList = FlattenList(item)
-                
-                if len(flatList) < index:
-                    index -= len(flatList)
-                else:
-                    position += f"_{str(curr_position)}"
-                    term = item
-                    break
-            else:
-                curr_position += 1
-                index -= 1
-                
-                if index == 0:
-                    position += f"_{str(curr_position)}"
-                    break
+    signature = GetSignature(signature)
+    if precedence is None:
+        precedence = Precedence(signature.precedences)
     
-    return position[1:] # Skip the first character, which will always be _
-
-
-def GetSubtermAtPosition(term: List, position: str = "") -> List:
-    """
-    This function takes in a position from the term and returns the subterm from
-    that position onward.
-
-    Args:
-        term (List): list representing a term
-        position (str): position of the subterm you'd like to get (in format "{number}_{number}_{number}").
-                        If you want to get the root, position is = ""
-
-    Returns:
-        List: returns the list of lists or [] if there's an error
-    """
-    if position == "":
-        return term
+    comparison = LexicographicPathOrder(precedence).Compare(ListToTerm(term1, signature.variables),
+                                                            ListToTerm(term2, signature.variables))
     
-    indeces = position.split("_")
+    if comparison == GREATER:
+        return 1
     
-    for index in indeces:
-        if len(term) == 1:
-            flash(f"Couldn't find element at position {position}. Stopped at {index}.", category="error")
-            return []
-        
-        index = int(index)
-        term_args = term[1]
-
-        subterms = []
-        i = 0
-        while i < len(term_args):
-            if i + 1 == len(term_args): # last element
-                subterms.append([term_args[i]])
-                i += 1
-            elif type(term_args[i + 1]) == list: # this is a function
-                subterms.append([term_args[i], term_args[i + 1]])
-                i += 2
-            else: # this is a variable (or a constant function)
-                subterms.append([term_args[i]])
-                i += 1
-
-        if index > len(subterms):
-            flash(f"ERROR: There are not enough subterms for index {index}!", category="error")
-            return []
-        
-        term = subterms[index - 1]
-        
-    return term
-
-
-def ReplaceSubtermAtPosition(original_term: List, replacement_term: List, position: str = "") -> List:
-    """
-    This function takes in a position from {original_term} and returns a new term created from replacing
-    everything from {position} in {original_term} with {replacement_term}.
-    This function does NOT modify {original_term} outside of its scope.
+    if comparison == EQUAL:
+        return 0
     
-    Args:
-        original_term (List): list representing a term which will be built on top of
-        replacement_term (List): list representing a term which will replace a subterm from {original_term}
-        position (str): position of the subterm you'd like to get (in format "{number}_{number}_{number}").
-                        If you want to get the root, position is = ""
+    return -1
 
-    Returns:
-        List: returns the new term after replacement
+# Critical Pair functions
+def GetAllFunctionPositions(term: List, signature: Optional[Signature] = None) -> List[Position]:
     """
-    if position == "":
-        return replacement_term
-    
-    indeces = position.split("_")
-    
-    head = ChangeListToTree(original_term)
-    
-    # f(f(f(x', y'), z'), z)
-    # f(f(x', y'), f(z', z))
-    # 1
-    
-    curr_node = head
-    for i in range(0, len(indeces)):
-        index = int(indeces[i]) - 1
-        if curr_node.next != None:
-            curr_node = curr_node.next[index] # f(f(x', y'))
-        else:
-            flash(f"ERROR: Cannot replace subterm at index {index + 1}! The position {position} doesn't exist.", category="error")
-            return []
-    
-    curr_node.previous.next[int(indeces[-1]) - 1] = ChangeListToTree(replacement_term)
-    
-    new_term = ChangeTreeToList(head)
-    
-    return new_term
-
+    This function returns the positions of {term} where a function symbol is found, in one traversal.
 
-def IsTermGround(term: List) -> bool:
-    """
-    This function takes in a term and checks if it is ground (there are no variables).
-    
     Args:
         term (List): list representing a term
+        signature (Optional[Signature]): the functions and variables of our language
 
     Returns:
-        bool: returns True if term is ground
+        List[Position]: the positions, in pre-order (the root first)
     """
-    variables = LoadVariables()
-    
-    if len(variables) == 0:
-        return True # there are no variables in our language, so of course this is ground
-    
-    stack = [term]
-    while stack:
-        curr_term = stack.pop()
-        value = curr_term[0]
-        
-        if value in variables:
-            return False # found a variable, quit.
-        
-        if len(curr_term) > 1:
-            stack.append(curr_term[1]) # append the next children for checking in the stack
-        
-        for i in range(2, len(curr_term), 2):
-            if i + 1 != len(curr_term):
-                if type(curr_term[i + 1]) == list:
-                    stack.append([curr_term[i], curr_term[i + 1]]) # append the siblings and their children for checking in the stack
-            else:
-                stack.append([curr_term[i]])
-    
-    return True # passed all checks, this is ground
-
-
-def TermIsVariable(term : List) -> bool:
-    variables = LoadVariables()
-    
-    if len(term) == 1 and term[0] in variables:
-        return True
-    
-    return False
-
-
-def LexicographicPathOrdering(term1: List, term2: List) -> int:
-    # s = term1
-    # t = term2
-    # print(f"Term 1 = {term1}, Term2 = {term2}")
-    if term1 == term2:
-        return 0
-    
-    flat_term1 = FlattenList(term1)
-    
-    # print("In LPO1")
-    # LPO1
-    if TermIsVariable(term2):
-        if term2[0] in flat_term1:
-            return 1
-        else:
-            return -1
-    
-    if TermIsVariable(term1):
-        return -1
-        
-    # print("In LPO2a")
-    # LPO2
-    # LPO2a)
-    precedences = {"i": 2, "f": 1, "e": 0}
-    subterms1 = []
-    i = 0
-    if len(term1) == 1: # constant function
-        return -1
-    
-    term1_args = term1[1]
-    while i < len(term1_args):
-        if i + 1 == len(term1_args): # last element
-            subterms1.append([term1_args[i]])
-            i += 1
-        elif type(term1_args[i + 1]) == list: # this is a function
-            subterms1.append([term1_args[i], term1_args[i + 1]])
-            i += 2
-        else: # this is a variable
-            subterms1.append([term1_args[i]])
-            i += 1
-    
-    # print(f"Subterms of term 1: {subterms1}")
-
-    for subterm in subterms1:
-        value = LexicographicPathOrdering(subterm, term2)
-        if value == 0 or value == 1:
-            return 1
-    
-    # print("In LPO2b")
-    # LPO2b)
-    subterms2 = []
-    i = 0
-    if len(term2) == 1: # constant function
-        if precedences[term1[0]] > precedences[term2[0]]:
-            return 1
-        else:
-            return -1
-    
-    term2_args = term2[1]
-    while i < len(term2_args):
-        if i + 1 == len(term2_args): # last element
-            subterms2.append([term2_args[i]])
-            i += 1
-        elif type(term2_args[i + 1]) == list: # this is a function
-            subterms2.append([term2_args[i], term2_args[i + 1]])
-            i += 2
-        else: # this is a variable (or a constant function)
-            subterms2.append([term2_args[i]])
-            i += 1
-    
-    # print(f"Subterms of term 2: {subterms2}")
-    
-    if precedences[term1[0]] > precedences[term2[0]]:
-        found = False
-        for subterm in subterms2:
-            if LexicographicPathOrdering(term1, subterm) == -1:
-                found = True
-                break
-        
-        if not found:
-            return 1
-            
-    # print("In LPO2c")
-    # LPO2c)
-    if precedences[term1[0]] == precedences[term2[0]]:
-        for subterm in subterms2:
-            if LexicographicPathOrdering(term1, subterm) == -1:
-                return -1
-        
-        for i in range(len(subterms1)):
-            value = LexicographicPathOrdering(subterms1[i], subterms2[i])
-            if value == 0:
-                continue
-        
-            if value == 1:
-                return 1
-            
-            if value == -1:
-                return -1
-    
-    return -1
-
-# Critical Pair functions
-def GetAllFunctionPositions(term: List) -> List[str]:
-    if TermIsVariable(term):
-        return []
-    
-    positions = []
-    
-    flatTerm = FlattenList(term)
-    functions = LoadFunctions()
+    functions = GetSignature(signature).functions
     
-    for i in range(len(flatTerm)):
-        if flatTerm[i] in functions.keys():
-            positions.append(GetPositionFromListIndex(term, i))
-    
-    return positions
-
+    return [position for position, subterm in ListPositions(term) if subterm[0] in functions]
 
-def GetUniqueVariables(term: List) -> List:
-    variables = []
-    
-    term = FlattenList(term)
-    for subterm in term:
-        if TermIsVariable([subterm]):
-            if subterm not in variables:
-                variables.append(subterm)
-    
-    return variables
 
-
-def ReplaceCoincidingVariables(vars1: List, vars2: List, term: List, rule: Tuple[str, str]) -> Tuple[List, Tuple[str, str]]:
+def ReplaceCoincidingVariables(vars1: List, vars2: List, term: List, rule: Tuple[str, str],
+                               signature: Optional[Signature] = None) -> Tuple[List, Tuple[str, str]]:
     nonuniqueVars = []
     for var in vars1:
         if var in vars2:
@@ -481,7 +231,7 @@ def ReplaceCoincidingVariables(vars1: List, vars2: List, term: List, rule: Tuple
     
     varRules = {}
         
-    variables = LoadVariables()
+    signature = GetSignature(signature)
     flatTerm = FlattenList(term)
 
     for var in nonuniqueVars:
@@ -490,20 +240,20 @@ def ReplaceCoincidingVariables(vars1: List, vars2: List, term: List, rule: Tuple
             newVarName += "'"
         
         varRules[var] = newVarName
-        if newVarName not in variables:
-            AddVariable(newVarName, False)
+        signature.AddVariable(newVarName)
     
-    newTerm = ChangeTreeToList(ChangeListToTree(term))
-    newSubstitutionInput = ChangeTreeToList(CreateTree(rule[0]))
-    newSubstitutionOutput = ChangeTreeToList(CreateTree(rule[1]))
+    newTerm = term
+    compiledRule = CompileRule(rule, signature)
+    newSubstitutionInput = TermToList(compiledRule.lhs)
+    newSubstitutionOutput = TermToList(compiledRule.rhs)
     
     for key, value in varRules.items():
-        newTerm = ApplySubstitutionRecursive((key, value), newTerm)
-        inputRes = ApplySubstitutionRecursive((key, value), newSubstitutionInput)
+        newTerm = ApplySubstitutionRecursive((key, value), newTerm, signature)
+        inputRes = ApplySubstitutionRecursive((key, value), newSubstitutionInput, signature)
         if inputRes != None:
             newSubstitutionInput = inputRes
             
-        outputRes = ApplySubstitutionRecursive((key, value), newSubstitutionOutput)
+        outputRes = ApplySubstitutionRecursive((key, value), newSubstitutionOutput, signature)
         if outputRes != None:
             newSubstitutionOutput = outputRes
             
@@ -513,87 +263,43 @@ def ReplaceCoincidingVariables(vars1: List, vars2: List, term: List, rule: Tuple
     return(newTerm, newSubstitution)
 
 
-def GetCriticalPair(term1: List, term2: List, rule1: Tuple[str, str], rule2: Tuple[str, str], position: str) -> Tuple[List, List]:
-    # find most general unifier between {term1} at position {position} and {term2}
-    rules = {}
-    
-    subterm1 = GetSubtermAtPosition(term1, position)
-    functionArity = LoadFunctions()[subterm1[0]]
-    for i in range(functionArity):
-        lhs = CreateInputStringFromTree(ChangeListToTree(GetSubtermAtPosition(subterm1, f"{i + 1}")))
-        rhs = CreateInputStringFromTree(ChangeListToTree(GetSubtermAtPosition(term2, f"{i + 1}")))
-        
-        if lhs in rules.keys():
-            rules[lhs].append(rhs)
-        else:
-            rules[lhs] = [rhs]
-        
-    # print(f"Before unification: {rules}")
-    
-    rules = Unification(rules)
-    
-    # print(f"After unification: {rules}")
-    
-    for lhs in rules.keys():
-        for rhs in rules[lhs]:
-            result = ApplySubstitutionRecursive((lhs, rhs), term1)
-            if result != None:
-                term1 = result
-    
-    # print(f"Term1 after applying all rules: {term1}")
-    
-    subterm1AfterUnification = GetSubtermAtPosition(term1, position)
+def GetCriticalPair(term1: List, term2: List, rule1: Tuple[str, str], rule2: Tuple[str, str], position: Union[Position, str],
+                    signature: Optional[Signature] = None) -> Tuple[List, List]:
+    """
+    This function computes the critical pair obtained by overlapping the left-hand side of {rule2} ({term2})
+    with the subterm of the left-hand side of {rule1} ({term1}) at {position}. The two rules must not share variables.
 
-    critPair1Res = [ApplySubstitution(rule1, term1)]
-    critPair2Res = [ApplySubstitution(rule2, subterm1AfterUnification)]
-    
-    # critPair1Res = []
-    # critPair2Res = []
-    
-    # functionPositions = GetAllFunctionPositions(term1)
-    
-    # for functionPosition in functionPositions:
-    #     subterm = GetSubtermAtPosition(term1, functionPosition)
-    #     if subterm[0] != term2[0]:
-    #         continue
-        
-    #     critPair1Res.append(ApplySubstitution(rule1, subterm))
-    #     critPair2Res.append(ApplySubstitution(rule2, subterm))
-    
-    # print(f"CritPair1Res = {critPair1Res}")
-    # print(f"CritPair2Res = {critPair2Res}")
+    Args:
+        term1 (List): left-hand side of {rule1}
+        term2 (List): left-hand side of {rule2}
+        rule1 (Tuple[str, str]): the rule applied at the root
+        rule2 (Tuple[str, str]): the rule applied at {position}
+        position (Union[Position, str]): position in {term1}, e.g. (2, 1) or, as the UI shows it, "2_1"
+        signature (Optional[Signature]): the functions and variables of our language
+
+    Returns:
+        Tuple[List, List]: returns the two sides of the critical pair or (None, None) if the terms don't unify
+
+    Raises:
+        PositionError: if {position} doesn't exist in {term1}
+    """
+    signature = GetSignature(signature)
     
-    critPair1Res = [pair for pair in critPair1Res if pair != None]
-    critPair2Res = [pair for pair in critPair2Res if pair != None]
+    position = ToPosition(position)
+    overlapped = ListToTerm(term1, signature.variables)
     
-    if len(critPair1Res) == 0 or len(critPair2Res) == 0:
+    # find most general unifier between {term1} at position {position} and {term2}
+    unifier = MostGeneralUnifier(GetSubterm(overlapped, position), ListToTerm(term2, signature.variables))
+    if unifier is None:
         return (None, None)
     
-    critPair1 = critPair1Res[-1]
-    critPair2 = critPair2Res[-1]
-    
-    # print(f"Crit Pair 1 before mgu: {critPair1}")
-    # print(f"Crit Pair 2 before mgu: {critPair2}")
+    compiledRule1 = CompileRule(rule1, signature)
+    compiledRule2 = CompileRule(rule2, signature)
     
-    # apply mgu on the first result
-    # for lhs in rules.keys():
-    #     for rhs in rules[lhs]:
-    #         result = ApplySubstitutionRecursive((lhs, rhs), critPair1)
-    #         if result != None:
-    #             critPair1 = result
-    #             print("applied mgu on critpair1")
-            
-    # apply mgu on the second result
-    # for lhs in rules.keys():
-    #     for rhs in rules[lhs]:
-    #         result = ApplySubstitutionRecursive((lhs, rhs), critPair2)
-    #         if result != None:
-    #             critPair2 = result
-    #             print("applied mgu on critpair2")
-    
-    # print(f"Crit Pair 2 before replacement: {critPair2}")
-    # replace the subterm at position {position} in {term1} with {critPair2}
-    critPair2 = ReplaceSubtermAtPosition(term1, critPair2, position)
+    # the overlapped term is rewritten once at the root with rule1 and once at {position} with rule2
+    overlap = ApplyVariableSubstitution(overlapped, unifier)
+    critPair1 = TermToList(ApplyVariableSubstitution(compiledRule1.rhs, unifier))
+    critPair2 = TermToList(ReplaceSubterm(overlap, position, ApplyVariableSubstitution(compiledRule2.rhs, unifier)))
     
     # print(f"Critical pair 1: {critPair1}") # f(y', z') ->               ["f", ["y'", "z'"]]
     # print(f"Critical pair 2: {critPair2}") # f(y', f(f(y', z'), z)) ->  ["f", ["y'", "f", ["f", ["y'", "z'"], "z"]]]
@@ -601,54 +307,116 @@ def GetCriticalPair(term1: List, term2: List, rule1: Tuple[str, str], rule2: Tup
     return (critPair1, critPair2)
 
 
-def GenerateAllCriticalPairs(rules: List, combinations: List) -> List[Tuple[List, List]]:
+def GenerateAllCriticalPairs(rules: List, combinations: List, signature: Optional[Signature] = None,
+                             pool: Optional[OverlapPool] = None, tracer: Optional[Tracer] = None) -> List[Tuple[List, List]]:
     # print(rules)
     critPairs = []
-    for combination in combinations:
-        term1 = ChangeTreeToList(CreateTree(rules[combination[0]][0])) # left hand side of rule
-        original_term2 = ChangeTreeToList(CreateTree(rules[combination[1]][0])) # right hand side of rule
-        
-        # replace all coinciding variables in term2 and reflect changes in rule2 with newRule
-        term2, newRule = ReplaceCoincidingVariables(GetUniqueVariables(term1), GetUniqueVariables(original_term2), original_term2, rules[combination[1]])
-        
-        positions = GetAllFunctionPositions(term1)
+    for group in GenerateCriticalPairGroups(rules, combinations, signature, pool, tracer):
+        critPairs.extend(group)
+    
+    return critPairs
+
+
+@Profiled(CRITICAL_PAIRS)
+def GenerateCriticalPairGroups(rules: List, combinations: List, signature: Optional[Signature] = None,
+                               pool: Optional[OverlapPool] = None, tracer: Optional[Tracer] = None) -> List[List[Tuple[List, List]]]:
+    """
+    This function returns the critical pairs of every combination of rules, in the order of {combinations}.
+    If {pool} is given and there are enough combinations, the overlaps are computed by its worker processes;
+    the result is the same either way.
+
+    Args:
+        rules (List): the rules
+        combinations (List): the pairs (i, j) of indices of the rules to overlap, rule j into rule i
+        signature (Optional[Signature]): the functions and variables of our language
+        pool (Optional[OverlapPool]): the worker processes to share the overlaps between
+        tracer (Optional[Tracer]): records every critical pair at the DEBUG level
+
+    Returns:
+        List[List[Tuple[List, List]]]: the critical pairs of every combination
+    """
+    signature = GetSignature(signature)
+    
+    if pool is not None and pool.IsWorthIt(len(combinations)):
+        groups = pool.Generate(rules, combinations, signature)
+    else:
+        groups = [GenerateCriticalPairsOfRules(rules[combination[0]], rules[combination[1]], signature)
+                  for combination in combinations]
+    
+    tracer = GetTracer(tracer)
+    if tracer.IsEnabled(DEBUG):
+        for combination, group in zip(combinations, groups):
+            for critPair in group:
+                tracer.Event(DEBUG, "critical_pair", rules=[list(rules[combination[0]]), list(rules[combination[1]])],
+                             pair=[CreateInputStringFromTree(ChangeListToTree(critPair[0])),
+                                   CreateInputStringFromTree(ChangeListToTree(critPair[1]))])
+    
+    return groups
+
+
+def GenerateCriticalPairsOfRules(rule1: Tuple[str, str], rule2: Tuple[str, str],
+                                 signature: Optional[Signature] = None) -> List[Tuple[List, List]]:
+    """
+    This function returns the non-trivial critical pairs obtained by overlapping {rule2} into every
+    function position of the left-hand side of {rule1}, in the order of the positions.
+    The variables of {rule2} are renamed apart from the ones of {rule1} first.
+
+    Args:
+        rule1 (Tuple[str, str]): the outer rule
+        rule2 (Tuple[str, str]): the rule overlapped into {rule1}
+        signature (Optional[Signature]): the functions and variables of our language
+
+    Returns:
+        List[Tuple[List, List]]: the critical pairs
+    """
+    signature = GetSignature(signature)
+    critPairs = []
+    
+    lhs1 = CompileRule(rule1, signature).lhs
+    lhs2 = CompileRule(rule2, signature).lhs
+    term1 = TermToList(lhs1) # left hand side of rule
+    original_term2 = TermToList(lhs2) # right hand side of rule
+    
+    # replace all coinciding variables in term2 and reflect changes in rule2 with newRule
+    term2, newRule = ReplaceCoincidingVariables(GetUniqueVariables(term1, signature), GetUniqueVariables(original_term2, signature),
+                                                original_term2, rule2, signature)
+    
+    for position, subterm in Positions(lhs1):
+        if subterm.isVariable:
+            continue
         
-        for position in positions:
-            if term1 == original_term2 and position == "":
-                continue
+        if lhs1 is lhs2 and position == ():
+            continue
+    
+        # print(f"----------------------------------------------------------------------------------------\n \
+        #     Attempting to find critical pair for:\n \
+        #     Term 1: {term1}\n \
+        #     Term 2: {term2}\n \
+        #     Rule 1: {rule1}\n \
+        #     Rule 2: {newRule}\n \
+        #     Position: {position}")
         
-            # print(f"----------------------------------------------------------------------------------------\n \
-            #     Attempting to find critical pair for:\n \
-            #     Term 1: {term1}\n \
-            #     Term 2: {term2}\n \
-            #     Rule 1: {rules[combination[0]]}\n \
-            #     Rule 2: {newRule}\n \
-            #     Position: {position}")
-            
-            if GetSubtermAtPosition(term1, position)[0] != term2[0]:
-                # print(f"Functions have different number of arguments!")
-                continue
-            
-            critPair = GetCriticalPair(
-                term1,
-                term2,
-                rules[combination[0]],
-                newRule,
-                position
-            )
+        if subterm.value != term2[0]:
+            # print(f"Functions have different number of arguments!")
+            continue
         
-            if critPair != (None, None) and critPair[0] != critPair[1]:
-                newRuleInput = CreateInputStringFromTree(ChangeListToTree(critPair[0]))
-                newRuleOutput = CreateInputStringFromTree(ChangeListToTree(critPair[1]))
-                
-                with open("out.txt", "a") as f:
-                    f.write(f"Added critical pair {(newRuleInput, newRuleOutput)} to the set of identities.\n")
-                critPairs.append(critPair)
+        critPair = GetCriticalPair(
+            term1,
+            term2,
+            rule1,
+            newRule,
+            position,
+            signature
+        )
+    
+        if critPair != (None, None) and critPair[0] != critPair[1]:
+            critPairs.append(critPair)
     
     return critPairs
 
 
-def ReplaceCoincidingVariablesCritPair(vars1: List, vars2: List, term: List) -> Tuple[List, Dict[str, str]]:
+def ReplaceCoincidingVariablesCritPair(vars1: List, vars2: List, term: List,
+                                       signature: Optional[Signature] = None) -> Tuple[List, Dict[str, str]]:
     nonuniqueVars = []
     for var in vars1:
         if var in vars2:
@@ -656,7 +424,7 @@ def ReplaceCoincidingVariablesCritPair(vars1: List, vars2: List, term: List) ->
     
     varRules = {}
         
-    variables = LoadVariables()
+    signature = GetSignature(signature)
     flatTerm = FlattenList(term)
 
     for var in nonuniqueVars:
@@ -672,29 +440,29 @@ def ReplaceCoincidingVariablesCritPair(vars1: List, vars2: List, term: List) ->
         
         if yes:
             varRules[var] = tempVar
-            if tempVar not in variables:
-                AddVariable(tempVar, False)
+            signature.AddVariable(tempVar)
         
         newVarName = var + "'"
         while newVarName in flatTerm or newVarName in varRules.values():
             newVarName += "'"
         
         varRules[var] = newVarName
-        if newVarName not in variables:
-            AddVariable(newVarName, False)
+        signature.AddVariable(newVarName)
     
-    newTerm = ChangeTreeToList(ChangeListToTree(term))
+    newTerm = term
     
     for key, value in varRules.items():
-        newTerm = ApplySubstitutionRecursive((key, value), newTerm)
+        newTerm = ApplySubstitutionRecursive((key, value), newTerm, signature)
     
     return (newTerm, varRules)
 
 
-def RenameVariablesInCritPair(term1: List, term2: List) -> Tuple[List, List]:
-    variableOrder = ["x", "y", "z", "x'", "y'", "z'", "w", "a", "b", "c", "d", "g"]
-    vars1 = GetUniqueVariables(term1)
-    vars2 = GetUniqueVariables(term2)
+@Profiled(CRITICAL_PAIRS)
+def RenameVariablesInCritPair(term1: List, term2: List, signature: Optional[Signature] = None) -> Tuple[List, List]:
+    signature = GetSignature(signature)
+    variableOrder = [var for var in ["x", "y", "z", "x'", "y'", "z'", "w", "a", "b", "c", "d", "g"] if not signature.IsFunction(var)]
+    vars1 = GetUniqueVariables(term1, signature)
+    vars2 = GetUniqueVariables(term2, signature)
     maxLen = max(len(vars1), len(vars2))
     maxVars = vars1 if maxLen == len(vars1) else vars2
     minVars = vars2 if maxLen == len(vars1) else vars1
@@ -724,8 +492,8 @@ def RenameVariablesInCritPair(term1: List, term2: List) -> Tuple[List, List]:
     # ???
     # profit
     
-    newTerm1 = ChangeTreeToList(ChangeListToTree(term1))
-    newTerm2 = ChangeTreeToList(ChangeListToTree(term2))
+    newTerm1 = term1
+    newTerm2 = term2
     
     flatList1 = FlattenList(newTerm1)
     flatList2 = FlattenList(newTerm2)
@@ -735,7 +503,6 @@ def RenameVariablesInCritPair(term1: List, term2: List) -> Tuple[List, List]:
         if var not in variables:
             variables.append(var)
     
-    knownVariables = LoadVariables()
     varRules = {}
     newVariables = []
     for var in variables:
@@ -743,8 +510,7 @@ def RenameVariablesInCritPair(term1: List, term2: List) -> Tuple[List, List]:
         while newVarName in flatList1 or newVarName in flatList2 or newVarName in variableOrder or newVarName in varRules.values():
             newVarName += "'"
         
-        if newVarName not in knownVariables:
-            AddVariable(newVarName, False)
+        signature.AddVariable(newVarName)
 
         varRules[var] = newVarName
         newVariables.append(newVarName)
@@ -752,8 +518,8 @@ def RenameVariablesInCritPair(term1: List, term2: List) -> Tuple[List, List]:
     # print(f"Var rules: {varRules}")
     # print(f"Newterm2: {newTerm2}")
     for input, output in varRules.items():
-        value1 = ApplySubstitutionRecursive((input, output), newTerm1)
-        value2 = ApplySubstitutionRecursive((input, output), newTerm2)
+        value1 = ApplySubstitutionRecursive((input, output), newTerm1, signature)
+        value2 = ApplySubstitutionRecursive((input, output), newTerm2, signature)
         
         if value1 != None:
             newTerm1 = value1
@@ -779,9 +545,12 @@ def RenameVariablesInCritPair(term1: List, term2: List) -> Tuple[List, List]:
     # newTerm2 = ChangeTreeToList(ChangeListToTree(term2))
     
     # print(f"Newterm2: {newTerm2}")
+    for index, var in enumerate(newVariables):
+        signature.AddVariable(variableOrder[index])
+    
     for rule in rules:
-        value1 = ApplySubstitutionRecursive(rule, newTerm1)
-        value2 = ApplySubstitutionRecursive(rule, newTerm2)
+        value1 = ApplySubstitutionRecursive(rule, newTerm1, signature)
+        value2 = ApplySubstitutionRecursive(rule, newTerm2, signature)
         
         if value1 != None:
             newTerm1 = value1
@@ -793,134 +562,264 @@ def RenameVariablesInCritPair(term1: List, term2: List) -> Tuple[List, List]:
     return (newTerm1, newTerm2)
 
 
-def DetermineCompleteness(identities: List, times: int = 1000) -> Tuple[bool, List]:
-    prevRules = []
+@Profiled(NORMALIZATION)
+def NormalizeCriticalPairs(critPairs: List[Tuple[List, List]], rules: List, strategy: str = INNERMOST,
+                           signature: Optional[Signature] = None, processes: Optional[int] = 1,
+                           cache: Optional[NormalFormCache] = None, counters: Optional[Dict[str, int]] = None,
+                           normalizerPool: Optional[NormalizerPool] = None) -> List[Optional[Tuple[List, List]]]:
+    """
+    This function brings both sides of every critical pair of {critPairs} to normal form under {rules}, as one batch
+    (see NormalizeMany). The ordering and the orientation of the pairs are left to the caller.
+
+    Args:
+        critPairs (List[Tuple[List, List]]): the critical pairs
+        rules (List): the rules to rewrite with
+        strategy (str): the rewriting strategy
+        signature (Optional[Signature]): the functions and variables of our language
+        processes (Optional[int]): the number of worker processes for large batches, when {normalizerPool} isn't given.
+            If None, one per core
+        cache (Optional[NormalFormCache]): normal forms remembered across calls
+        counters (Optional[Dict[str, int]]): if given, the rewrite steps are added to its "rewrite_steps"
+        normalizerPool (Optional[NormalizerPool]): the worker processes of the run, used for large batches
+
+    Returns:
+        List[Optional[Tuple[List, List]]]: the normalized pairs, in the same order, with None for the joinable ones
+    """
+    signature = GetSignature(signature)
+    pairs = [(ListToTerm(critPair[0], signature.variables), ListToTerm(critPair[1], signature.variables)) for critPair in critPairs]
+    
+    return [None if term1 is term2 else (TermToList(term1), TermToList(term2))
+            for term1, term2 in NormalizeMany(pairs, rules, strategy, signature, processes, cache = cache, counters = counters,
+                                              pool = normalizerPool)]
+
+
+@Profiled(CRITICAL_PAIRS)
+def EnqueueCriticalPairs(queue: CriticalPairQueue, rules: List, generations: List[int], index: int,
+                         signature: Optional[Signature] = None, pool: Optional[OverlapPool] = None,
+                         normalize: bool = False, strategy: str = INNERMOST, processes: Optional[int] = 1,
+                         cache: Optional[NormalFormCache] = None, tracer: Optional[Tracer] = None,
+                         counters: Optional[Dict[str, int]] = None, normalizerPool: Optional[NormalizerPool] = None) -> None:
+    """
+    This function pushes to {queue} the critical pairs between the rule {index} and the rules before it (and itself).
+
+    Args:
+        queue (CriticalPairQueue): the queue of unprocessed critical pairs
+        rules (List): the rules found so far
+        generations (List[int]): the generation of every rule
+        index (int): the index of the new rule
+        signature (Optional[Signature]): the functions and variables of our language
+        pool (Optional[OverlapPool]): the worker processes to share the overlaps between
+        normalize (bool): if True, the pairs are normalized under {rules} before they are queued
+        strategy (str): the rewriting strategy used to normalize the pairs
+        processes (Optional[int]): the number of worker processes for large batches of pairs. If None, one per core
+        cache (Optional[NormalFormCache]): normal forms remembered across calls
+        tracer (Optional[Tracer]): records the critical pairs and the time they took
+        counters (Optional[Dict[str, int]]): if given, the critical pairs generated and the rewrite steps are added to its
+            "critical_pairs" and "rewrite_steps"
+        normalizerPool (Optional[NormalizerPool]): the worker processes of the run, used for large batches of pairs
+    """
+    tracer = GetTracer(tracer)
+    start = time.perf_counter()
+    combinations = GetNewRuleCombinations(index)
+    
+    groups = GenerateCriticalPairGroups(rules, combinations, signature, pool, tracer)
+    if counters is not None:
+        counters["critical_pairs"] = counters.get("critical_pairs", 0) + sum(len(group) for group in groups)
+    
+    if normalize: # the pairs are queued in normal form under the current rules, and the joinable ones are dropped
+        normalized = NormalizeCriticalPairs([critPair for group in groups for critPair in group], rules, strategy,
+                                            signature, processes, cache, counters, normalizerPool)
+        offset = 0
+        for groupIndex, group in enumerate(groups):
+            groups[groupIndex] = [critPair for critPair in normalized[offset:offset + len(group)] if critPair is not None]
+            offset += len(group)
+    
+    for combination, critPairs in zip(combinations, groups):
+        generation = max(generations[combination[0]], generations[combination[1]]) + 1
+        queue.Extend(critPairs, generation)
+    
+    tracer.Event(DEBUG, "critical_pairs_enqueued", rule=index, pairs=sum(len(group) for group in groups),
+                 seconds=time.perf_counter() - start)
+
+
+def DetermineCompleteness(identities: List, times: int = 1000, strategy: str = INNERMOST,
+                            cache: Optional[NormalFormCache] = None, ordering: Optional[ReductionOrdering] = None,
+                            heuristic: str = SMALLEST_FIRST, signature: Optional[Signature] = None,
+                            progress: Optional[Callable[[int, int, int], None]] = None,
+                            processes: Optional[int] = None, tracer: Optional[Tracer] = None) -> Tuple[Optional[bool], List]:
+    """
+    This function runs the completion procedure on {identities}, processing the critical pairs from a priority queue.
+
+    Args:
+        identities (List): the identities to complete, as (input, output) pairs or compiled rules
+        times (int): the largest generation of critical pairs which is processed before giving up
+        strategy (str): the rewriting strategy used to normalize the critical pairs
+        cache (Optional[NormalFormCache]): normal forms remembered across runs
+        ordering (Optional[ReductionOrdering]): the ordering used to orient the identities. If None, it is loaded from the signature
+        heuristic (str): the selection heuristic of the critical pair queue
+        signature (Optional[Signature]): the functions and variables of our language
+        progress (Optional[Callable[[int, int, int], None]]): called with the number of processed critical pairs,
+            the number of rules and the number of pending critical pairs before each pair is processed.
+            It may raise CompletionCancelled to stop the run
+        processes (Optional[int]): the number of worker processes large batches of overlaps and normalizations are shared between.
+            If None, one per core; 1 computes everything in this process
+        tracer (Optional[Tracer]): records the rules which are added, the failures and the timings of the run
+
+    Returns:
+        Tuple[Optional[bool], List]: True if a convergent rewriting system was found, False if the generation budget
+        ran out first and None if an identity or a critical pair couldn't be oriented, with the rules found so far
+    """
     currRules = []
+    ruleGenerations = [] # generation of every rule in currRules, a rule found in round k of the old all-pairs loop is of generation k
+    queue = CriticalPairQueue(heuristic) # critical pairs which still have to be processed
+    ruleTree = DiscriminationTree() # index over the left-hand sides of currRules
+    signature = GetSignature(signature).Copy() # the variables created while renaming stay local to this run
+    ordering = LoadOrdering(signature=signature) if ordering is None else ordering
+    cache = NormalFormCache() if cache is None else cache
+    pool = GetOverlapPool(processes) if processes != 1 else None
+    normalizerPool = NormalizerPool(signature, strategy, processes) if processes != 1 else None # started by the first large batch
+    tracer = GetTracer(tracer)
+    start = time.perf_counter()
+    counters = {"critical_pairs": 0, "rewrite_steps": 0} # reported when the run finishes
+    cacheHits, cacheMisses = cache.hits, cache.misses # the cache may be shared with earlier runs
     identityList = identities.copy()
+    iterations = 0
+    
+    def Finish(convergent: Optional[bool]) -> Tuple[Optional[bool], List]:
+        if normalizerPool is not None:
+            normalizerPool.Close()
+        RecordCache("normal forms", cache.hits - cacheHits, cache.misses - cacheMisses)
+        tracer.Event(INFO, "completion_finished", convergent=convergent, rules=len(currRules), iterations=iterations,
+                     pending=len(queue), seconds=time.perf_counter() - start, normal_form_cache=cache.Stats(), **counters)
+        return (convergent, currRules)
+    
+    tracer.Event(INFO, "completion_started", procedure="queue", identities=[list(identity) for identity in identities],
+                 ordering=ordering.name, heuristic=heuristic)
     
     i = 0
     while i < len(identityList):
         identity = identityList[i] # take the current identity
-        term1 = ChangeTreeToList(CreateTree(identity[0])) # take left hand side of identity (s)
-        term2 = ChangeTreeToList(CreateTree(identity[1])) # take right hand side of identity (t)
+        compiledIdentity = CompileRule(identity, signature)
+        term1 = TermToList(compiledIdentity.lhs) # take left hand side of identity (s)
+        term2 = TermToList(compiledIdentity.rhs) # take right hand side of identity (t)
         print(identity)
-        if term1 == term2: # if s == t
+        comparison = ordering.Compare(compiledIdentity.lhs, compiledIdentity.rhs)
+        if comparison == EQUAL: # if s == t
             identities.remove(identity)
-        elif LexicographicPathOrdering(term1, term2) == 1: # if s > t
+        elif comparison == GREATER: # if s > t
             identities.remove(identity)
             newRuleInput = CreateInputStringFromTree(ChangeListToTree(term1))
             newRuleOutput = CreateInputStringFromTree(ChangeListToTree(term2))
             
             if (newRuleInput, newRuleOutput) not in currRules:
                 currRules.append((newRuleInput, newRuleOutput))
-        elif LexicographicPathOrdering(term2, term1) == 1: # if t > s
+                ruleGenerations.append(0)
+                ruleTree.Insert(CompileRule((newRuleInput, newRuleOutput), signature))
+                cache.RuleAdded(CompileRule((newRuleInput, newRuleOutput), signature))
+                tracer.Event(INFO, "rule_added", rule=[newRuleInput, newRuleOutput], generation=0)
+        elif comparison == LESS: # if t > s
             identities.remove(identity)
             newRuleInput = CreateInputStringFromTree(ChangeListToTree(term2))
             newRuleOutput = CreateInputStringFromTree(ChangeListToTree(term1))
             
             if (newRuleInput, newRuleOutput) not in currRules:
                 currRules.append((newRuleInput, newRuleOutput))
+                ruleGenerations.append(0)
+                ruleTree.Insert(CompileRule((newRuleInput, newRuleOutput), signature))
+                cache.RuleAdded(CompileRule((newRuleInput, newRuleOutput), signature))
+                tracer.Event(INFO, "rule_added", rule=[newRuleInput, newRuleOutput], generation=0)
         else:
-            return (False, currRules)
+            tracer.Event(WARNING, "orientation_failed", pair=[compiledIdentity.input, compiledIdentity.output])
+            return Finish(None)
         
         i += 1
     
     print(f"Rules before critical pairs: {currRules}")
     
-    while currRules != prevRules:
-        prevRules = currRules.copy()
+    # only the overlaps of a rule with the rules before it are computed, so every overlap is computed once
+    for index in range(len(currRules)):
+        EnqueueCriticalPairs(queue, currRules, ruleGenerations, index, signature, pool,
+                             normalize = True, strategy = strategy, processes = processes, cache = cache, tracer = tracer,
+                             counters = counters, normalizerPool = normalizerPool)
+    
+    while queue:
+        if progress is not None:
+            progress(iterations, len(currRules), len(queue))
         
-        print(f"Prev Rules = {prevRules}")
-        numOfRules = len(prevRules)
-        combos = []
-        for i in range(numOfRules):
-            for j in range(numOfRules):
-                combos.append((i, j))
+        critPair, generation = queue.Pop()
+        iterations += 1
         
-        # compute all critical pairs under our rule set prevRules
-        critPairs = GenerateAllCriticalPairs(prevRules, combos)
-        print(f"Crit Pairs = {critPairs}")
+        if generation > times:
+            print(f"This has been going on for too long.")
+            return Finish(False)
         
-        # reduce all critical pairs to normal form under our rule set prevRules
-        for critPair in critPairs:
-            term1 = critPair[0]
-            term2 = critPair[1]
-            
-            normalFormTerm1 = ChangeTreeToList(ChangeListToTree(term1))
-            normalFormTerm2 = ChangeTreeToList(ChangeListToTree(term2))
-                
-            ruleIndex = 0
-            while ruleIndex < len(currRules):
-                rule = currRules[ruleIndex]
-                # print(f"For rule: {rule} we now have terms {normalFormTerm1} and {normalFormTerm2}")
-                ruleInput = rule[0]
-                ruleOutput = rule[1]
-                
-                changed = False
-                while term1 != None or term2 != None:
-                    term1 = ApplySubstitution((ruleInput, ruleOutput), normalFormTerm1)
-                    term2 = ApplySubstitution((ruleInput, ruleOutput), normalFormTerm2)
-                    
-                    if term1 != None:
-                        # print(f"Changed normal form of term1 from {normalFormTerm1} to {term1} with rule {rule}")
-                        normalFormTerm1 = term1
-                        changed = True
-
-                    if term2 != None:
-                        # print(f"Changed normal form of term2 from {normalFormTerm2} to {term2} with rule {rule}")
-                        normalFormTerm2 = term2
-                        changed = True
-                
-                if changed:
-                    ruleIndex = -1
-                # if ruleInput == "f(y, y)" and identity[0] == 'i(f(i(y), i(f(i(f(x, i(y))), x))))':
-                #     return None
-                
-                term1 = ChangeTreeToList(CreateTree(identity[0]))
-                term2 = ChangeTreeToList(CreateTree(identity[1]))
-                ruleIndex += 1
-            
-            foundAlready = False
-            newNormalForms = RenameVariablesInCritPair(normalFormTerm1, normalFormTerm2)
-            normalFormTerm1 = newNormalForms[0]
-            normalFormTerm2 = newNormalForms[1]
-            newNormalForms = (CreateInputStringFromTree(ChangeListToTree(newNormalForms[0])),
-                                CreateInputStringFromTree(ChangeListToTree(newNormalForms[1])))
-            for rule in currRules:
-                if (newNormalForms[0], newNormalForms[1]) == rule or (newNormalForms[1], newNormalForms[0]) == rule:
-                    foundAlready = True
-                    break
-            
-            newPair = (normalFormTerm1, normalFormTerm2)
-            
-            if LexicographicPathOrdering(newPair[0], newPair[1]) == 1: # if critPair1 > critPair2, then currRules += (critPair1, critPair2)
-                newRuleInput = CreateInputStringFromTree(ChangeListToTree(newPair[0]))
-                newRuleOutput = CreateInputStringFromTree(ChangeListToTree(newPair[1]))
-                
-                if (newRuleInput, newRuleOutput) not in currRules:
-                    currRules.append((newRuleInput, newRuleOutput))
-            elif LexicographicPathOrdering(newPair[1], newPair[0]) == 1: # if critPair2 > critPair1, then currRules += (critPair2, critPair1)
-                newRuleInput = CreateInputStringFromTree(ChangeListToTree(newPair[1]))
-                newRuleOutput = CreateInputStringFromTree(ChangeListToTree(newPair[0]))
-                
-                if (newRuleInput, newRuleOutput) not in currRules:
-                    currRules.append((newRuleInput, newRuleOutput))
-            elif newPair[0] != newPair[1]:
-                # print(f"Failed at pair with rules {prevRules}:\noldPair: {oldPair}\nnewPair: {newPair}")
-                return (False, currRules) # if there is one critical pair in normal form which cannot be ordered, fail
+        # reduce the critical pair to normal form under our current rule set
+        term1 = critPair[0]
+        term2 = critPair[1]
         
-        times -= 1
+        normalizer = Normalizer(ruleTree, strategy, cache)
+        normalFormTerm1 = TermToList(normalizer.Normalize(ListToTerm(term1, signature.variables)))
+        normalFormTerm2 = TermToList(normalizer.Normalize(ListToTerm(term2, signature.variables)))
+        counters["rewrite_steps"] += normalizer.steps
         
-        if times == 0:
-            print(f"This has been going on for too long.")
-            return (False, currRules)
+        if normalFormTerm1 == normalFormTerm2:
+            continue # the critical pair is joinable
+        
+        newNormalForms = RenameVariablesInCritPair(normalFormTerm1, normalFormTerm2, signature)
+        newPair = (newNormalForms[0], newNormalForms[1])
+        
+        comparison = ordering.Compare(ListToTerm(newPair[0], signature.variables), ListToTerm(newPair[1], signature.variables))
+        if comparison == GREATER: # if critPair1 > critPair2, then currRules += (critPair1, critPair2)
+            newRuleInput = CreateInputStringFromTree(ChangeListToTree(newPair[0]))
+            newRuleOutput = CreateInputStringFromTree(ChangeListToTree(newPair[1]))
+        elif comparison == LESS: # if critPair2 > critPair1, then currRules += (critPair2, critPair1)
+            newRuleInput = CreateInputStringFromTree(ChangeListToTree(newPair[1]))
+            newRuleOutput = CreateInputStringFromTree(ChangeListToTree(newPair[0]))
+        else:
+            # print(f"Failed at pair with rules {currRules}:\nnewPair: {newPair}")
+            tracer.Event(WARNING, "orientation_failed", pair=[CreateInputStringFromTree(ChangeListToTree(newPair[0])),
+                                                             CreateInputStringFromTree(ChangeListToTree(newPair[1]))])
+            return Finish(None) # if there is one critical pair in normal form which cannot be ordered, fail
+        
+        if (newRuleInput, newRuleOutput) not in currRules:
+            currRules.append((newRuleInput, newRuleOutput))
+            ruleGenerations.append(generation)
+            ruleTree.Insert(CompileRule((newRuleInput, newRuleOutput), signature))
+            cache.RuleAdded(CompileRule((newRuleInput, newRuleOutput), signature))
+            tracer.Event(INFO, "rule_added", rule=[newRuleInput, newRuleOutput], generation=generation)
+            
+            # only the overlaps of the new rule have to be added to the queue
+            EnqueueCriticalPairs(queue, currRules, ruleGenerations, len(currRules) - 1, signature, pool,
+                                 normalize = True, strategy = strategy, processes = processes, cache = cache, tracer = tracer,
+                             counters = counters, normalizerPool = normalizerPool)
 
     print(f"Rules after critical pairs: {currRules}")
 
-    return (True, currRules)
+    return Finish(True)
+
 
+def DetermineCompletenessHuet(identities: List, maxTimes: int = 1000, strategy: str = INNERMOST,
+                                cache: Optional[NormalFormCache] = None, ordering: Optional[ReductionOrdering] = None,
+                                signature: Optional[Signature] = None, processes: Optional[int] = None,
+                                tracer: Optional[Tracer] = None) -> Tuple[Optional[bool], List]:
+    """
+    This function runs Huet's completion procedure on {identities}, for at most {maxTimes} rounds of critical pairs.
+
+    Args:
+        identities (List): the identities to complete, as (input, output) pairs or compiled rules
+        maxTimes (int): the largest number of rounds which are run before giving up
+        strategy (str): the rewriting strategy used to normalize the identities and the critical pairs
+        cache (Optional[NormalFormCache]): normal forms remembered across runs
+        ordering (Optional[ReductionOrdering]): the ordering used to orient the identities. If None, it is loaded from the signature
+        signature (Optional[Signature]): the functions and variables of our language
+        processes (Optional[int]): the number of worker processes large batches of overlaps and normalizations are shared between.
+            If None, one per core; 1 computes everything in this process
+        tracer (Optional[Tracer]): records the rules which are added, simplified or removed, the failures and the timings of the run
 
-def DetermineCompletenessHuet(identities: List, maxTimes: int = 1000) -> Tuple[bool, List]:
+    Returns:
+        Tuple[Optional[bool], List]: True if a convergent rewriting system was found, False if the rounds ran out
+        first and None if an identity couldn't be oriented, with the rules found so far
+    """
     # Initialization
     currIdentities = identities.copy() # E_i
     nextIdentities = [] # E_i+1
@@ -928,11 +827,34 @@ def DetermineCompletenessHuet(identities: List, maxTimes: int = 1000) -> Tuple[b
     currRules = [] # R_i
     nextRules = [] # R_i+1
     ruleMarkings = []
+    ruleTree = DiscriminationTree() # index over the left-hand sides of the rules, kept in sync with nextRules
+    signature = GetSignature(signature).Copy() # the variables created while renaming stay local to this run
+    ordering = LoadOrdering(signature=signature) if ordering is None else ordering
+    cache = NormalFormCache() if cache is None else cache # normal forms which survive the changes to the rules
+    pool = GetOverlapPool(processes) if processes != 1 else None # worker processes for the overlaps of large rule sets
+    normalizerPool = NormalizerPool(signature, strategy, processes) if processes != 1 else None # started by the first large batch
+    tracer = GetTracer(tracer)
+    start = time.perf_counter()
     
     i = 0
     
     times = 0
+    counters = {"critical_pairs": 0, "rewrite_steps": 0} # reported when the run finishes
+    cacheHits, cacheMisses = cache.hits, cache.misses # the cache may be shared with earlier runs
+    
+    def Finish(convergent: Optional[bool], rules: List) -> Tuple[Optional[bool], List]:
+        if normalizerPool is not None:
+            normalizerPool.Close()
+        RecordCache("normal forms", cache.hits - cacheHits, cache.misses - cacheMisses)
+        tracer.Event(INFO, "completion_finished", convergent=convergent, rules=len(rules), rounds=times,
+                     seconds=time.perf_counter() - start, normal_form_cache=cache.Stats(), **counters)
+        return (convergent, rules)
+    
+    tracer.Event(INFO, "completion_started", procedure="huet", identities=[list(identity) for identity in identities],
+                 ordering=ordering.name)
+    
     while (len(currIdentities) > 0 or False in ruleMarkings) and times < maxTimes:
+        roundStart = time.perf_counter()
         # print(f"Run {times}:\n\tcurrIdentities: {currIdentities}\n\tcurrRules: {currRules}")
         while len(currIdentities) > 0:
             # a)
@@ -940,45 +862,17 @@ def DetermineCompletenessHuet(identities: List, maxTimes: int = 1000) -> Tuple[b
             # print(f"Looking at identity: {identity}")
             
             # b)
-            term1 = ChangeTreeToList(CreateTree(identity[0]))
-            term2 = ChangeTreeToList(CreateTree(identity[1]))
+            compiledIdentity = CompileRule(identity, signature)
+            term1 = TermToList(compiledIdentity.lhs)
+            term2 = TermToList(compiledIdentity.rhs)
             
-            normalFormTerm1 = ChangeTreeToList(ChangeListToTree(term1))
-            normalFormTerm2 = ChangeTreeToList(ChangeListToTree(term2))
-                
-            ruleIndex = 0
-            while ruleIndex < len(currRules):
-                rule = currRules[ruleIndex]
-                # print(f"For rule: {rule} we now have terms {normalFormTerm1} and {normalFormTerm2}")
-                ruleInput = rule[0]
-                ruleOutput = rule[1]
-                
-                changed = False
-                while term1 != None or term2 != None:
-                    term1 = ApplySubstitution((ruleInput, ruleOutput), normalFormTerm1)
-                    term2 = ApplySubstitution((ruleInput, ruleOutput), normalFormTerm2)
-                    
-                    if term1 != None:
-                        # print(f"Changed normal form of term1 from {normalFormTerm1} to {term1} with rule {rule}")
-                        normalFormTerm1 = term1
-                        changed = True
-
-                    if term2 != None:
-                        # print(f"Changed normal form of term2 from {normalFormTerm2} to {term2} with rule {rule}")
-                        normalFormTerm2 = term2
-                        changed = True
-                
-                if changed:
-                    ruleIndex = -1
-                # if ruleInput == "f(y, y)" and identity[0] == 'i(f(i(y), i(f(i(f(x, i(y))), x))))':
-                #     return None
-                
-                term1 = ChangeTreeToList(CreateTree(identity[0]))
-                term2 = ChangeTreeToList(CreateTree(identity[1]))
-                ruleIndex += 1
+            normalizer = Normalizer(ruleTree, strategy, cache)
+            normalFormTerm1 = TermToList(normalizer.Normalize(ListToTerm(term1, signature.variables)))
+            normalFormTerm2 = TermToList(normalizer.Normalize(ListToTerm(term2, signature.variables)))
+            counters["rewrite_steps"] += normalizer.steps
             
             foundAlready = False
-            newNormalForms = RenameVariablesInCritPair(normalFormTerm1, normalFormTerm2)
+            newNormalForms = RenameVariablesInCritPair(normalFormTerm1, normalFormTerm2, signature)
             normalFormTerm1 = newNormalForms[0]
             normalFormTerm2 = newNormalForms[1]
             newNormalForms = (CreateInputStringFromTree(ChangeListToTree(newNormalForms[0])),
@@ -1000,73 +894,65 @@ def DetermineCompletenessHuet(identities: List, maxTimes: int = 1000) -> Tuple[b
                 currIdentities = nextIdentities.copy()
             # d)
             else:
-                lpo1 = LexicographicPathOrdering(normalFormTerm1, normalFormTerm2)
-                lpo2 = LexicographicPathOrdering(normalFormTerm2, normalFormTerm1)
+                comparison = ordering.Compare(ListToTerm(normalFormTerm1, signature.variables), ListToTerm(normalFormTerm2, signature.variables))
                 
-                if lpo1 != 1 and lpo2 != 1:
+                if comparison != GREATER and comparison != LESS:
                     print(f"Failed at identity with normal forms: {normalFormTerm1}, {normalFormTerm2}")
                     print(f"Failed with rules {nextRules} and identities {nextIdentities}.")
-                    return (None, nextRules)
+                    tracer.Event(WARNING, "orientation_failed", pair=[CreateInputStringFromTree(ChangeListToTree(normalFormTerm1)),
+                                                                     CreateInputStringFromTree(ChangeListToTree(normalFormTerm2))])
+                    return Finish(None, nextRules)
                 # e)
                 else:
-                    if lpo2 == 1:
-                        aux = ChangeTreeToList(ChangeListToTree(normalFormTerm1))
-                        normalFormTerm1 = ChangeTreeToList(ChangeListToTree(normalFormTerm2))
-                        normalFormTerm2 = ChangeTreeToList(ChangeListToTree(aux))
+                    if comparison == LESS:
+                        normalFormTerm1, normalFormTerm2 = normalFormTerm2, normalFormTerm1
                     
                     normalFormTermInput = CreateInputStringFromTree(ChangeListToTree(normalFormTerm1))
                     normalFormTermOutput = CreateInputStringFromTree(ChangeListToTree(normalFormTerm2))
+                    newCompiledRule = CompileRule((normalFormTermInput, normalFormTermOutput), signature)
+                    ruleTree.Insert(newCompiledRule)
+                    cache.RuleAdded(newCompiledRule)
                     
                     nextRules = currRules.copy()
                     index = 0
                     while index < len(nextRules):
                         newRule = nextRules[index]
+                        compiledRule = CompileRule(newRule, signature)
                         
-                        checkInput = ChangeTreeToList(CreateTree(newRule[0]))
-                        newInput = ChangeTreeToList(CreateTree(newRule[0]))
+                        checkInput = TermToList(compiledRule.lhs)
+                        newInput = checkInput
                         
-                        tempInput = ApplySubstitution((normalFormTermInput, normalFormTermOutput), newInput)
+                        tempInput = ApplySubstitution(newCompiledRule, newInput, signature)
 
                         if tempInput != None:
                             newInput = tempInput
                         
                         if checkInput == newInput:
-                            newOutput = ChangeTreeToList(CreateTree(newRule[1]))
-                            tempOutput = ChangeTreeToList(CreateTree(newRule[1]))
-                            
-                            tempRules = currRules.copy()
-                            tempRules.append((normalFormTermInput, normalFormTermOutput))
-                            
-                            ruleIndex = 0
-                            while ruleIndex < len(tempRules):
-                                changed = False
-                                rule = tempRules[ruleIndex]
-                                ruleInput = rule[0]
-                                ruleOutput = rule[1]
-                                
-                                while tempOutput != None:
-                                    tempOutput = ApplySubstitution((ruleInput, ruleOutput), newOutput)
-
-                                    if tempOutput != None:
-                                        newOutput = tempOutput
-                                        changed = True
-                                
-                                if changed:
-                                    ruleIndex = -1
-                                
-                                ruleIndex += 1
+                            # the index already holds the new rule, so this normalizes with R_i + {s -> t}
+                            normalizer = Normalizer(ruleTree, strategy, cache)
+                            newOutput = TermToList(normalizer.Normalize(compiledRule.rhs))
+                            counters["rewrite_steps"] += normalizer.steps
                     
                             if CreateInputStringFromTree(ChangeListToTree(newOutput)) != newRule[1]:
                                 newRule = (newRule[0], 
                                             CreateInputStringFromTree(ChangeListToTree(newOutput)))
                                 
                                 if newRule not in nextRules:
+                                    ruleTree.Remove(CompileRule(nextRules[index], signature))
+                                    cache.RuleRemoved(CompileRule(nextRules[index], signature))
+                                    ruleTree.Insert(CompileRule(newRule, signature))
+                                    cache.RuleAdded(CompileRule(newRule, signature))
+                                    tracer.Event(INFO, "rule_simplified", rule=list(nextRules[index]), simplified=list(newRule))
                                     nextRules[index] = newRule
                                 else:
                                     if index < nextRules.index(newRule):
                                         ruleMarkings[nextRules.index(newRule)] = ruleMarkings[index]
                                         
-                                    nextRules.pop(index)
+                                    removedRule = nextRules.pop(index)
+                                    ruleTree.Remove(CompileRule(removedRule, signature))
+                                    cache.RuleRemoved(CompileRule(removedRule, signature))
+                                    tracer.Event(INFO, "rule_removed", rule=list(removedRule), reason="duplicate")
+                                        
                                     ruleMarkings.pop(index)
                                     
                                     index -= 1
@@ -1076,6 +962,7 @@ def DetermineCompletenessHuet(identities: List, maxTimes: int = 1000) -> Tuple[b
                     if (normalFormTermInput, normalFormTermOutput) not in nextRules:
                         nextRules.append((normalFormTermInput, normalFormTermOutput))
                         ruleMarkings.append(False)
+                        tracer.Event(INFO, "rule_added", rule=[normalFormTermInput, normalFormTermOutput], round=times)
                     
                     nextIdentities = currIdentities.copy()
                     nextIdentities.remove(identity)
@@ -1090,10 +977,9 @@ def DetermineCompletenessHuet(identities: List, maxTimes: int = 1000) -> Tuple[b
                             index += 1
                             continue
 
-                        newInput = ChangeTreeToList(CreateTree(newIdentity[0]))
-                        tempInput = ChangeTreeToList(CreateTree(newIdentity[0]))
+                        newInput = TermToList(CompileRule(newIdentity, signature).lhs)
                         
-                        tempInput = ApplySubstitution((normalFormTermInput, normalFormTermOutput), newInput)
+                        tempInput = ApplySubstitution(newCompiledRule, newInput, signature)
 
                         if tempInput != None:
                             newInput = tempInput
@@ -1106,6 +992,10 @@ def DetermineCompletenessHuet(identities: List, maxTimes: int = 1000) -> Tuple[b
                                 nextIdentities.append(newIdentity)
                                 ruleMarkings.pop(nextRules.index(oldIdentity))
                                 nextRules.remove(oldIdentity)
+                                ruleTree.Remove(CompileRule(oldIdentity, signature))
+                                cache.RuleRemoved(CompileRule(oldIdentity, signature))
+                                tracer.Event(INFO, "rule_removed", rule=list(oldIdentity), reason="left-hand side simplified",
+                                             identity=list(newIdentity))
                         
                         index += 1
                         
@@ -1135,7 +1025,13 @@ def DetermineCompletenessHuet(identities: List, maxTimes: int = 1000) -> Tuple[b
             
             # print(f"+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++\nGenerating all critical pairs with rules {rulesToGenerateCritPairsWith}")
             
-            critPairs = GenerateAllCriticalPairs(rulesToGenerateCritPairsWith, combosToGenerateCritPairsWith)
+            critPairs = GenerateAllCriticalPairs(rulesToGenerateCritPairsWith, combosToGenerateCritPairsWith, signature, pool, tracer)
+            counters["critical_pairs"] += len(critPairs)
+            
+            # the pairs are brought to normal form in one batch, and the joinable ones are dropped right away
+            critPairs = [critPair for critPair in NormalizeCriticalPairs(critPairs, nextRules, strategy, signature, processes, cache,
+                                                                         counters, normalizerPool)
+                         if critPair is not None]
             
             nextIdentities = []
             for critPair in critPairs:
@@ -1148,7 +1044,7 @@ def DetermineCompletenessHuet(identities: List, maxTimes: int = 1000) -> Tuple[b
                 else:
                     newCritPair = (critPair[1], critPair[0])
                 
-                newCritPair = RenameVariablesInCritPair(newCritPair[0], newCritPair[1])
+                newCritPair = RenameVariablesInCritPair(newCritPair[0], newCritPair[1], signature)
                 # newCritPair = (critPair[0], critPair[1])
                 if newCritPair[0] != newCritPair[1]:
                     str1 = CreateInputStringFromTree(ChangeListToTree(newCritPair[0]))
@@ -1163,15 +1059,19 @@ def DetermineCompletenessHuet(identities: List, maxTimes: int = 1000) -> Tuple[b
                         
                         if not found:
                             # print(f"Added {(str1, str2)} to the set of identities!")
-                            with open("out.txt", "a") as f:
-                                f.write(f"Added critical pair {(str1, str2)} to the set of identities.\n")
+                            tracer.Event(DEBUG, "identity_added", identity=[str1, str2])
                             nextIdentities.append((str1, str2))
             
             i += 1
             currRules = nextRules.copy()
             currIdentities = nextIdentities.copy()
         
+        tracer.Event(INFO, "round_finished", round=times, rules=len(currRules), identities=len(currIdentities),
+                     seconds=time.perf_counter() - roundStart)
         times += 1
     
+    if len(currIdentities) > 0 or False in ruleMarkings:
+        return Finish(False, currRules)
+    
     print(f"Succeeded with rules {currRules}.")
-    return (True, currRules)
\ No newline at end of file
+    return Finish(True, currRules)
\ No newline at end of file
@@ -0,0 +1,258 @@
+import argparse
+import contextlib
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Optional, List, Dict, Iterable
+from .exceptions import TermRewritingError
+from .term import TermToString
+from .orderings import LoadOrdering
+from .theories import Theory, ReadTheory, GuessTheoryFormat
+from .trace import MemoryTracer, INFO
+from .complete import QUEUE, HUET, PROCEDURES, CONVERGENT, FAILED, BUDGET_EXHAUSTED
+
+
+# the theories which are benchmarked when no files are given
+CORPUS_DIRECTORY = os.path.join(os.path.dirname(__file__), "benchmark_theories")
+
+# how much slower a case may get before --compare reports it as a regression
+DEFAULT_THRESHOLD = 0.25
+# slowdowns smaller than this many seconds are left to the noise of the machine
+MIN_SLOWDOWN = 0.005
+
+
+def LoadCorpus(paths: Optional[Iterable[str]] = None) -> Dict[str, Theory]:
+    """
+    This function reads the theories to benchmark, by name (the file name without its extension).
+
+    Args:
+        paths (Optional[Iterable[str]]): the theory files. If None, every file of CORPUS_DIRECTORY is read
+
+    Returns:
+        Dict[str, Theory]: the theories, sorted by name
+
+    Raises:
+        TermRewritingError: if a file is not a valid theory
+        OSError: if a file can't be read
+    """
+    if paths is None:
+        paths = glob.glob(os.path.join(CORPUS_DIRECTORY, "*.trs")) + glob.glob(os.path.join(CORPUS_DIRECTORY, "*.jsonl"))
+
+    corpus = {}
+    for path in paths:
+        with open(path) as f:
+            corpus[os.path.splitext(os.path.basename(path))[0]] = ReadTheory(f, GuessTheoryFormat(path))
+
+    return dict(sorted(corpus.items()))
+
+
+def _RunOnce(theory: Theory, procedure: str, budget: int) -> Dict:
+    from .backend import DetermineCompleteness, DetermineCompletenessHuet # the backend module imports everything, so it is loaded lazily
+
+    signature = theory.signature
+    identities = [(TermToString(lhs), TermToString(rhs)) for lhs, rhs in theory.rules + theory.equations]
+    ordering = LoadOrdering(theory.ordering, signature)
+    tracer = MemoryTracer(INFO)
+
+    # one process, so that the peak memory and the counters cover the whole run
+    start = time.perf_counter()
+    if procedure == HUET:
+        convergent, rules = DetermineCompletenessHuet(identities, budget, ordering=ordering, signature=signature,
+                                                      processes=1, tracer=tracer)
+    else:
+        convergent, rules = DetermineCompleteness(identities, budget, ordering=ordering, signature=signature,
+                                                  processes=1, tracer=tracer)
+    seconds = time.perf_counter() - start
+
+    finished = next(event for event in reversed(tracer.events) if event["event"] == "completion_finished")
+    return {"outcome": CONVERGENT if convergent else FAILED if convergent is None else BUDGET_EXHAUSTED,
+            "rules": len(rules), "seconds": seconds,
+            "rewrite_steps": finished["rewrite_steps"], "critical_pairs": finished["critical_pairs"]}
+
+
+def BenchmarkTheory(name: str, theory: Theory, procedure: str = QUEUE, budget: int = 40, repeat: int = 3,
+                    memory: bool = True) -> Dict:
+    """
+    This function completes {theory} {repeat} times with {procedure} and measures the runs.
+
+    A first, untimed run loads the lazy imports and gives the counters, which are the same for every run.
+    The wall time is measured without tracemalloc, which slows the procedures down; if {memory} is True,
+    one more run is made under tracemalloc to find the peak memory.
+
+    Args:
+        name (str): the name of the theory, copied to the result
+        theory (Theory): the theory to complete
+        procedure (str): QUEUE or HUET
+        budget (int): the largest generation of critical pairs (QUEUE) or number of rounds (HUET)
+        repeat (int): the number of timed runs
+        memory (bool): if True, the peak memory of a run is measured as well
+
+    Returns:
+        Dict: the result: theory, procedure, ordering, outcome, rules, seconds (the fastest run), seconds_median,
+        rewrite_steps, critical_pairs and peak_memory (in bytes, None if it wasn't measured)
+    """
+    first = _RunOnce(theory, procedure, budget)
+    times = [_RunOnce(theory, procedure, budget)["seconds"] for _ in range(max(repeat, 1))]
+
+    peakMemory = None
+    if memory:
+        tracemalloc.start()
+        try:
+            _RunOnce(theory, procedure, budget)
+            peakMemory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {"theory": name, "procedure": procedure, "ordering": LoadOrdering(theory.ordering, theory.signature).name,
+            "budget": budget, "outcome": first["outcome"], "rules": first["rules"],
+            "seconds": min(times), "seconds_median": statistics.median(times), "repeat": len(times),
+            "rewrite_steps": first["rewrite_steps"], "critical_pairs": first["critical_pairs"],
+            "peak_memory": peakMemory}
+
+
+def _Environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(__file__),
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+
+    return {"commit": commit, "python": platform.python_version(), "machine": platform.machine(), "time": time.time()}
+
+
+def CompareResults(baseline: List[Dict], results: List[Dict], threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    This function compares two sets of benchmark results, case by case (a case is a theory and a procedure).
+
+    Args:
+        baseline (List[Dict]): the older results
+        results (List[Dict]): the newer results
+        threshold (float): how much slower (as a fraction of the old time) a case may get before it is a regression
+
+    Returns:
+        List[str]: the regressions: cases which got slower than the threshold allows (and by more than MIN_SLOWDOWN
+        seconds), or whose outcome changed
+    """
+    old = {(result["theory"], result["procedure"]): result for result in baseline}
+    regressions = []
+
+    for result in results:
+        previous = old.get((result["theory"], result["procedure"]))
+        if previous is None:
+            continue
+
+        case = f"{result['theory']} ({result['procedure']})"
+        if result["outcome"] != previous["outcome"]:
+            regressions.append(f"{case}: the outcome changed from {previous['outcome']} to {result['outcome']}")
+        elif (result["seconds"] > previous["seconds"] * (1 + threshold)
+              and result["seconds"] - previous["seconds"] > MIN_SLOWDOWN):
+            regressions.append(f"{case}: {previous['seconds']:.4f}s -> {result['seconds']:.4f}s "
+                               f"({result['seconds'] / previous['seconds']:.2f}x)")
+
+    return regressions
+
+
+def _FormatTable(results: List[Dict], baseline: Optional[List[Dict]]) -> List[str]:
+    old = {(result["theory"], result["procedure"]): result for result in baseline or []}
+    lines = [f"{'theory':<20} {'procedure':<9} {'outcome':<17} {'rules':>5} {'seconds':>9} {'steps':>8} {'pairs':>7} "
+             f"{'memory':>10} {'vs base':>8}\n"]
+
+    for result in results:
+        previous = old.get((result["theory"], result["procedure"]))
+        ratio = f"{result['seconds'] / previous['seconds']:.2f}x" if previous and previous["seconds"] else ""
+        memory = f"{result['peak_memory'] / 1024:.0f}KiB" if result["peak_memory"] is not None else "-"
+        lines.append(f"{result['theory']:<20} {result['procedure']:<9} {result['outcome']:<17} {result['rules']:>5} "
+                     f"{result['seconds']:>9.4f} {result['rewrite_steps']:>8} {result['critical_pairs']:>7} "
+                     f"{memory:>10} {ratio:>8}\n")
+
+    return lines
+
+
+def ReadResults(path: str) -> List[Dict]:
+    """
+    This function reads the results written by the benchmark (see Main).
+
+    Args:
+        path (str): the results file
+
+    Returns:
+        List[Dict]: the result of every case, without the line which describes the environment
+    """
+    with open(path) as f:
+        return [record for record in map(json.loads, filter(str.strip, f)) if "theory" in record]
+
+
+def Main(argv: Optional[List[str]] = None) -> int:
+    """
+    This function is the command line interface of the completion benchmarks:
+
+        python -m website.backend.benchmark -o results.jsonl
+        python -m website.backend.benchmark --compare results.jsonl
+
+    Every theory of the corpus (or the given files) is completed with both procedures. The results are written
+    as JSON lines: a first line with the commit and the Python version, then one line per case. A table of the
+    results goes to the standard error; with --compare, the cases which got slower than --threshold allows are
+    listed as well and the exit code is 1.
+
+    Args:
+        argv (Optional[List[str]]): the arguments. If None, the ones of the process are used
+
+    Returns:
+        int: the exit code
+    """
+    parser = argparse.ArgumentParser(prog="python -m website.backend.benchmark",
+                                     description="Benchmark the completion procedures on a corpus of theories.")
+    parser.add_argument("theories", nargs="*", help="the theory files (default: the corpus in benchmark_theories)")
+    parser.add_argument("--procedure", choices=PROCEDURES, action="append",
+                        help="a procedure to benchmark, may be repeated (default: all of them)")
+    parser.add_argument("--budget", type=int, default=40,
+                        help="the largest generation of critical pairs (queue) or number of rounds (huet) (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="the number of timed runs of every case (default: %(default)s)")
+    parser.add_argument("--no-memory", action="store_true", help="don't make the extra run which measures the peak memory")
+    parser.add_argument("-o", "--output", help="the file to write the results to (default: standard output)")
+    parser.add_argument("--compare", metavar="BASELINE", help="results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="the slowdown which counts as a regression, as a fraction (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    try:
+        corpus = LoadCorpus(args.theories or None)
+        baseline = ReadResults(args.compare) if args.compare else None
+    except (TermRewritingError, OSError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 2
+
+    results = []
+    with open(os.devnull, "w") as log, contextlib.redirect_stdout(log): # the procedures print their progress
+        for name, theory in corpus.items():
+            for procedure in args.procedure or PROCEDURES:
+                results.append(BenchmarkTheory(name, theory, procedure, args.budget, args.repeat, not args.no_memory))
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        output.write(json.dumps({"environment": _Environment()}) + "\n")
+        output.writelines(json.dumps(result) + "\n" for result in results)
+    finally:
+        if args.output:
+            output.close()
+
+    sys.stderr.writelines(_FormatTable(results, baseline))
+
+    if baseline is not None:
+        regressions = CompareResults(baseline, results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(Main())
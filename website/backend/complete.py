@@ -0,0 +1,174 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import Optional, List, Tuple
+from .exceptions import TermRewritingError
+from .term import TermToString
+from .parser import Tokenize, ParseTerm, NAME
+from .orderings import LoadOrdering, ORDERINGS
+from .critical_pairs import HEURISTICS, SMALLEST_FIRST
+from .theories import Theory, ReadTheory, FormatTheory, GuessTheoryFormat, TRS, JSON_LINES
+from .trace import Tracer, LEVELS
+from .profiling import Profile, Profiling
+
+
+# completion procedures
+QUEUE = "queue" # DetermineCompleteness
+HUET = "huet"   # DetermineCompletenessHuet
+PROCEDURES = (QUEUE, HUET)
+
+# outcomes of a run and the exit codes they are reported with (2 is used by argparse for bad arguments)
+CONVERGENT = "convergent"
+FAILED = "failed"
+BUDGET_EXHAUSTED = "budget exhausted"
+EXIT_CODES = {CONVERGENT: 0, FAILED: 1, BUDGET_EXHAUSTED: 3}
+EXIT_INVALID_INPUT = 4
+
+# formats of the output
+TEXT = "text"
+JSON = "json"
+OUTPUT_FORMATS = (TEXT, JSON, TRS, JSON_LINES)
+
+
+def CompleteTheory(theory: Theory, procedure: str = QUEUE, ordering: Optional[str] = None, budget: int = 1000,
+                   heuristic: str = SMALLEST_FIRST, processes: Optional[int] = None,
+                   tracer: Optional[Tracer] = None) -> Tuple[str, List[Tuple[str, str]]]:
+    """
+    This function runs a completion procedure on the rules and equations of {theory}, without Flask.
+
+    Args:
+        theory (Theory): the theory to complete
+        procedure (str): QUEUE or HUET
+        ordering (Optional[str]): "lpo" or "kbo". If None, the ordering of the theory is used
+        budget (int): the largest generation of critical pairs (QUEUE) or number of rounds (HUET) before giving up
+        heuristic (str): the selection heuristic of the critical pair queue, only used by QUEUE
+        processes (Optional[int]): the number of worker processes. If None, one per core
+        tracer (Optional[Tracer]): records the events of the run. If None, nothing is recorded
+
+    Returns:
+        Tuple[str, List[Tuple[str, str]]]: CONVERGENT, FAILED or BUDGET_EXHAUSTED and the rules found
+
+    Raises:
+        OrderingError: if the ordering can't be built for the signature of the theory
+    """
+    from .backend import DetermineCompleteness, DetermineCompletenessHuet # the backend module imports everything, so it is loaded lazily
+
+    signature = theory.signature
+    identities = [(TermToString(lhs), TermToString(rhs)) for lhs, rhs in theory.rules + theory.equations]
+    reductionOrdering = LoadOrdering(ordering, signature)
+
+    if procedure == HUET:
+        convergent, rules = DetermineCompletenessHuet(identities, budget, ordering=reductionOrdering, signature=signature,
+                                                      processes=processes, tracer=tracer)
+    else:
+        convergent, rules = DetermineCompleteness(identities, budget, ordering=reductionOrdering, heuristic=heuristic,
+                                                  signature=signature, processes=processes, tracer=tracer)
+
+    outcome = CONVERGENT if convergent else FAILED if convergent is None else BUDGET_EXHAUSTED
+    return (outcome, [tuple(rule) for rule in rules])
+
+
+def _ResultTheory(theory: Theory, rules: List[Tuple[str, str]]) -> Theory:
+    # the procedures rename variables apart (x', y', ...), so the names which aren't functions become variables
+    signature = theory.signature.Copy()
+    for rule in rules:
+        for side in rule:
+            for kind, value, _ in Tokenize(side):
+                if kind == NAME and value not in signature.functions:
+                    signature.AddVariable(value)
+
+    return Theory(signature, [(ParseTerm(lhs, signature), ParseTerm(rhs, signature)) for lhs, rhs in rules],
+                  ordering=theory.ordering)
+
+
+def Main(argv: Optional[List[str]] = None) -> int:
+    """
+    This function is the command line interface of the completion procedures:
+
+        python -m website.backend.complete theory.trs --ordering kbo --budget 50 --format json
+
+    The result is written to the standard output (or --output); whatever the procedures print goes to the
+    standard error. The exit code is 0 if a convergent system was found, 1 if the procedure failed, 3 if the
+    budget ran out and 4 if the input couldn't be read.
+
+    Args:
+        argv (Optional[List[str]]): the arguments. If None, the ones of the process are used
+
+    Returns:
+        int: the exit code
+    """
+    parser = argparse.ArgumentParser(prog="python -m website.backend.complete",
+                                     description="Run the completion procedure on a theory file (.trs or .jsonl).")
+    parser.add_argument("theory", help="the theory file, or - for the standard input")
+    parser.add_argument("--procedure", choices=PROCEDURES, default=QUEUE, help="the completion procedure (default: %(default)s)")
+    parser.add_argument("--ordering", choices=ORDERINGS, help="the reduction ordering (default: the one of the theory, or lpo)")
+    parser.add_argument("--budget", type=int, default=1000,
+                        help="the largest generation of critical pairs (queue) or number of rounds (huet) (default: %(default)s)")
+    parser.add_argument("--heuristic", choices=HEURISTICS, default=SMALLEST_FIRST, help="the critical pair selection of the queue procedure")
+    parser.add_argument("--processes", type=int, default=1, help="the number of worker processes, 0 for one per core (default: %(default)s)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default=TEXT, help="the format of the result (default: %(default)s)")
+    parser.add_argument("-o", "--output", help="the file to write the result to (default: standard output)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="don't show what the procedures print")
+    parser.add_argument("--trace", help="the file to write the trace of the run to, as JSON lines")
+    parser.add_argument("--stats", action="store_true",
+                        help="profile the engine functions and add their counters to the result (to the standard error for trs and jsonl)")
+    parser.add_argument("--trace-level", choices=LEVELS, default="info", help="the lowest level of the traced events (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.theory == "-":
+            theory = ReadTheory(sys.stdin)
+        else:
+            with open(args.theory) as f:
+                theory = ReadTheory(f, GuessTheoryFormat(args.theory))
+    except (TermRewritingError, OSError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return EXIT_INVALID_INPUT
+
+    log = open(os.devnull, "w") if args.quiet else sys.stderr
+    tracer = Tracer(args.trace, LEVELS[args.trace_level]) if args.trace else None
+    profile = Profile(args.theory) if args.stats else None
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(log), Profiling(profile) if profile else contextlib.nullcontext():
+            outcome, rules = CompleteTheory(theory, args.procedure, args.ordering, args.budget, args.heuristic,
+                                            args.processes or None, tracer)
+    except TermRewritingError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return EXIT_INVALID_INPUT
+    finally:
+        if args.quiet:
+            log.close()
+        if tracer is not None:
+            tracer.Close()
+    seconds = time.perf_counter() - start
+
+    if args.format == TEXT:
+        lines = [f"{outcome.capitalize()} after {seconds:.3f}s with {len(rules)} rules:\n"]
+        lines += [f"{lhs} -> {rhs}\n" for lhs, rhs in rules]
+        lines += profile.Format() if profile else []
+    elif args.format == JSON:
+        result = {"outcome": outcome, "seconds": seconds, "rules": [list(rule) for rule in rules]}
+        if profile:
+            result["stats"] = profile.ToDict()
+        lines = [json.dumps(result) + "\n"]
+    else:
+        lines = FormatTheory(_ResultTheory(theory, rules), args.format)
+        if profile:
+            sys.stderr.writelines(profile.Format())
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        output.writelines(lines)
+    finally:
+        if args.output:
+            output.close()
+
+    return EXIT_CODES[outcome]
+
+
+if __name__ == "__main__":
+    sys.exit(Main())
@@ -0,0 +1,95 @@
+import heapq
+from typing import Optional, List, Tuple, Iterable
+from .representation_changes import FlattenList
+
+
+# selection heuristics of the critical pair queue
+FIFO = "fifo"                     # the pairs are processed in the order they were found
+SMALLEST_FIRST = "smallest-first" # the pair with the fewest symbols is processed first
+HEURISTICS = (FIFO, SMALLEST_FIRST)
+
+
+class CriticalPairQueue:
+    """
+    Priority queue of the critical pairs which were found but not processed yet.
+
+    The completion procedure only has to push the critical pairs between a new rule and the rules it
+    already has (and the new rule with itself), so no overlap is ever computed twice.
+    Every pair remembers its generation: the initial rules are of generation 0 and a rule oriented from a
+    critical pair is one generation older than the newest of the two rules the pair came from.
+    Ties are broken by insertion order, so the order in which the pairs come out is deterministic.
+    """
+
+    def __init__(self, heuristic: str = SMALLEST_FIRST):
+        if heuristic not in HEURISTICS:
+            raise ValueError(f"Unknown selection heuristic {heuristic}! Expected one of {', '.join(HEURISTICS)}.")
+
+        self.heuristic = heuristic
+        self.pushed = 0 # number of pairs pushed so far
+        self._heap = []
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __bool__(self) -> bool:
+        return bool(self._heap)
+
+    def Push(self, critPair: Tuple[List, List], generation: int = 1) -> None:
+        """
+        This function adds {critPair} to the queue.
+
+        Args:
+            critPair (Tuple[List, List]): the two sides of the critical pair
+            generation (int): the generation of the rule which would be oriented from the pair
+        """
+        if self.heuristic == SMALLEST_FIRST:
+            priority = len(FlattenList(critPair[0])) + len(FlattenList(critPair[1]))
+        else:
+            priority = 0
+
+        heapq.heappush(self._heap, (priority, self.pushed, generation, critPair))
+        self.pushed += 1
+
+    def Extend(self, critPairs: Iterable[Tuple[List, List]], generation: int = 1) -> None:
+        """
+        This function adds every pair of {critPairs} to the queue.
+
+        Args:
+            critPairs (Iterable[Tuple[List, List]]): the critical pairs
+            generation (int): the generation of the rules which would be oriented from the pairs
+        """
+        for critPair in critPairs:
+            self.Push(critPair, generation)
+
+    def Pop(self) -> Optional[Tuple[Tuple[List, List], int]]:
+        """
+        This function removes the next critical pair from the queue, as chosen by the heuristic.
+
+        Returns:
+            Optional[Tuple[Tuple[List, List], int]]: the critical pair and its generation, or None if the queue is empty
+        """
+        if not self._heap:
+            return None
+
+        _, _, generation, critPair = heapq.heappop(self._heap)
+        return (critPair, generation)
+
+
+def GetNewRuleCombinations(index: int) -> List[Tuple[int, int]]:
+    """
+    This function returns the pairs of rule indices which have to be overlapped once the rule {index} is added
+    to the rules 0, 1, ..., {index} - 1: the new rule with every older rule (both ways) and with itself.
+
+    Args:
+        index (int): the index of the new rule
+
+    Returns:
+        List[Tuple[int, int]]: the combinations of rules, as accepted by GenerateAllCriticalPairs
+    """
+    combos = []
+    for i in range(index):
+        combos.append((i, index))
+        combos.append((index, i))
+    combos.append((index, index))
+
+    return combos
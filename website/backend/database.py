@@ -1,74 +1,170 @@
-from flask import session, flash
-from typing import List, Optional, Tuple, Dict
+import json
+import threading
+import uuid
+from contextlib import contextmanager
+from flask import session, current_app
+from typing import List, Optional, Tuple, Dict, Any, Iterator
+from .exceptions import NotFoundError
+from .storage import StorageBackend, CreateStorage
+from .representation_changes import FlattenList, ChangeListToTree, CreateInputStringFromTree
+
+
+# keys of a workspace which older versions kept in the cookie session
+_WORKSPACE_KEYS = ("functions", "variables", "substitutions", "terms", "precedences", "weights", "ordering", "term_name", "term_string")
+
+_BOUND = threading.local() # store and workspace used outside of a request, see UseWorkspace
+_STORAGE_LOCK = threading.Lock()
+
+
+def GetStorage() -> StorageBackend:
+    """
+    This function returns the store of the workspaces: the one bound by UseWorkspace, or else the one
+    of the Flask app, built the first time from app.config["STORAGE_BACKEND"] and app.config["STORAGE_DATABASE"].
+
+    Returns:
+        StorageBackend: the store of the workspaces
+    """
+    storage = getattr(_BOUND, "storage", None)
+    if storage is not None:
+        return storage
+
+    with _STORAGE_LOCK:
+        storage = current_app.extensions.get("storage")
+        if storage is None:
+            storage = CreateStorage(current_app.config.get("STORAGE_BACKEND", "sqlite"), current_app.config.get("STORAGE_DATABASE"))
+            current_app.extensions["storage"] = storage
+
+    return storage
+
+
+def GetWorkspaceId() -> str:
+    """
+    This function returns the id of the current workspace: the one bound by UseWorkspace, or else the one
+    remembered in the user session. A new workspace is created for a new user, taking over whatever an older
+    version of the app left in the session.
+
+    Returns:
+        str: the id of the workspace
+    """
+    workspace = getattr(_BOUND, "workspace", None)
+    if workspace is not None:
+        return workspace
+
+    if "workspace" not in session:
+        workspace = uuid.uuid4().hex
+        storage = GetStorage()
+        for key in _WORKSPACE_KEYS:
+            if key in session:
+                storage.Set(workspace, key, session.pop(key))
+        session["workspace"] = workspace
+
+    return session["workspace"]
+
+
+@contextmanager
+def UseWorkspace(storage: StorageBackend, workspace: str) -> Iterator[None]:
+    """
+    This function makes the Save*/Load* functions of this thread use {workspace} of {storage},
+    e.g. in scripts and tests which run without a Flask request.
+
+    Args:
+        storage (StorageBackend): the store to use
+        workspace (str): the id of the workspace
+    """
+    previous = (getattr(_BOUND, "storage", None), getattr(_BOUND, "workspace", None))
+    _BOUND.storage, _BOUND.workspace = storage, workspace
+    try:
+        yield
+    finally:
+        _BOUND.storage, _BOUND.workspace = previous
+
+
+def _Load(key: str, default: Any = None) -> Any:
+    return GetStorage().Get(GetWorkspaceId(), key, default)
+
+
+def _Save(key: str, value: Any) -> None:
+    GetStorage().Set(GetWorkspaceId(), key, value)
+
 
 def SaveVariables(variables: set) -> None:
     """
-    This function saves the {variables} set in the current user session.
+    This function saves the {variables} set in the current workspace.
 
     Args:
         variables (set): set which includes the variables in our language
     """
-    session["variables"] = list(variables)
+    _Save("variables", sorted(variables))
     
 
 def LoadVariables() -> set:
     """
-    This function loads the {variables} set from the current user session, 
+    This function loads the {variables} set from the current workspace, 
     or creates a new set if it doesn't exist.
 
     Returns:
         set: the set containing the variables in our language
     """
-    return set(session["variables"]) if "variables" in session else set([])
+    return set(_Load("variables", []))
 
 
 def SaveFunctions(functions: dict) -> None:
     """
-    This function saves the {functions} dictionary in the current user session.
+    This function saves the {functions} dictionary in the current workspace.
 
     Args:
         functions (dict): dictionary which includes the functions in our language and their arity
     """
-    session["functions"] = functions
+    _Save("functions", functions)
     
     ModifyPrecedence()
     
 
 def LoadFunctions() -> dict:
     """
-    This function loads the {functions} dictionary from the current user session, 
+    This function loads the {functions} dictionary from the current workspace, 
     or creates a new dictionary if it doesn't exist.
 
     Returns:
         dict: the dictionary containing the functions in our language and their arity
     """
-    return session["functions"] if "functions" in session else {}
+    return _Load("functions", {})
 
 
 def SaveSubstitutions(substitutions: dict) -> None:
     """
-    This function saves the {substitutions} dictionary in the current user session.
+    This function saves the {substitutions} dictionary in the current workspace.
 
     Args:
         substitutions (dict): dictionary which includes the substitutions
     """
-    session["substitutions"] = substitutions
+    _Save("substitutions", substitutions)
     
 
 def LoadSubstitutions() -> dict:
     """
-    This function loads the {substitutions} dictionary from the current user session, 
+    This function loads the {substitutions} dictionary from the current workspace, 
     or creates a new dictionary if it doesn't exist.
 
     Returns:
         dict: the dictionary containing the substitutions
     """
-    return session["substitutions"] if "substitutions" in session else {}
+    return _Load("substitutions", {})
+
+
+# the saved terms are kept one per key, next to two indexes over them:
+#   "term_names"                   -> the names of the terms, in the order they were saved
+#   "term:" + name                 -> (string representation, list representation) of the term
+#   "term_structure:" + JSON list  -> the names of the terms with that list representation
+#   "term_symbol:" + symbol        -> the names of the terms which contain that function or variable
+_TERM_PREFIX = "term:"
+_TERM_STRUCTURE_PREFIX = "term_structure:"
+_TERM_SYMBOL_PREFIX = "term_symbol:"
 
 
 def SaveTerm(term: List, input_str: str, name: str) -> None:
     """
-    This function saves the current term to the user session for later use
+    This function saves the current term to the current workspace for later use
     in the format (string_representation, list_representation)
 
     Args:
@@ -76,14 +172,53 @@ def SaveTerm(term: List, input_str: str, name: str) -> None:
         input_str (str): stromg representation of the term
         name (str): the name by which to remember this term
     """
-    term_dictionary = session["terms"] if "terms" in session else {}
+    SaveTerms({name: (input_str, term)})
+
+
+def SaveTerms(terms: Dict[str, Tuple[str, List]]) -> None:
+    """
+    This function saves many terms to the current workspace at once, like SaveTerm: the terms and
+    their indexes are updated in memory and written back with a single call to the store.
+
+    Args:
+        terms (Dict[str, Tuple[str, List]]): the terms to save, as name -> (string representation, list representation)
+    """
+    _MigrateTerms()
+    storage, workspace = GetStorage(), GetWorkspaceId()
+    
+    names = storage.Get(workspace, "term_names", [])
+    known_names = set(names)
+    values = {}
+    index = {} # index key -> names of the terms, loaded the first time the key is needed
+    
+    def IndexNames(key: str) -> List[str]:
+        if key not in index:
+            index[key] = storage.Get(workspace, key, [])
+        return index[key]
     
-    term_dictionary[name] = (input_str, term)
-    print(term_dictionary)
-    session["terms"] = term_dictionary
+    for name, (input_str, term) in terms.items():
+        if name in known_names:
+            _, old_term = storage.Get(workspace, _TERM_PREFIX + name)
+            for key in _TermIndexKeys(old_term):
+                IndexNames(key).remove(name)
+        else:
+            names.append(name)
+            known_names.add(name)
+        
+        values[_TERM_PREFIX + name] = (input_str, term)
+        for key in _TermIndexKeys(term):
+            IndexNames(key).append(name)
+    
+    values["term_names"] = names
+    values.update((key, key_names) for key, key_names in index.items() if key_names)
+    storage.SetMany(workspace, values)
+    
+    for key, key_names in index.items():
+        if not key_names:
+            storage.Delete(workspace, key)
 
 
-def LoadTerm(name: str) -> Optional[Tuple[str, List]]:
+def LoadTerm(name: str) -> Tuple[str, List]:
     """
     This function takes in the name of a term and returns the contents within a list of lists.
 
@@ -91,68 +226,191 @@ def LoadTerm(name: str) -> Optional[Tuple[str, List]]:
         name (str): the name by which to remember this term
 
     Returns:
-        Optional[Tuple[str, List]]: returns a tuple with the string representation 
-        and the list of lists or None if there's an error
+        Tuple[str, List]: returns a tuple with the string representation and the list of lists
+
+    Raises:
+        NotFoundError: if there is no term called {name}
     """
-    term_dictionary = session["terms"] if "terms" in session else {}
+    _MigrateTerms()
+    term = _Load(_TERM_PREFIX + name)
     
-    if name not in term_dictionary:
-        flash(f"ERROR: No term with the name {name} found in the dictionary!", category="error")
-        return None
+    if term is None:
+        raise NotFoundError(f"No term with the name {name} found in the dictionary!")
     
-    return term_dictionary[name]
+    return tuple(term)
 
 
 def LoadTermByList(term : List) -> Optional[Tuple[str, List]]:
     """
-    This function takes in the name of a term and returns the contents within a list of lists.
+    This function looks up a saved term by its list representation, in the structural index of the terms.
 
     Args:
-        name (str): the name by which to remember this term
+        term (List): the list representation of the term
 
     Returns:
         Optional[Tuple[str, List]]: returns a tuple with the string representation 
-        and the list of lists or None if there's an error
+        and the list of lists or None if no saved term is equal to {term}
     """
-    term_dictionary = session["terms"] if "terms" in session else {}
-    
-    flat_term = FlattenList(term)
+    _MigrateTerms()
+    names = _Load(_TermStructureKey(term), [])
     
-    for key, value in term_dictionary.items():
-        if flat_term == FlattenList(value[1]):
-            return term_dictionary[key]
-    
-    flash(f"ERROR: No term with the list {term} found in the dictionary!", category="error")
-    return None
+    return LoadTerm(names[0]) if names else None
+
+
+def LoadTermNamesBySymbol(symbol: str) -> List[str]:
+    """
+    This function returns the names of the saved terms which contain the function or variable {symbol}.
+
+    Args:
+        symbol (str): the name of the function or variable
+
+    Returns:
+        List[str]: the names of the terms
+    """
+    _MigrateTerms()
+    return _Load(_TERM_SYMBOL_PREFIX + symbol, [])
     
 
 def LoadAllTerms() -> Optional[Dict[str, Tuple[str, List]]]:
     """
-    This function returns all terms currently in the session.
+    This function returns all terms currently in the workspace.
 
     Returns:
         Optional[Dict[str, Tuple[str, List]]]: returns a dictionary of tuples with the string representation 
         and the list of lists or None if there's an error
     """
-    return (session["terms"] if "terms" in session else {})
+    _MigrateTerms()
+    storage, workspace = GetStorage(), GetWorkspaceId()
+    
+    return {name: tuple(storage.Get(workspace, _TERM_PREFIX + name)) for name in storage.Get(workspace, "term_names", [])}
 
 
-def DeleteTerms() -> None:
+def DeleteTerm(name: str) -> None:
     """
-    This function deletes all terms currently found in the session.
+    This function deletes the term called {name} from the workspace.
+
+    Args:
+        name (str): the name of the term
+
+    Raises:
+        NotFoundError: if there is no term called {name}
+    """
+    _, term = LoadTerm(name)
+    storage, workspace = GetStorage(), GetWorkspaceId()
+    
+    _UnindexTerm(name, term)
+    storage.Delete(workspace, _TERM_PREFIX + name)
+    storage.Set(workspace, "term_names", [curr_name for curr_name in storage.Get(workspace, "term_names", []) if curr_name != name])
+
+
+def DeleteTermsWithSymbol(symbol: str) -> List[str]:
     """
-    session.pop("terms")
-    flash("WARNING: All terms have been deleted because a function or variable contained in an existing term has been modified!")
+    This function deletes the terms which contain the function or variable {symbol}.
+
+    Args:
+        symbol (str): the name of the function or variable
+
+    Returns:
+        List[str]: the names of the deleted terms
+    """
+    names = LoadTermNamesBySymbol(symbol)
+    
+    for name in names:
+        DeleteTerm(name)
+    
+    return names
+
+
+def RenameSymbolInTerms(old_symbol: str, new_symbol: str) -> List[str]:
+    """
+    This function renames the function or variable {old_symbol} to {new_symbol} in every term which contains it,
+    keeping the names of the terms.
+
+    Args:
+        old_symbol (str): the current name of the function or variable
+        new_symbol (str): the new name of the function or variable
+
+    Returns:
+        List[str]: the names of the modified terms
+    """
+    names = LoadTermNamesBySymbol(old_symbol)
+    renamed_terms = {}
+    
+    for name in names:
+        _, term = LoadTerm(name)
+        term = _RenameSymbolInList(term, old_symbol, new_symbol)
+        renamed_terms[name] = (CreateInputStringFromTree(ChangeListToTree(term)), term)
+    
+    SaveTerms(renamed_terms)
+    
+    return names
+
+
+def _RenameSymbolInList(ls: List, old_symbol: str, new_symbol: str) -> List:
+    return [_RenameSymbolInList(element, old_symbol, new_symbol) if type(element) == list
+            else new_symbol if element == old_symbol else element for element in ls]
+
+
+def _TermStructureKey(term: List) -> str:
+    return _TERM_STRUCTURE_PREFIX + json.dumps(term, separators=(",", ":"))
+
+
+def _TermIndexKeys(term: List) -> List[str]:
+    return [_TermStructureKey(term)] + [_TERM_SYMBOL_PREFIX + symbol for symbol in sorted(set(FlattenList(term)))]
+
+
+def _UnindexTerm(name: str, term: List) -> None:
+    storage, workspace = GetStorage(), GetWorkspaceId()
+    
+    for key in _TermIndexKeys(term):
+        names = [curr_name for curr_name in storage.Get(workspace, key, []) if curr_name != name]
+        if names:
+            storage.Set(workspace, key, names)
+        else:
+            storage.Delete(workspace, key)
+
+
+def _MigrateTerms() -> None:
+    # older workspaces kept every term in a single "terms" dictionary, without any index
+    storage, workspace = GetStorage(), GetWorkspaceId()
+    
+    if storage.Has(workspace, "terms"):
+        terms = storage.Get(workspace, "terms", {})
+        storage.Delete(workspace, "terms")
+        
+        SaveTerms(terms)
+
+
+def SaveDraftTerm(name: str, input_str: str) -> None:
+    """
+    This function remembers the name and the string of the term being written on the create term page.
+
+    Args:
+        name (str): the name typed in for the term
+        input_str (str): the string typed in for the term
+    """
+    _Save("term_name", name)
+    _Save("term_string", input_str)
+
+
+def LoadDraftTerm() -> Tuple[str, str]:
+    """
+    This function returns the name and the string of the term being written on the create term page.
+
+    Returns:
+        Tuple[str, str]: the name and the string of the term (empty if nothing was typed in yet)
+    """
+    return (_Load("term_name", ""), _Load("term_string", ""))
 
 
 def SavePrecedences(precedences: dict) -> None:
     """
-    This function saves the {precedences} dictionary in the current user session.
+    This function saves the {precedences} dictionary in the current workspace.
 
     Args:
         precedences (dict): dictionary which includes the precedences in our language
     """
-    session["precedences"] = precedences
+    _Save("precedences", precedences)
     
 
 def LoadPrecedences() -> Dict[str, int]:
@@ -162,19 +420,63 @@ def LoadPrecedences() -> Dict[str, int]:
     Returns:
         Dict[str, int]: returns a dictionary with the name of the atomic term and their precedence
     """
-    return session["precedences"] if "precedences" in session else {}
+    return _Load("precedences", {})
+
+
+def SaveWeights(weights: dict) -> None:
+    """
+    This function saves the {weights} dictionary in the current workspace.
+
+    Args:
+        weights (dict): dictionary which includes the Knuth-Bendix weights of the functions in our language
+    """
+    _Save("weights", weights)
+    
+
+def LoadWeights() -> Dict[str, int]:
+    """
+    This function returns the dictionary with the Knuth-Bendix weights of the functions in our language.
+
+    Returns:
+        Dict[str, int]: returns a dictionary with the name of the function and its weight
+    """
+    return _Load("weights", {})
+
+
+def SaveOrderingName(name: str) -> None:
+    """
+    This function saves the name of the reduction ordering chosen by the user in the current workspace.
+
+    Args:
+        name (str): "lpo" or "kbo"
+    """
+    _Save("ordering", name)
+    
+
+def LoadOrderingName() -> str:
+    """
+    This function returns the name of the reduction ordering chosen by the user.
+
+    Returns:
+        str: returns "lpo" or "kbo" (the lexicographic path ordering is used if nothing was chosen)
+    """
+    return _Load("ordering", "lpo")
 
 
 def ModifyPrecedence() -> None:
+    """
+    This function brings the precedences of the current workspace in line with its functions: the deleted
+    functions are dropped and the new ones are put above all the others, those with fewer arguments first.
+    The other functions keep their precedence, so an ordering set by the user survives changes to the signature.
+    """
     functions = LoadFunctions()
-    functions = dict(sorted(functions.items(), key=lambda item: item[1]))
-    current_precedence = 0
-
-    precedences = {}
+    precedences = {name: precedence for name, precedence in LoadPrecedences().items() if name in functions}
     
-    for func in functions.keys():
-        precedences[func] = current_precedence
-        current_precedence += 1
+    next_precedence = max(precedences.values(), default=-1) + 1
+    for func, _ in sorted(functions.items(), key=lambda item: item[1]):
+        if func not in precedences:
+            precedences[func] = next_precedence
+            next_precedence += 1
 
     SavePrecedences(precedences)
 
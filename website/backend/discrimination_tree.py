@@ -0,0 +1,187 @@
+from typing import Optional, List, Iterable
+from .term import Term
+from .rules import CompiledRule, CompileRule, MATCH_FUNCTION
+from .profiling import Profiled, MATCHING
+
+
+# key used in the tree for any variable of a left-hand side
+VARIABLE_KEY = "*"
+
+
+class DiscriminationTreeNode:
+    __slots__ = ("children", "rules")
+
+    def __init__(self):
+        self.children = {} # (symbol, arity) or VARIABLE_KEY -> DiscriminationTreeNode
+        self.rules = {}    # CompiledRule -> insertion number, only filled in for leaves
+
+
+class DiscriminationTree:
+    """
+    Perfect discrimination tree over the left-hand sides of a set of rules.
+
+    Every left-hand side is stored along the path given by its pre-order traversal, where all
+    variables are replaced by the same VARIABLE_KEY. Given a term, Retrieve walks the tree and
+    only returns the rules whose left-hand side could match it, so that the cost of finding a
+    redex doesn't grow with the number of rules.
+    Since repeated variables are not distinguished, candidates still have to be confirmed with
+    CompiledRule.Match.
+    """
+
+    def __init__(self, rules: Iterable = ()):
+        self.root = DiscriminationTreeNode()
+        self.size = 0
+        self._counter = 0
+
+        for rule in rules:
+            self.Insert(rule)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, rule) -> bool:
+        rule = CompileRule(rule)
+        node = self._FindLeaf(rule)
+        return node is not None and rule in node.rules
+
+    def Insert(self, rule) -> None:
+        """
+        This function adds {rule} to the index. Adding a rule that is already indexed does nothing.
+
+        Args:
+            rule (Union[Tuple[str, str], CompiledRule]): the rule to add
+        """
+        rule = CompileRule(rule)
+
+        node = self.root
+        for key in GetIndexKeys(rule):
+            child = node.children.get(key)
+            if child is None:
+                child = DiscriminationTreeNode()
+                node.children[key] = child
+            node = child
+
+        if rule not in node.rules:
+            node.rules[rule] = self._counter
+            self._counter += 1
+            self.size += 1
+
+    def Remove(self, rule) -> bool:
+        """
+        This function removes {rule} from the index, pruning the branches left empty.
+
+        Args:
+            rule (Union[Tuple[str, str], CompiledRule]): the rule to remove
+
+        Returns:
+            bool: returns True if the rule was found in the index
+        """
+        rule = CompileRule(rule)
+
+        path = []
+        node = self.root
+        for key in GetIndexKeys(rule):
+            child = node.children.get(key)
+            if child is None:
+                return False
+            path.append((node, key))
+            node = child
+
+        if rule not in node.rules:
+            return False
+
+        node.rules.pop(rule)
+        self.size -= 1
+
+        # prune the nodes which don't lead to any rule anymore
+        while path and not node.rules and not node.children:
+            parent, key = path.pop()
+            parent.children.pop(key)
+            node = parent
+
+        return True
+
+    @Profiled(MATCHING)
+    def Retrieve(self, term: Term) -> List[CompiledRule]:
+        """
+        This function returns the rules whose left-hand side could match {term}, in the order they were added.
+
+        Args:
+            term (Term): the term we're trying to rewrite at its root
+
+        Returns:
+            List[CompiledRule]: the candidate rules
+        """
+        candidates = {}
+
+        # the subterms still left to look at are kept as a linked list of (term, rest) pairs
+        stack = [(self.root, (term, None))]
+        while stack:
+            node, pending = stack.pop()
+
+            if pending is None:
+                candidates.update(node.rules)
+                continue
+
+            curr_term, rest = pending
+
+            child = node.children.get(VARIABLE_KEY)
+            if child is not None: # a variable of the left-hand side swallows the whole subterm
+                stack.append((child, rest))
+
+            if not curr_term.isVariable:
+                child = node.children.get((curr_term.value, len(curr_term.arguments)))
+                if child is not None:
+                    for argument in reversed(curr_term.arguments):
+                        rest = (argument, rest)
+                    stack.append((child, rest))
+
+        return sorted(candidates, key=candidates.get)
+
+    def Rewrite(self, term: Term) -> Optional[Term]:
+        """
+        This function applies one of the indexed rules once, at the leftmost-outermost position of {term}
+        where any of them matches.
+
+        Args:
+            term (Term): the term to rewrite
+
+        Returns:
+            Optional[Term]: the rewritten term or None if {term} is in normal form
+        """
+        for rule in self.Retrieve(term):
+            bindings = rule.Match(term)
+            if bindings is not None:
+                return rule.Instantiate(bindings)
+
+        for index, argument in enumerate(term.arguments):
+            newArgument = self.Rewrite(argument)
+
+            if newArgument is not None:
+                arguments = term.arguments[:index] + (newArgument,) + term.arguments[index + 1:]
+                return Term(term.value, arguments, term.isVariable)
+
+        return None
+
+    def _FindLeaf(self, rule: CompiledRule) -> Optional[DiscriminationTreeNode]:
+        node = self.root
+        for key in GetIndexKeys(rule):
+            node = node.children.get(key)
+            if node is None:
+                return None
+
+        return node
+
+
+def GetIndexKeys(rule: CompiledRule) -> List:
+    """
+    This function returns the path of {rule} in a discrimination tree, read off its matching program.
+
+    Args:
+        rule (CompiledRule): the rule to index
+
+    Returns:
+        List: the keys of the left-hand side in pre-order
+    """
+    return [(argument1, argument2) if operation == MATCH_FUNCTION else VARIABLE_KEY
+            for operation, argument1, argument2 in rule.program]
@@ -0,0 +1,66 @@
+from typing import Optional
+
+
+class TermRewritingError(Exception):
+    """
+    Base class of the errors raised by the term rewriting engine.
+    The message is meant to be shown to the user as it is.
+    """
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class ParseError(TermRewritingError, ValueError):
+    """
+    Raised when a string can't be read as a term of the signature.
+
+    Attributes:
+        text (str): the string which couldn't be parsed
+        offset (Optional[int]): the index of the character where the error was found, if known
+    """
+
+    def __init__(self, message: str, text: str = "", offset: Optional[int] = None):
+        super().__init__(message)
+        self.text = text
+        self.offset = offset
+
+
+class PositionError(TermRewritingError, IndexError):
+    """
+    Raised when a position doesn't exist in a term.
+    """
+
+
+class SignatureError(TermRewritingError, ValueError):
+    """
+    Raised when a name is used both as a function and as a variable, or a function is used with the wrong arity.
+    """
+
+
+class DuplicateError(TermRewritingError, ValueError):
+    """
+    Raised when a function, variable or substitution which already exists is added again.
+    """
+
+
+class NotFoundError(TermRewritingError, KeyError):
+    """
+    Raised when a function, variable, saved term or substitution can't be found.
+    """
+
+    def __str__(self) -> str:
+        return self.message # KeyError would quote the message
+
+
+class OrderingError(TermRewritingError, ValueError):
+    """
+    Raised when a reduction ordering can't be built (e.g. unknown name or weights which are not admissible).
+    """
+
+
+class CompletionCancelled(TermRewritingError):
+    """
+    Raised from a progress callback to stop a completion run which was cancelled.
+    """
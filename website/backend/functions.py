@@ -1,6 +1,6 @@
-from flask import session, flash
+from flask import flash
 from .database import *
-from .representation_changes import FlattenList
+from .exceptions import NotFoundError, DuplicateError, SignatureError
 
 def ModifyFunction(old_function_name: str, curr_function_name: str, function_arity: int) -> None:
     """
@@ -10,33 +10,50 @@ def ModifyFunction(old_function_name: str, curr_function_name: str, function_ari
         old_function_name (str): old name of the function (can be the same as curr_function_name)
         curr_function_name (str): current name of the function (can be the same as old_function_name)
         function_arity (int): arity of the function (value of the key in the dictionary)
+
+    Raises:
+        NotFoundError: if there is no function {old_function_name}
+        SignatureError: if {curr_function_name} is a variable
     """
-    if "functions" not in session:
-        flash("ERROR: There are no functions loaded in the session.", category="error")
-        return
+    if not LoadFunctions():
+        raise NotFoundError("There are no functions in the workspace.")
     
     functions = LoadFunctions()
     variables = LoadVariables()
     
     if old_function_name not in functions:
-        flash(f"ERROR: Could not find function {old_function_name} in dictionary!", category="error")
-        return
+        raise NotFoundError(f"Could not find function {old_function_name} in dictionary!")
 
     if old_function_name != curr_function_name: # modify the function key name if requsted
         if curr_function_name in variables:
-            flash(f"ERROR: Function {curr_function_name} is a variable!", category="error")
-            return
+            raise SignatureError(f"Function {curr_function_name} is a variable!")
         
         functions[curr_function_name] = functions.pop(old_function_name)
     
     functions[curr_function_name] = function_arity # modify the function arity
     
+    precedences = LoadPrecedences()
     SaveFunctions(functions)
+    
+    if old_function_name != curr_function_name and old_function_name in precedences: # a renamed function keeps its precedence
+        new_precedences = LoadPrecedences()
+        new_precedences[curr_function_name] = precedences[old_function_name]
+        SavePrecedences(new_precedences)
 
     flash(f"Successfully modified function {old_function_name} into function {curr_function_name} with arity {function_arity}!")
     
-    if CheckFunctionInTerm(old_function_name):
-        DeleteTerms()
+    # only the terms which use the function with another arity become invalid, the others are renamed in place
+    invalid_terms = [name for name in LoadTermNamesBySymbol(old_function_name)
+                     if not CheckFunctionArityInTerm(LoadTerm(name)[1], old_function_name, function_arity)]
+    
+    for name in invalid_terms:
+        DeleteTerm(name)
+    
+    if invalid_terms:
+        flash(f"WARNING: Deleted the terms {', '.join(invalid_terms)} because they use function {old_function_name} with another arity!")
+    
+    if old_function_name != curr_function_name:
+        RenameSymbolInTerms(old_function_name, curr_function_name)
 
 
 def AddFunction(function_name: str, function_arity: int, verbose: bool = True) -> None:
@@ -47,18 +64,20 @@ def AddFunction(function_name: str, function_arity: int, verbose: bool = True) -
         function_name (str): name of the function to add (the key in the dictionary)
         function_arity (int): arity of the function (value of the key in the dictionary)
         verbose (bool): if True, will flash messages to website
+
+    Raises:
+        DuplicateError: if there is already a function {function_name}
+        SignatureError: if {function_name} is a variable
     """
     functions = LoadFunctions()
 
     if function_name in functions:
-        flash(f"ERROR: There is already a function with the name {function_name} in our dictionary!", category="error")
-        return
+        raise DuplicateError(f"There is already a function with the name {function_name} in our dictionary!")
     
     variables = LoadVariables()
     
     if function_name in variables:
-        flash(f"ERROR: There is already a variable with the name {function_name}!", category="error")
-        return
+        raise SignatureError(f"There is already a variable with the name {function_name}!")
 
     functions[function_name] = function_arity
     
@@ -75,12 +94,14 @@ def DeleteFunction(function_name: str, verbose: bool = True) -> None:
     Args:
         function_name (str): name of the function to delete (the key in the dictionary)
         verbose (bool): if True, will flash messages to website
+
+    Raises:
+        NotFoundError: if there is no function {function_name}
     """
     functions = LoadFunctions()
 
     if function_name not in functions:
-        flash(f"ERROR: There is no function with the name {function_name} in our dictionary!", category="error")
-        return
+        raise NotFoundError(f"There is no function with the name {function_name} in our dictionary!")
 
     functions.pop(function_name)
     
@@ -88,16 +109,36 @@ def DeleteFunction(function_name: str, verbose: bool = True) -> None:
     if verbose:
         flash(f"Successfully deleted function {function_name}!")
     
-    if CheckFunctionInTerm(function_name):
-        DeleteTerms()
+    deleted_terms = DeleteTermsWithSymbol(function_name)
+    if deleted_terms:
+        flash(f"WARNING: Deleted the terms {', '.join(deleted_terms)} because they use function {function_name}!")
 
 
 def CheckFunctionInTerm(function_name: str) -> bool:
-    terms = LoadAllTerms()
-    
-    for _, term in terms.values():
-        flatTerm = FlattenList(term)
-        if function_name in flatTerm:
-            return True
+    return bool(LoadTermNamesBySymbol(function_name))
+
+
+def CheckFunctionArityInTerm(term: List, function_name: str, function_arity: int) -> bool:
+    """
+    This function checks that every occurrence of {function_name} in {term} has {function_arity} arguments.
+
+    Args:
+        term (List): list of lists representing a term
+        function_name (str): name of the function
+        function_arity (int): the expected arity of the function
+
+    Returns:
+        bool: returns True if the function is always used with that arity
+    """
+    for index, element in enumerate(term):
+        if type(element) == list:
+            if not CheckFunctionArityInTerm(element, function_name, function_arity):
+                return False
+        elif element == function_name:
+            has_arguments = index + 1 < len(term) and type(term[index + 1]) == list
+            arity = len([argument for argument in term[index + 1] if type(argument) != list]) if has_arguments else 0
+            
+            if arity != function_arity:
+                return False
     
-    return False
+    return True
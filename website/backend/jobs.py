@@ -0,0 +1,436 @@
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Optional, List, Dict
+from .exceptions import TermRewritingError, CompletionCancelled, NotFoundError
+from .signature import Signature
+from .orderings import ReductionOrdering
+from .critical_pairs import SMALLEST_FIRST
+from .trace import Tracer, INFO
+from .profiling import Profile, Profiling
+
+
+# states of a completion job
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded" # the procedure finished, whether it found a convergent system or not
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# the columns of the state of a job; its owner and heartbeat are only used by the store
+_COLUMNS = ("id", "status", "created", "updated", "iterations", "rules", "pending", "convergent", "result", "error", "cancel")
+
+# how often a JobManager marks its unfinished jobs as alive, and how long a job may go without it before it counts as lost
+HEARTBEAT_INTERVAL = 5.0
+STALE_AFTER = 30.0
+
+
+class JobStore:
+    """
+    SQLite table with the state and progress of the completion jobs.
+
+    Every call opens its own connection, so the store can be shared between the request threads
+    and the worker threads of a JobManager.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        with closing(self._Connect()) as connection, connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    iterations INTEGER NOT NULL DEFAULT 0,
+                    rules INTEGER NOT NULL DEFAULT 0,
+                    pending INTEGER NOT NULL DEFAULT 0,
+                    convergent INTEGER,
+                    result TEXT,
+                    error TEXT,
+                    cancel INTEGER NOT NULL DEFAULT 0,
+                    owner TEXT,
+                    heartbeat REAL
+                )""")
+
+            # the stores created before jobs had owners get the new columns
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("heartbeat", "REAL")):
+                if column not in columns:
+                    connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+    def _Connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def Create(self, jobId: str, owner: Optional[str] = None) -> None:
+        """
+        This function adds the job {jobId} to the store, in the QUEUED state.
+
+        Args:
+            jobId (str): the id of the new job
+            owner (Optional[str]): the JobManager which runs the job (see JobManager.owner)
+        """
+        now = time.time()
+        with closing(self._Connect()) as connection, connection:
+            connection.execute("INSERT INTO jobs (id, status, created, updated, owner, heartbeat) VALUES (?, ?, ?, ?, ?, ?)",
+                               (jobId, QUEUED, now, now, owner, now))
+
+    def Update(self, jobId: str, **fields) -> None:
+        """
+        This function overwrites the given columns of the job {jobId}.
+
+        Args:
+            jobId (str): the id of the job
+            fields: the new values, e.g. status, iterations, rules, pending, convergent, result or error
+        """
+        unknown = set(fields) - set(_COLUMNS[4:]) - {"status"}
+        if unknown:
+            raise ValueError(f"Unknown job fields {', '.join(sorted(unknown))}!")
+
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with closing(self._Connect()) as connection, connection:
+            connection.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), jobId))
+
+    def Get(self, jobId: str) -> Optional[Dict]:
+        """
+        This function returns the state of the job {jobId}.
+
+        Args:
+            jobId (str): the id of the job
+
+        Returns:
+            Optional[Dict]: the columns of the job, with the rules it found as a list of [input, output] pairs,
+            or None if there is no such job
+        """
+        with closing(self._Connect()) as connection:
+            row = connection.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (jobId,)).fetchone()
+
+        if row is None:
+            return None
+
+        job = dict(zip(_COLUMNS, row))
+        job["convergent"] = None if job["convergent"] is None else bool(job["convergent"])
+        job["result"] = None if job["result"] is None else json.loads(job["result"])
+        job["cancel"] = bool(job["cancel"])
+        return job
+
+    def RequestCancel(self, jobId: str) -> bool:
+        """
+        This function asks the job {jobId} to stop. A job which didn't start yet is cancelled right away.
+
+        Args:
+            jobId (str): the id of the job
+
+        Returns:
+            bool: returns True if the job was still queued or running
+        """
+        with closing(self._Connect()) as connection, connection:
+            cursor = connection.execute("UPDATE jobs SET cancel = 1, updated = ? WHERE id = ? AND status IN (?, ?)",
+                                        (time.time(), jobId, QUEUED, RUNNING))
+            connection.execute("UPDATE jobs SET status = ? WHERE id = ? AND status = ?", (CANCELLED, jobId, QUEUED))
+
+        return cursor.rowcount > 0
+
+    def IsCancelRequested(self, jobId: str) -> bool:
+        """
+        This function checks if someone asked the job {jobId} to stop.
+
+        Args:
+            jobId (str): the id of the job
+
+        Returns:
+            bool: returns True if the job has to stop
+        """
+        with closing(self._Connect()) as connection:
+            row = connection.execute("SELECT cancel FROM jobs WHERE id = ?", (jobId,)).fetchone()
+
+        return row is not None and bool(row[0])
+
+    def Heartbeat(self, owner: str) -> int:
+        """
+        This function marks the unfinished jobs of {owner} as alive.
+
+        Args:
+            owner (str): the JobManager which runs the jobs
+
+        Returns:
+            int: the number of jobs which were marked
+        """
+        with closing(self._Connect()) as connection, connection:
+            cursor = connection.execute("UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status IN (?, ?)",
+                                        (time.time(), owner, QUEUED, RUNNING))
+
+        return cursor.rowcount
+
+    def FailInterrupted(self, owner: Optional[str] = None, staleAfter: float = STALE_AFTER) -> int:
+        """
+        This function marks as failed the queued or running jobs whose JobManager is gone: its process
+        doesn't exist anymore (if it ran on this host), or it didn't mark the job as alive for {staleAfter} seconds.
+        The jobs of {owner} and of the other live managers sharing the store are left alone.
+
+        Args:
+            owner (Optional[str]): the JobManager asking, whose jobs are never failed
+            staleAfter (float): how many seconds a job may go without a heartbeat
+
+        Returns:
+            int: the number of jobs which were marked as failed
+        """
+        now = time.time()
+        failed = 0
+        with closing(self._Connect()) as connection, connection:
+            rows = connection.execute("SELECT id, owner, COALESCE(heartbeat, updated) FROM jobs WHERE status IN (?, ?)",
+                                      (QUEUED, RUNNING)).fetchall()
+
+            for jobId, jobOwner, heartbeat in rows:
+                if jobOwner is not None and jobOwner == owner:
+                    continue
+                if heartbeat >= now - staleAfter and not _IsOwnerGone(jobOwner):
+                    continue
+
+                # the job is only failed if its owner didn't mark it as alive in the meantime
+                cursor = connection.execute("UPDATE jobs SET status = ?, error = ?, updated = ? "
+                                            "WHERE id = ? AND status IN (?, ?) AND COALESCE(heartbeat, updated) = ?",
+                                            (FAILED, "The server running the job stopped before the job finished.", now,
+                                             jobId, QUEUED, RUNNING, heartbeat))
+                failed += cursor.rowcount
+
+        return failed
+
+
+def NewOwner() -> str:
+    """
+    This function returns a new owner for the jobs of a JobManager: the host, the process id and a token
+    which tells apart two processes which got the same id.
+
+    Returns:
+        str: the owner, as "{host}:{pid}:{token}"
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+
+
+def _IsOwnerGone(owner: Optional[str]) -> bool:
+    # only the processes of this host can be checked, the others are judged by their heartbeats
+    if owner is None or os.name != "posix":
+        return False
+
+    host, pid, _ = owner.rsplit(":", 2)
+    if host != socket.gethostname():
+        return False
+
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (PermissionError, ValueError):
+        return False
+
+    return False
+
+
+class JobManager:
+    """
+    Runs completion jobs on a local thread pool, keeping their state in a JobStore.
+
+    The running procedure reports its progress through a callback, which writes it to the store
+    (at most once every {progressInterval} seconds) and stops the run once a cancellation was requested.
+    If {traceDirectory} is set, every job writes the trace of its run to {traceDirectory}/{jobId}.jsonl.
+    Every job runs its procedure with {processes} worker processes, so {maxWorkers} jobs use at most
+    {maxWorkers} * {processes} cores; the default of 1 keeps the whole job in the thread.
+
+    Several managers (e.g. the processes of a web server) may share the store. Every manager marks its
+    unfinished jobs as alive every {heartbeatInterval} seconds, and fails the jobs of the managers which are gone
+    (see JobStore.FailInterrupted) when it starts and with every heartbeat.
+    """
+
+    def __init__(self, store: JobStore, maxWorkers: int = 2, progressInterval: float = 0.5,
+                 traceDirectory: Optional[str] = None, traceLevel: int = INFO, processes: int = 1,
+                 heartbeatInterval: float = HEARTBEAT_INTERVAL, staleAfter: float = STALE_AFTER):
+        self.store = store
+        self.owner = NewOwner()
+        self.heartbeatInterval = heartbeatInterval
+        self.staleAfter = staleAfter
+        self.processes = processes
+        self.progressInterval = progressInterval
+        self.traceDirectory = traceDirectory
+        self.traceLevel = traceLevel
+        self._executor = ThreadPoolExecutor(max_workers=maxWorkers, thread_name_prefix="completion")
+        self._stopped = threading.Event()
+
+        store.FailInterrupted(self.owner, staleAfter)
+        threading.Thread(target=self._Heartbeat, name="completion-heartbeat", daemon=True).start()
+
+    def Submit(self, identities: List, times: int, signature: Signature, ordering: Optional[ReductionOrdering] = None,
+               heuristic: str = SMALLEST_FIRST, profile: bool = False) -> str:
+        """
+        This function queues the completion of {identities}.
+
+        Args:
+            identities (List): the identities to complete
+            times (int): the generation budget given to DetermineCompleteness
+            signature (Signature): the functions and variables of our language
+            ordering (Optional[ReductionOrdering]): the ordering used to orient the identities
+            heuristic (str): the selection heuristic of the critical pair queue
+            profile (bool): if True, the engine functions are profiled during the run, see GetProfile(jobId)
+
+        Returns:
+            str: the id of the new job
+        """
+        jobId = uuid.uuid4().hex
+        self.store.Create(jobId, self.owner)
+        self._executor.submit(self._Run, jobId, list(identities), times, signature.Copy(), ordering, heuristic, profile)
+        return jobId
+
+    def Get(self, jobId: str) -> Dict:
+        """
+        This function returns the state of the job {jobId}.
+
+        Args:
+            jobId (str): the id of the job
+
+        Returns:
+            Dict: the state of the job, as returned by JobStore.Get
+
+        Raises:
+            NotFoundError: if there is no such job
+        """
+        job = self.store.Get(jobId)
+        if job is None:
+            raise NotFoundError(f"There is no completion job with the id {jobId}!")
+
+        return job
+
+    def Cancel(self, jobId: str) -> Dict:
+        """
+        This function asks the job {jobId} to stop and returns its state.
+
+        Args:
+            jobId (str): the id of the job
+
+        Returns:
+            Dict: the state of the job, as returned by JobStore.Get
+
+        Raises:
+            NotFoundError: if there is no such job
+        """
+        self.Get(jobId)
+        self.store.RequestCancel(jobId)
+        return self.Get(jobId)
+
+    def TracePath(self, jobId: str) -> Optional[str]:
+        """
+        This function returns the path of the trace of the job {jobId}.
+
+        Args:
+            jobId (str): the id of the job
+
+        Returns:
+            Optional[str]: the path of the trace, or None if the jobs aren't traced
+        """
+        if self.traceDirectory is None:
+            return None
+
+        return os.path.join(self.traceDirectory, f"{jobId}.jsonl")
+
+    def Shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+        if wait: # otherwise the running jobs still need their heartbeats
+            self._stopped.set()
+
+    def _Heartbeat(self) -> None:
+        while not self._stopped.wait(self.heartbeatInterval):
+            try:
+                self.store.Heartbeat(self.owner)
+                self.store.FailInterrupted(self.owner, self.staleAfter)
+            except sqlite3.Error:
+                pass # the database is busy, the next heartbeat tries again
+
+    def _Run(self, jobId: str, identities: List, times: int, signature: Signature,
+             ordering: Optional[ReductionOrdering], heuristic: str, profile: bool = False) -> None:
+        from .backend import DetermineCompleteness # the backend module imports everything, so it is loaded lazily
+
+        if self.store.IsCancelRequested(jobId):
+            self.store.Update(jobId, status=CANCELLED)
+            return
+
+        self.store.Update(jobId, status=RUNNING)
+        lastReport = time.monotonic()
+        latest = {"iterations": 0, "pending": 0} # the last progress reported by the procedure
+
+        def Progress(iterations: int, rules: int, pending: int) -> None:
+            nonlocal lastReport
+
+            latest["iterations"] = iterations
+            latest["pending"] = pending
+
+            now = time.monotonic()
+            if now - lastReport < self.progressInterval:
+                return
+            lastReport = now
+
+            self.store.Update(jobId, iterations=iterations, rules=rules, pending=pending)
+            if self.store.IsCancelRequested(jobId):
+                raise CompletionCancelled("The completion job was cancelled!")
+
+        tracePath = self.TracePath(jobId)
+        tracer = Tracer(tracePath, self.traceLevel, context={"job": jobId}) if tracePath else None
+
+        try:
+            with Profiling(Profile("completion job", jobId)) if profile else contextlib.nullcontext():
+                convergent, rules = DetermineCompleteness(identities, times, ordering=ordering, heuristic=heuristic,
+                                                          signature=signature, progress=Progress, processes=self.processes,
+                                                          tracer=tracer)
+
+            if convergent:
+                latest["pending"] = 0 # every critical pair was processed
+        except CompletionCancelled:
+            self.store.Update(jobId, status=CANCELLED, **latest)
+        except TermRewritingError as e:
+            self.store.Update(jobId, status=FAILED, error=str(e))
+        except Exception as e:
+            self.store.Update(jobId, status=FAILED, error=f"Unexpected error: {e!r}")
+            raise
+        else:
+            self.store.Update(jobId, status=SUCCEEDED, convergent=int(bool(convergent)), rules=len(rules), **latest,
+                              result=[list(rule) for rule in rules])
+        finally:
+            if tracer is not None:
+                tracer.Close()
+
+
+_MANAGERS = {} # database path -> JobManager
+_MANAGERS_LOCK = threading.Lock()
+
+
+def GetJobManager(path: str, traceDirectory: Optional[str] = None, traceLevel: int = INFO, processes: int = 1) -> JobManager:
+    """
+    This function returns the job manager which keeps its jobs in the database at {path}, creating it the first time.
+
+    Args:
+        path (str): path of the SQLite database
+        traceDirectory (Optional[str]): the directory of the traces of the jobs. If None, the jobs aren't traced
+        traceLevel (int): the lowest level of the events written to the traces
+        processes (int): the number of worker processes of every job
+
+    Returns:
+        JobManager: the job manager of that database
+    """
+    with _MANAGERS_LOCK:
+        manager = _MANAGERS.get(path)
+        if manager is None:
+            manager = JobManager(JobStore(path), traceDirectory=traceDirectory, traceLevel=traceLevel, processes=processes)
+            _MANAGERS[path] = manager
+
+    return manager
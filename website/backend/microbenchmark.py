@@ -0,0 +1,294 @@
+import argparse
+import json
+import math
+import random
+import sys
+import timeit
+from typing import Optional, List, Dict, Tuple, Callable
+from .signature import Signature
+from .term import Term, Variable, Function, TermToList, TermToString, TermToTree
+from .orderings import Precedence
+from .positions import Position
+
+
+# the primitives which are measured
+PRIMITIVES = ("CreateTree", "ChangeTreeToList", "ChangeListToTree", "CreateInputStringFromTree", "FlattenList",
+              "GetSubtermAtPosition", "ReplaceSubtermAtPosition", "GetAllFunctionPositions",
+              "ApplySubstitution", "LexicographicPathOrdering")
+
+# how the cost of a primitive should grow with the size of the terms (size ** k): linearly, except for the path
+# ordering, which may compare every pair of subterms of its two terms
+EXPECTED_EXPONENTS = {"LexicographicPathOrdering": 2.0}
+# how far above its expected exponent a primitive may get before it is reported
+DEFAULT_TOLERANCE = 0.5
+
+# constant of the random signatures which never appears in the random terms, so a rule with it as its input
+# has to look at the whole term before it gives up
+_UNUSED_CONSTANT = "u"
+
+
+def RandomSignature(width: int = 3, variables: int = 3) -> Signature:
+    """
+    This function builds a signature for random terms: one function of every arity from 1 to {width}
+    (f1, f2, ...), the constants a and b, and the variables x1, x2, ... . The functions with a higher
+    arity are greater in the precedence.
+
+    Args:
+        width (int): the largest arity
+        variables (int): the number of variables
+
+    Returns:
+        Signature: the signature
+    """
+    functions = {_UNUSED_CONSTANT: 0, "a": 0, "b": 0}
+    functions.update({f"f{arity}": arity for arity in range(1, width + 1)})
+    precedences = {symbol: index for index, symbol in enumerate(functions)}
+
+    return Signature(functions, [f"x{index}" for index in range(1, variables + 1)], precedences)
+
+
+def RandomTerm(signature: Signature, depth: int, rng: Optional[random.Random] = None) -> Term:
+    """
+    This function builds a random term of exactly {depth} levels below the root (a leaf has depth 0) over
+    the functions and variables of {signature}. One argument of every function goes down to the full depth and
+    the others at least half of it, so the size of the terms grows steadily with {depth}.
+
+    Args:
+        signature (Signature): the functions and variables to build the term with
+        depth (int): the depth of the term
+        rng (Optional[random.Random]): the source of randomness. If None, a new one with seed 0 is used
+
+    Returns:
+        Term: the interned term
+    """
+    rng = random.Random(0) if rng is None else rng
+    functions = sorted(symbol for symbol, arity in signature.functions.items() if arity > 0)
+    leaves = sorted(signature.variables) + sorted(symbol for symbol, arity in signature.functions.items()
+                                                  if arity == 0 and symbol != _UNUSED_CONSTANT)
+
+    def Build(depth: int) -> Term:
+        if depth == 0 or not functions:
+            symbol = rng.choice(leaves)
+            return Variable(symbol) if symbol in signature.variables else Function(symbol)
+
+        symbol = rng.choice(functions)
+        arity = signature.functions[symbol]
+        deepest = rng.randrange(arity)
+        return Function(symbol, [Build(depth - 1 if index == deepest else rng.randint(depth // 2, depth - 1))
+                                 for index in range(arity)])
+
+    return Build(depth)
+
+
+def DeepestPosition(term: Term) -> Position:
+    """
+    This function returns the position of one of the deepest leaves of {term}.
+
+    Args:
+        term (Term): the term
+
+    Returns:
+        Position: the position (e.g. (2, 1, 3)), () for the root
+    """
+    depths = {}
+    def Depth(term: Term) -> int:
+        if term not in depths:
+            depths[term] = 1 + max((Depth(argument) for argument in term.arguments), default=-1)
+        return depths[term]
+
+    position = []
+    while term.arguments:
+        index = max(range(len(term.arguments)), key=lambda index: Depth(term.arguments[index]))
+        position.append(index + 1)
+        term = term.arguments[index]
+
+    return tuple(position)
+
+
+def _Primitives() -> Dict[str, Callable[[Term, Term, Signature], Tuple[Callable, tuple]]]:
+    from . import backend # the backend module imports everything, so it is loaded lazily
+
+    # every entry prepares, outside of the timing, the arguments of one call from two random terms of the same depth
+    return {
+        "CreateTree": lambda term, other, signature: (backend.CreateTree, (TermToString(term), signature)),
+        "ChangeTreeToList": lambda term, other, signature: (backend.ChangeTreeToList, (TermToTree(term),)),
+        "ChangeListToTree": lambda term, other, signature: (backend.ChangeListToTree, (TermToList(term),)),
+        "CreateInputStringFromTree": lambda term, other, signature: (backend.CreateInputStringFromTree, (TermToTree(term),)),
+        "FlattenList": lambda term, other, signature: (backend.FlattenList, (TermToList(term),)),
+        "GetSubtermAtPosition": lambda term, other, signature: (backend.GetSubtermAtPosition,
+                                                                (TermToList(term), DeepestPosition(term))),
+        "ReplaceSubtermAtPosition": lambda term, other, signature: (backend.ReplaceSubtermAtPosition,
+                                                                    (TermToList(term), TermToList(other), DeepestPosition(term))),
+        "GetAllFunctionPositions": lambda term, other, signature: (backend.GetAllFunctionPositions,
+                                                                   (TermToList(term), signature)),
+        "ApplySubstitution": lambda term, other, signature: (backend.ApplySubstitution,
+                                                             ((_UNUSED_CONSTANT, "a"), TermToList(term), signature)),
+        "LexicographicPathOrdering": lambda term, other, signature: (backend.LexicographicPathOrdering,
+                                                                     (TermToList(term), TermToList(other),
+                                                                      Precedence(signature.precedences), signature)),
+    }
+
+
+def TimeCall(function: Callable, arguments: tuple, minTime: float = 0.05, repeat: int = 3) -> Tuple[float, int]:
+    """
+    This function measures the cost of one call of {function} with {arguments}, the way timeit does: the number of
+    calls in a batch grows until a batch takes at least {minTime} seconds, and the fastest of {repeat} batches is kept.
+
+    Args:
+        function (Callable): the function to time
+        arguments (tuple): its arguments
+        minTime (float): the shortest duration of a batch, in seconds
+        repeat (int): the number of batches
+
+    Returns:
+        Tuple[float, int]: the seconds per call and the number of calls in a batch
+    """
+    timer = timeit.Timer(lambda: function(*arguments))
+    number = 1
+    while True:
+        seconds = timer.timeit(number)
+        if seconds >= minTime:
+            break
+        number *= 2 if seconds <= 0 else max(2, min(10, math.ceil(minTime / seconds)))
+
+    best = min([seconds] + timer.repeat(repeat - 1, number)) if repeat > 1 else seconds
+    return (best / number, number)
+
+
+def ScalingExponent(points: List[Tuple[int, float]]) -> Optional[float]:
+    """
+    This function fits cost = c * size ** k to the measurements by least squares on their logarithms.
+
+    Args:
+        points (List[Tuple[int, float]]): (size of the term, seconds per call) pairs
+
+    Returns:
+        Optional[float]: the exponent k (about 1 for a linear primitive, 2 for a quadratic one),
+        or None if there are fewer than two distinct sizes
+    """
+    points = [(math.log(size), math.log(seconds)) for size, seconds in points if size > 0 and seconds > 0]
+    if len({x for x, _ in points}) < 2:
+        return None
+
+    meanX = sum(x for x, _ in points) / len(points)
+    meanY = sum(y for _, y in points) / len(points)
+    return (sum((x - meanX) * (y - meanY) for x, y in points) /
+            sum((x - meanX) ** 2 for x, _ in points))
+
+
+def BenchmarkPrimitive(name: str, depths: List[int], width: int = 3, seed: int = 0, samples: int = 8,
+                       minTime: float = 0.05, repeat: int = 3) -> Tuple[List[Dict], Optional[float]]:
+    """
+    This function measures the per-call cost of the primitive {name} on random terms of every depth of {depths}.
+    The size of a random term varies a lot for the same depth, so every depth is measured on {samples} terms
+    and the cost and the size are averaged over them.
+
+    Args:
+        name (str): one of PRIMITIVES
+        depths (List[int]): the depths of the terms, in increasing order
+        width (int): the largest arity of the random signature
+        seed (int): the seed of the random terms, so that two runs measure the same terms
+        samples (int): the number of random terms of every depth
+        minTime (float): the shortest duration of a batch of calls, in seconds
+        repeat (int): the number of batches at every depth
+
+    Returns:
+        Tuple[List[Dict], Optional[float]]: one measurement per depth (primitive, depth, size, seconds, calls),
+        with the average size of the terms and the average seconds per call, and the scaling exponent of the cost in the size of the terms
+
+    Raises:
+        KeyError: if there is no primitive called {name}
+    """
+    prepare = _Primitives()[name]
+    signature = RandomSignature(width)
+    rng = random.Random(seed)
+
+    measurements = []
+    for depth in depths:
+        terms = [RandomTerm(signature, depth, rng) for _ in range(2 * samples)]
+        prepared = [prepare(term, other, signature) for term, other in zip(terms[::2], terms[1::2])]
+
+        def CallAll() -> None:
+            for function, arguments in prepared:
+                function(*arguments)
+
+        seconds, batches = TimeCall(CallAll, (), minTime, repeat)
+        measurements.append({"primitive": name, "depth": depth, "size": sum(term.size for term in terms[::2]) / samples,
+                             "seconds": seconds / samples, "calls": batches * samples})
+
+    return (measurements, ScalingExponent([(measurement["size"], measurement["seconds"]) for measurement in measurements]))
+
+
+def Main(argv: Optional[List[str]] = None) -> int:
+    """
+    This function is the command line interface of the micro-benchmarks of the term primitives:
+
+        python -m website.backend.microbenchmark --max-depth 10 -o primitives.jsonl
+
+    Every primitive is timed on random terms of growing depth. The measurements are written as JSON lines, one
+    per primitive and depth, followed by one line per primitive with its scaling exponent. A table goes to the
+    standard error, and the exit code is 1 if the cost of some primitive grows faster than its EXPECTED_EXPONENTS
+    (linear by default) allow, give or take --tolerance.
+
+    Args:
+        argv (Optional[List[str]]): the arguments. If None, the ones of the process are used
+
+    Returns:
+        int: the exit code
+    """
+    parser = argparse.ArgumentParser(prog="python -m website.backend.microbenchmark",
+                                     description="Measure the per-call cost of the term primitives on random terms.")
+    parser.add_argument("--primitive", choices=PRIMITIVES, action="append",
+                        help="a primitive to measure, may be repeated (default: all of them)")
+    parser.add_argument("--min-depth", type=int, default=2, help="the depth of the smallest terms (default: %(default)s)")
+    parser.add_argument("--max-depth", type=int, default=9, help="the depth of the largest terms (default: %(default)s)")
+    parser.add_argument("--width", type=int, default=3, help="the largest arity of the random functions (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the random terms (default: %(default)s)")
+    parser.add_argument("--samples", type=int, default=8, help="the number of random terms of every depth (default: %(default)s)")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="the shortest duration of a batch of calls, in seconds (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="the number of batches at every depth (default: %(default)s)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="how far above its expected scaling exponent a primitive may get (default: %(default)s)")
+    parser.add_argument("-o", "--output", help="the file to write the measurements to (default: standard output)")
+    args = parser.parse_args(argv)
+
+    if args.width < 1 or args.samples < 1 or args.min_depth < 0 or args.max_depth < args.min_depth:
+        parser.error("the width and the samples have to be positive and the depths have to form a range")
+
+    depths = list(range(args.min_depth, args.max_depth + 1))
+    records = []
+    summaries = []
+    for name in args.primitive or PRIMITIVES:
+        measurements, exponent = BenchmarkPrimitive(name, depths, args.width, args.seed, args.samples, args.min_time,
+                                                     args.repeat)
+        records += measurements
+        summaries.append({"primitive": name, "exponent": exponent})
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        output.writelines(json.dumps(record) + "\n" for record in records + summaries)
+    finally:
+        if args.output:
+            output.close()
+
+    sizes = [record["size"] for record in records if record["primitive"] == records[0]["primitive"]] # the same terms for every primitive
+    print(f"{'primitive':<26} " + " ".join(f"{size:>9.0f}" for size in sizes) + f" {'exponent':>9}", file=sys.stderr)
+    slow = []
+    for summary in summaries:
+        costs = [f"{record['seconds'] * 1e6:>7.1f}us" for record in records if record["primitive"] == summary["primitive"]]
+        exponent = summary["exponent"]
+        print(f"{summary['primitive']:<26} " + " ".join(costs) + (f" {exponent:>9.2f}" if exponent is not None else ""),
+              file=sys.stderr)
+        expected = EXPECTED_EXPONENTS.get(summary["primitive"], 1.0)
+        if exponent is not None and exponent > expected + args.tolerance:
+            slow.append((summary["primitive"], expected))
+
+    for name, expected in slow:
+        print(f"TOO SLOW: {name} grows faster than size ** {expected + args.tolerance}", file=sys.stderr)
+
+    return 1 if slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(Main())
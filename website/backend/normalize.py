@@ -0,0 +1,390 @@
+import os
+from collections import OrderedDict
+from typing import Optional, Iterable, Iterator, Union, Dict, List, Tuple
+from .term import Term
+from .signature import Signature, GetSignature
+from .rules import CompiledRule, CompileRule
+from .discrimination_tree import DiscriminationTree
+from .profiling import Profiled, NORMALIZATION
+
+
+INNERMOST = "innermost"
+OUTERMOST = "outermost"
+LEFTMOST_OUTERMOST = "leftmost-outermost"
+STRATEGIES = (INNERMOST, OUTERMOST, LEFTMOST_OUTERMOST)
+
+
+class Normalizer:
+    """
+    Rewrites terms to normal form under a fixed set of rules, following a rewriting strategy:
+        - innermost: arguments are normalized before trying the rules at the root
+        - outermost: the rules are tried at the root first, then the arguments are normalized
+        - leftmost-outermost: one step at a time, at the leftmost-outermost redex
+
+    Terms are hash-consed, so every subterm already rewritten is remembered together with its
+    normal form (normal forms are mapped to themselves). Shared or repeated subterms are therefore
+    normalized only once, and subterms known to be in normal form are never visited again.
+    A Normalizer must not be reused once its rules change, but a NormalFormCache can be shared
+    between normalizers to remember normal forms across rule set changes.
+    """
+
+    def __init__(self, rules: Union[DiscriminationTree, Iterable], strategy: str = INNERMOST,
+                 cache: Optional["NormalFormCache"] = None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown rewriting strategy {strategy}! Expected one of {', '.join(STRATEGIES)}.")
+
+        self.ruleTree = rules if isinstance(rules, DiscriminationTree) else DiscriminationTree(rules)
+        self.strategy = strategy
+        self.normalForms = {}
+        self.cache = cache
+        self.usedRules = set() # every rule applied by this normalizer, so the cache knows what its entries depend on
+        self.steps = 0 # number of rewrite steps performed so far
+
+    @Profiled(NORMALIZATION)
+    def Normalize(self, term: Term) -> Term:
+        """
+        This function returns the normal form of {term}.
+
+        Args:
+            term (Term): the term to normalize
+
+        Returns:
+            Term: the normal form of the term
+        """
+        if self.cache is not None:
+            normalForm = self.cache.Get(term)
+            if normalForm is not None:
+                return normalForm
+
+        if self.strategy == INNERMOST:
+            normalForm = self._NormalizeInnermost(term)
+        elif self.strategy == OUTERMOST:
+            normalForm = self._NormalizeOutermost(term)
+        else:
+            normalForm = term
+            newTerm = self._RewriteLeftmostOutermost(normalForm)
+            while newTerm is not None:
+                normalForm = newTerm
+                newTerm = self._RewriteLeftmostOutermost(normalForm)
+
+        if self.cache is not None:
+            self.cache.Put(term, normalForm, self.usedRules)
+
+        return normalForm
+
+    def RewriteAtRoot(self, term: Term) -> Optional[Term]:
+        """
+        This function applies the first indexed rule which matches {term} at its root.
+
+        Args:
+            term (Term): the term to rewrite
+
+        Returns:
+            Optional[Term]: the rewritten term or None if no rule matches at the root
+        """
+        for rule in self.ruleTree.Retrieve(term):
+            bindings = rule.Match(term)
+
+            if bindings is not None:
+                self.steps += 1
+                self.usedRules.add(rule)
+                return rule.Instantiate(bindings)
+
+        return None
+
+    def _NormalizeArguments(self, term: Term, normalize) -> Term:
+        if not term.arguments:
+            return term
+
+        arguments = tuple(normalize(argument) for argument in term.arguments)
+        if arguments == term.arguments:
+            return term
+
+        return Term(term.value, arguments, term.isVariable)
+
+    def _NormalizeInnermost(self, term: Term) -> Term:
+        normalForm = self.normalForms.get(term)
+        if normalForm is not None:
+            return normalForm
+
+        curr_term = self._NormalizeArguments(term, self._NormalizeInnermost)
+
+        newTerm = self.RewriteAtRoot(curr_term)
+        normalForm = curr_term if newTerm is None else self._NormalizeInnermost(newTerm)
+
+        self.normalForms[term] = normalForm
+        self.normalForms[curr_term] = normalForm
+        return normalForm
+
+    def _NormalizeOutermost(self, term: Term) -> Term:
+        normalForm = self.normalForms.get(term)
+        if normalForm is not None:
+            return normalForm
+
+        curr_term = term
+        while True:
+            newTerm = self.RewriteAtRoot(curr_term)
+            if newTerm is not None:
+                curr_term = newTerm
+                continue
+
+            newTerm = self._NormalizeArguments(curr_term, self._NormalizeOutermost)
+            if newTerm is curr_term:
+                break # neither the root nor the arguments can be rewritten anymore
+
+            curr_term = newTerm
+
+        self.normalForms[term] = curr_term
+        self.normalForms[curr_term] = curr_term
+        return curr_term
+
+    def _RewriteLeftmostOutermost(self, term: Term) -> Optional[Term]:
+        if term in self.normalForms:
+            return None
+
+        newTerm = self.RewriteAtRoot(term)
+        if newTerm is not None:
+            return newTerm
+
+        for index, argument in enumerate(term.arguments):
+            newArgument = self._RewriteLeftmostOutermost(argument)
+
+            if newArgument is not None:
+                arguments = term.arguments[:index] + (newArgument,) + term.arguments[index + 1:]
+                return Term(term.value, arguments, term.isVariable)
+
+        self.normalForms[term] = term # no redex anywhere in this subterm
+        return None
+
+
+def Normalize(term: Term, rules: Union[DiscriminationTree, Iterable], strategy: str = INNERMOST) -> Term:
+    """
+    This function rewrites {term} with {rules} until no rule can be applied anymore.
+
+    Args:
+        term (Term): the term to normalize
+        rules (Union[DiscriminationTree, Iterable]): the rules to rewrite with, or an index over them
+        strategy (str): one of "innermost", "outermost" or "leftmost-outermost"
+
+    Returns:
+        Term: the normal form of {term}
+    """
+    return Normalizer(rules, strategy).Normalize(term)
+
+
+def NormalizeMany(pairs: List[Tuple[Term, Term]], rules: Iterable, strategy: str = INNERMOST,
+                  signature: Optional[Signature] = None, processes: Optional[int] = 1, minPairs: int = 256,
+                  cache: Optional["NormalFormCache"] = None, counters: Optional[Dict[str, int]] = None,
+                  pool: Optional["NormalizerPool"] = None) -> Iterator[Tuple[Term, Term]]:
+    """
+    This function rewrites both sides of every pair of {pairs} to normal form with {rules}.
+
+    If there are at least {minPairs} pairs, the work is shared between the worker processes of {pool}, which
+    are only sent the changes made to the rules since its last batch. Without a pool, if {processes} isn't 1,
+    a NormalizerPool is started for this batch alone. Otherwise the pairs are normalized in this process,
+    sharing {cache}. The normal forms are the same either way, and come out in the order of {pairs}.
+
+    Args:
+        pairs (List[Tuple[Term, Term]]): the pairs of terms to normalize
+        rules (Iterable): the rules to rewrite with, as (input, output) pairs or compiled rules
+        strategy (str): one of "innermost", "outermost" or "leftmost-outermost"
+        signature (Optional[Signature]): the functions and variables of our language
+        processes (Optional[int]): the number of worker processes, when {pool} isn't given. If None, one per core
+        minPairs (int): the smallest number of pairs which is worth sending to worker processes
+        cache (Optional[NormalFormCache]): normal forms remembered across calls, only used in this process
+        counters (Optional[Dict[str, int]]): if given, the rewrite steps performed are added to its "rewrite_steps"
+        pool (Optional[NormalizerPool]): the worker processes of the completion run, kept between batches
+
+    Returns:
+        Iterator[Tuple[Term, Term]]: the normal forms of the pairs
+    """
+    from .parallel import NormalizerPool # the worker pools import this module, so they are loaded lazily
+
+    signature = GetSignature(signature)
+    rules = [CompileRule(rule, signature) for rule in rules]
+    processes = processes if processes is not None else (os.cpu_count() or 1)
+
+    if len(pairs) >= minPairs and (pool is not None or processes > 1):
+        batchPool = pool if pool is not None else NormalizerPool(signature, strategy, processes)
+        steps = batchPool.steps
+        try:
+            yield from batchPool.NormalizeMany(pairs, rules)
+        finally:
+            if counters is not None:
+                counters["rewrite_steps"] = counters.get("rewrite_steps", 0) + batchPool.steps - steps
+            if pool is None:
+                batchPool.Close()
+        return
+
+    normalizer = Normalizer(rules, strategy, cache)
+    try:
+        for term1, term2 in pairs:
+            yield (normalizer.Normalize(term1), normalizer.Normalize(term2))
+    finally:
+        if counters is not None:
+            counters["rewrite_steps"] = counters.get("rewrite_steps", 0) + normalizer.steps
+
+
+class NormalFormCache:
+    """
+    Bounded LRU cache from (term, rule set version) to the normal form of the term.
+
+    The owner of the rule set has to call RuleAdded and RuleRemoved whenever the rules change.
+    Each change starts a new version, and only the entries it can actually affect are dropped:
+        - adding a rule drops the entries whose normal form can be rewritten by the new rule
+        - removing a rule drops the entries whose normal form was reached by applying it
+    Every other entry is carried over to the new version.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be greater than 0")
+
+        self.maxsize = maxsize
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict() # (term, version) -> (normal form, rules used to reach it)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return f"NormalFormCache(size={len(self)}, version={self.version}, hit_rate={self.HitRate():.2%})"
+
+    def Get(self, term: Term) -> Optional[Term]:
+        """
+        This function returns the cached normal form of {term} under the current rule set, if there is one.
+
+        Args:
+            term (Term): the term to look up
+
+        Returns:
+            Optional[Term]: the normal form of the term or None if it isn't cached
+        """
+        key = (term, self.version)
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def Put(self, term: Term, normalForm: Term, usedRules: Iterable[CompiledRule] = ()) -> None:
+        """
+        This function remembers {normalForm} as the normal form of {term} under the current rule set.
+
+        Args:
+            term (Term): the term which was normalized
+            normalForm (Term): its normal form
+            usedRules (Iterable[CompiledRule]): the rules applied to reach the normal form
+        """
+        key = (term, self.version)
+        self._entries[key] = (normalForm, frozenset(usedRules))
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def RuleAdded(self, rule) -> None:
+        """
+        This function moves the cache to a new rule set version after {rule} was added,
+        keeping only the normal forms which {rule} can't rewrite.
+
+        Args:
+            rule (Union[Tuple[str, str], CompiledRule]): the rule which was added
+        """
+        rule = CompileRule(rule)
+        self._NewVersion(lambda normalForm, usedRules: not IsReducibleBy(normalForm, rule))
+
+    def RuleRemoved(self, rule) -> None:
+        """
+        This function moves the cache to a new rule set version after {rule} was removed,
+        keeping only the normal forms which were reached without it.
+
+        Args:
+            rule (Union[Tuple[str, str], CompiledRule]): the rule which was removed
+        """
+        rule = CompileRule(rule)
+        self._NewVersion(lambda normalForm, usedRules: rule not in usedRules)
+
+    def Clear(self) -> None:
+        """
+        This function drops every entry and starts a new rule set version.
+        """
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self.version += 1
+
+    def HitRate(self) -> float:
+        """
+        This function returns the fraction of lookups which found a cached normal form.
+
+        Returns:
+            float: hits / lookups, or 0 if there were no lookups
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def Stats(self) -> Dict[str, float]:
+        """
+        This function returns the counters of the cache.
+
+        Returns:
+            Dict[str, float]: size, version, hits, misses, hit rate, evictions and invalidations
+        """
+        return {
+            "size": len(self._entries),
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.HitRate(),
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _NewVersion(self, keep) -> None:
+        oldVersion = self.version
+        self.version += 1
+
+        entries = OrderedDict()
+        for (term, version), (normalForm, usedRules) in self._entries.items():
+            if version == oldVersion and keep(normalForm, usedRules):
+                entries[(term, self.version)] = (normalForm, usedRules)
+            else:
+                self.invalidations += 1
+
+        self._entries = entries
+
+
+def IsReducibleBy(term: Term, rule: CompiledRule) -> bool:
+    """
+    This function checks if {rule} can rewrite {term} at any position.
+
+    Args:
+        term (Term): the term to check
+        rule (CompiledRule): the rule to try
+
+    Returns:
+        bool: returns True if some subterm of {term} matches the left-hand side of {rule}
+    """
+    seen = set()
+    stack = [term]
+    while stack:
+        curr_term = stack.pop()
+        if curr_term in seen:
+            continue
+        seen.add(curr_term)
+
+        if rule.Match(curr_term) is not None:
+            return True
+
+        stack.extend(curr_term.arguments)
+
+    return False
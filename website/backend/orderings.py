@@ -0,0 +1,357 @@
+from typing import Optional, Dict
+from .term import Term
+from .exceptions import OrderingError
+from .signature import Signature, GetSignature
+from .profiling import Profiled, ORDERING
+
+
+# results of comparing two terms
+GREATER = ">"
+LESS = "<"
+EQUAL = "="
+INCOMPARABLE = "?"
+
+
+class Precedence:
+    """
+    Precedence over the function symbols, given as a dictionary from symbol to an integer:
+    a symbol with a higher number is greater. Symbols which are missing from the dictionary
+    are only comparable to themselves.
+    """
+
+    def __init__(self, precedences: Optional[Dict[str, int]] = None):
+        self.precedences = dict(precedences) if precedences else {}
+
+    def __repr__(self) -> str:
+        return f"Precedence({self.precedences})"
+
+    def Compare(self, symbol1: str, symbol2: str) -> str:
+        """
+        This function compares two function symbols.
+
+        Args:
+            symbol1 (str): the first symbol
+            symbol2 (str): the second symbol
+
+        Returns:
+            str: GREATER, LESS, EQUAL or INCOMPARABLE
+        """
+        if symbol1 == symbol2:
+            return EQUAL
+
+        precedence1 = self.precedences.get(symbol1)
+        precedence2 = self.precedences.get(symbol2)
+
+        if precedence1 is None or precedence2 is None:
+            return INCOMPARABLE
+
+        if precedence1 > precedence2:
+            return GREATER
+
+        if precedence1 < precedence2:
+            return LESS
+
+        return EQUAL
+
+    @staticmethod
+    def FromSession() -> "Precedence":
+        """
+        This function builds the precedence saved in the current user session by ModifyPrecedence.
+
+        Returns:
+            Precedence: the precedence of our language
+        """
+        from .database import LoadPrecedences
+        return Precedence(LoadPrecedences())
+
+
+class ReductionOrdering:
+    """
+    Interface of the reduction orderings used to orient identities into rules.
+
+    Implementations only have to provide Greater; Compare is derived from it.
+    """
+    name = ""
+
+    @Profiled(ORDERING)
+    def Compare(self, term1: Term, term2: Term) -> str:
+        """
+        This function compares {term1} and {term2}.
+
+        Args:
+            term1 (Term): the first term
+            term2 (Term): the second term
+
+        Returns:
+            str: GREATER, LESS, EQUAL or INCOMPARABLE
+        """
+        if term1 is term2:
+            return EQUAL
+
+        if self.Greater(term1, term2):
+            return GREATER
+
+        if self.Greater(term2, term1):
+            return LESS
+
+        return INCOMPARABLE
+
+    def Greater(self, term1: Term, term2: Term) -> bool:
+        """
+        This function checks if {term1} > {term2} in this ordering.
+
+        Args:
+            term1 (Term): the first term
+            term2 (Term): the second term
+
+        Returns:
+            bool: returns True if term1 > term2
+        """
+        raise NotImplementedError
+
+
+class LexicographicPathOrder(ReductionOrdering):
+    """
+    Lexicographic path ordering induced by a precedence.
+
+    Every comparison s > t which is computed is remembered for pairs of (interned) subterms,
+    so comparing s and t costs O(|s| * |t|) pair checks instead of exponential time.
+    The memo is kept for the lifetime of the object, which makes it cheap to reuse the same
+    ordering over a whole completion run.
+    """
+
+    name = "lpo"
+
+    def __init__(self, precedence: Precedence):
+        self.precedence = precedence
+        self._greater = {}   # (s, t) -> s > t
+        self._variables = {} # term -> set of variables of the term
+
+    def __repr__(self) -> str:
+        return f"LexicographicPathOrder({self.precedence})"
+
+    def Greater(self, term1: Term, term2: Term) -> bool:
+        """
+        This function checks if {term1} > {term2} in the lexicographic path ordering.
+
+        Args:
+            term1 (Term): the first term
+            term2 (Term): the second term
+
+        Returns:
+            bool: returns True if term1 > term2
+        """
+        key = (term1, term2)
+        result = self._greater.get(key)
+
+        if result is None:
+            result = self._Greater(term1, term2)
+            self._greater[key] = result
+
+        return result
+
+    def _Greater(self, term1: Term, term2: Term) -> bool:
+        # LPO1
+        if term2.isVariable:
+            return term1 is not term2 and term2 in self._GetVariables(term1)
+
+        if term1.isVariable:
+            return False
+
+        # LPO2a) some argument of term1 is greater or equal to term2
+        for argument in term1.arguments:
+            if argument is term2 or self.Greater(argument, term2):
+                return True
+
+        comparison = self.precedence.Compare(term1.value, term2.value)
+
+        # LPO2b) the head of term1 is greater and term1 is greater than every argument of term2
+        if comparison == GREATER:
+            return all(self.Greater(term1, argument) for argument in term2.arguments)
+
+        # LPO2c) same head, term1 is greater than every argument of term2 and the arguments are lexicographically greater
+        if comparison == EQUAL and len(term1.arguments) == len(term2.arguments):
+            if not all(self.Greater(term1, argument) for argument in term2.arguments):
+                return False
+
+            for argument1, argument2 in zip(term1.arguments, term2.arguments):
+                if argument1 is not argument2:
+                    return self.Greater(argument1, argument2)
+
+        return False
+
+    def _GetVariables(self, term: Term) -> frozenset:
+        variables = self._variables.get(term)
+
+        if variables is None:
+            if term.isVariable:
+                variables = frozenset((term,))
+            else:
+                variables = frozenset().union(*(self._GetVariables(argument) for argument in term.arguments))
+            self._variables[term] = variables
+
+        return variables
+
+
+class KnuthBendixOrder(ReductionOrdering):
+    """
+    Knuth-Bendix ordering induced by a weight function and a precedence.
+
+    Every function symbol has a non-negative weight (1 if not given) and every variable has the
+    weight {variableWeight}. The weight and the variable occurrences of every subterm are computed
+    only once, so comparing two terms takes linear time in their size.
+    """
+    name = "kbo"
+
+    def __init__(self, precedence: Precedence, weights: Optional[Dict[str, int]] = None, variableWeight: int = 1):
+        if variableWeight <= 0:
+            raise OrderingError("The weight of the variables must be greater than 0!")
+
+        self.precedence = precedence
+        self.weights = dict(weights) if weights else {}
+        self.variableWeight = variableWeight
+        self._weight = {}      # term -> weight of the term
+        self._occurrences = {} # term -> {variable: number of occurrences}
+        self._greater = {}     # (s, t) -> s > t
+
+        for symbol, weight in self.weights.items():
+            if weight < 0:
+                raise OrderingError(f"The weight of {symbol} can't be negative!")
+
+    def __repr__(self) -> str:
+        return f"KnuthBendixOrder({self.precedence}, {self.weights}, {self.variableWeight})"
+
+    def CheckAdmissible(self, functions: Dict[str, int]) -> None:
+        """
+        This function checks that the weights are admissible for the functions of our language:
+        every constant weighs at least as much as a variable and a unary function of weight 0
+        has to be greater than every other function in the precedence.
+
+        Args:
+            functions (Dict[str, int]): the functions of our language and their arities
+
+        Raises:
+            OrderingError: if the weights are not admissible
+        """
+        for function, arity in functions.items():
+            weight = self.weights.get(function, 1)
+
+            if arity == 0 and weight < self.variableWeight:
+                raise OrderingError(f"The weight of the constant {function} can't be smaller than the weight of the variables!")
+
+            if arity == 1 and weight == 0:
+                for other in functions:
+                    if other != function and self.precedence.Compare(function, other) != GREATER:
+                        raise OrderingError(f"The unary function {function} of weight 0 must be greater than {other} in the precedence!")
+
+    def Greater(self, term1: Term, term2: Term) -> bool:
+        """
+        This function checks if {term1} > {term2} in the Knuth-Bendix ordering.
+
+        Args:
+            term1 (Term): the first term
+            term2 (Term): the second term
+
+        Returns:
+            bool: returns True if term1 > term2
+        """
+        key = (term1, term2)
+        result = self._greater.get(key)
+
+        if result is None:
+            result = self._Greater(term1, term2)
+            self._greater[key] = result
+
+        return result
+
+    def _Greater(self, term1: Term, term2: Term) -> bool:
+        if term1 is term2 or term1.isVariable:
+            return False
+
+        # every variable has to occur in term1 at least as many times as in term2
+        occurrences1 = self._GetOccurrences(term1)
+        for variable, count in self._GetOccurrences(term2).items():
+            if occurrences1.get(variable, 0) < count:
+                return False
+
+        weight1 = self._GetWeight(term1)
+        weight2 = self._GetWeight(term2)
+
+        if weight1 != weight2:
+            return weight1 > weight2
+
+        if term2.isVariable: # term1 = f(f(...f(x)...)) with f unary of weight 0
+            return True
+
+        comparison = self.precedence.Compare(term1.value, term2.value)
+        if comparison == GREATER:
+            return True
+
+        if comparison == EQUAL and len(term1.arguments) == len(term2.arguments):
+            for argument1, argument2 in zip(term1.arguments, term2.arguments):
+                if argument1 is not argument2:
+                    return self.Greater(argument1, argument2)
+
+        return False
+
+    def _GetWeight(self, term: Term) -> int:
+        weight = self._weight.get(term)
+
+        if weight is None:
+            if term.isVariable:
+                weight = self.variableWeight
+            else:
+                weight = self.weights.get(term.value, 1) + sum(self._GetWeight(argument) for argument in term.arguments)
+            self._weight[term] = weight
+
+        return weight
+
+    def _GetOccurrences(self, term: Term) -> Dict[Term, int]:
+        occurrences = self._occurrences.get(term)
+
+        if occurrences is None:
+            if term.isVariable:
+                occurrences = {term: 1}
+            else:
+                occurrences = {}
+                for argument in term.arguments:
+                    for variable, count in self._GetOccurrences(argument).items():
+                        occurrences[variable] = occurrences.get(variable, 0) + count
+            self._occurrences[term] = occurrences
+
+        return occurrences
+
+
+ORDERINGS = (LexicographicPathOrder.name, KnuthBendixOrder.name)
+
+
+def LoadOrdering(name: Optional[str] = None, signature: Optional[Signature] = None) -> ReductionOrdering:
+    """
+    This function builds the ordering called {name} from the precedence and weights of {signature}.
+
+    Args:
+        name (Optional[str]): "lpo" or "kbo". If None, the ordering chosen in the signature is used
+        signature (Optional[Signature]): the signature of our language. If None, it is loaded from the session
+
+    Returns:
+        ReductionOrdering: the requested ordering
+
+    Raises:
+        OrderingError: if the name is unknown or the Knuth-Bendix weights are not admissible
+    """
+    signature = GetSignature(signature)
+
+    if name is None:
+        name = signature.ordering
+
+    precedence = Precedence(signature.precedences)
+
+    if name == LexicographicPathOrder.name:
+        return LexicographicPathOrder(precedence)
+
+    if name == KnuthBendixOrder.name:
+        ordering = KnuthBendixOrder(precedence, signature.weights)
+        ordering.CheckAdmissible(signature.functions)
+        return ordering
+
+    raise OrderingError(f"Unknown ordering {name}! Expected one of {', '.join(ORDERINGS)}.")
@@ -0,0 +1,285 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from typing import Optional, List, Tuple, Iterable, Iterator
+from .signature import Signature
+from .term import Term, ListToTerm, TermToList, EncodeTerm, DecodeTerm, GetTermVariables
+from .rules import CompileRule
+from .normalize import Normalizer, NormalFormCache, INNERMOST
+from .discrimination_tree import DiscriminationTree
+
+
+class OverlapPool:
+    """
+    Pool of worker processes which compute critical pairs in parallel.
+
+    The combinations of rules are split into contiguous chunks; every chunk is sent to a worker together with
+    the signature and only the rules it needs, as plain (input, output) strings. The workers send the critical
+    pairs back as compact term encodings, and the chunks are collected in order, so the result is exactly the
+    one of the sequential computation.
+    Workers are started with the "spawn" method, which is safe to use from the threads of the web server.
+    """
+
+    def __init__(self, processes: Optional[int] = None, minCombinations: int = 64, chunksPerProcess: int = 4):
+        self.processes = processes if processes is not None else (os.cpu_count() or 1)
+        self.minCombinations = minCombinations
+        self.chunksPerProcess = chunksPerProcess
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "OverlapPool":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.Close()
+
+    def IsWorthIt(self, combinations: int) -> bool:
+        """
+        This function checks if {combinations} overlaps are enough work to be shared between the processes.
+
+        Args:
+            combinations (int): the number of rule combinations to overlap
+
+        Returns:
+            bool: returns True if the pool should be used
+        """
+        return self.processes > 1 and combinations >= self.minCombinations
+
+    def Generate(self, rules: List, combinations: List[Tuple[int, int]], signature: Signature) -> List[List[Tuple[List, List]]]:
+        """
+        This function computes the critical pairs of every combination of rules, like GenerateCriticalPairsOfRules.
+        The variables the workers created while renaming rules apart are added to {signature}.
+
+        Args:
+            rules (List): the rules, as (input, output) pairs
+            combinations (List[Tuple[int, int]]): the pairs of rule indices to overlap
+            signature (Signature): the functions and variables of our language
+
+        Returns:
+            List[List[Tuple[List, List]]]: the critical pairs of every combination, in the order of {combinations}
+        """
+        chunkSize = max(1, -(-len(combinations) // (self.processes * self.chunksPerProcess)))
+        tasks = []
+        for start in range(0, len(combinations), chunkSize):
+            chunk = combinations[start:start + chunkSize]
+            chunkRules = {index: tuple(rules[index]) for combination in chunk for index in combination}
+            tasks.append((signature, chunkRules, chunk))
+
+        groups = []
+        for chunkResult in self._GetPool().imap(_GenerateChunk, tasks):
+            for encodedPairs in chunkResult:
+                critPairs = []
+                for encoded1, encoded2 in encodedPairs:
+                    term1 = DecodeTerm(encoded1)
+                    term2 = DecodeTerm(encoded2)
+
+                    for variable in GetTermVariables(term1) + GetTermVariables(term2):
+                        signature.AddVariable(variable)
+
+                    critPairs.append((TermToList(term1), TermToList(term2)))
+                groups.append(critPairs)
+
+        return groups
+
+    def Close(self) -> None:
+        """
+        This function stops the worker processes. The pool starts them again if it is used afterwards.
+        """
+        with self._lock:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool.join()
+                self._pool = None
+
+    def _GetPool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = multiprocessing.get_context("spawn").Pool(self.processes)
+
+            return self._pool
+
+
+def _GenerateChunk(task: Tuple[Signature, dict, List[Tuple[int, int]]]) -> List[List[Tuple[tuple, tuple]]]:
+    from .backend import GenerateCriticalPairsOfRules # the backend module imports this one, so it is loaded lazily
+
+    signature, rules, combinations = task
+    result = []
+    for index1, index2 in combinations:
+        critPairs = GenerateCriticalPairsOfRules(rules[index1], rules[index2], signature)
+        result.append([(EncodeTerm(ListToTerm(critPair[0], signature.variables)),
+                        EncodeTerm(ListToTerm(critPair[1], signature.variables))) for critPair in critPairs])
+
+    return result
+
+
+class NormalizerPool:
+    """
+    Pool of worker processes which normalize pairs of terms, kept for a whole completion run while its rules change.
+
+    Every worker keeps its own index of the rules and a NormalFormCache for the lifetime of the pool. The pool
+    keeps a log of the changes made to the rules (see SetRules), and a batch only carries the changes some worker
+    may not have applied yet: every worker reports how many changes it has applied, and a batch sends the ones
+    after the oldest of them. The pairs are sent as compact term encodings, together with the signature, and
+    the normalized pairs are streamed back in the order they were given.
+    Workers are started with the "spawn" method the first time the pool is used.
+    """
+
+    def __init__(self, signature: Signature, strategy: str = INNERMOST, processes: Optional[int] = None, chunkSize: int = 32):
+        self.processes = processes if processes is not None else (os.cpu_count() or 1)
+        self.signature = signature
+        self.strategy = strategy
+        self.chunkSize = chunkSize
+        self.steps = 0 # number of rewrite steps the workers performed so far
+        self._rules = []     # the rules of the last call of SetRules, as (input, output) pairs
+        self._changes = []   # (True, rule) for an added rule, (False, rule) for a removed one, (None, rules) to start over
+        self._firstChange = 0 # the number of changes dropped from the start of the log, which every worker has applied
+        self._applied = {}   # process id of a worker -> the number of changes it has applied
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "NormalizerPool":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.Close()
+
+    def SetRules(self, rules: Iterable) -> None:
+        """
+        This function records the changes which turn the rules of the workers into {rules}. The workers
+        apply them with the next batch. If the rules which were kept changed their order, the workers
+        are sent the whole rule set instead, so they try the rules in the same order as this process.
+
+        Args:
+            rules (Iterable): the rules, as (input, output) pairs or compiled rules
+        """
+        rules = [tuple(rule) for rule in rules]
+        newRules = set(rules)
+        oldRules = set(self._rules)
+
+        kept = [rule for rule in self._rules if rule in newRules]
+        added = [rule for rule in rules if rule not in oldRules]
+        if kept + added != rules:
+            self._changes.append((None, rules))
+        else:
+            self._changes.extend((False, rule) for rule in self._rules if rule not in newRules)
+            self._changes.extend((True, rule) for rule in added)
+
+        self._rules = rules
+
+    def NormalizeMany(self, pairs: Iterable[Tuple[Term, Term]], rules: Optional[Iterable] = None) -> Iterator[Tuple[Term, Term]]:
+        """
+        This function normalizes both sides of every pair of {pairs}.
+
+        Args:
+            pairs (Iterable[Tuple[Term, Term]]): the pairs of terms to normalize
+            rules (Optional[Iterable]): the rules to rewrite with. If None, the ones of the last call of SetRules
+
+        Returns:
+            Iterator[Tuple[Term, Term]]: the normal forms of the pairs, in the same order
+        """
+        if rules is not None:
+            self.SetRules(rules)
+
+        # a worker which hasn't reported yet has applied no change
+        firstChange = min(self._applied.values()) if len(self._applied) >= self.processes else 0
+        del self._changes[:firstChange - self._firstChange]
+        self._firstChange = firstChange
+
+        changes = list(self._changes) # the tasks are sent in the background, while the log may change
+        encodedPairs = [(EncodeTerm(term1), EncodeTerm(term2)) for term1, term2 in pairs]
+        tasks = [(self.signature, self.strategy, firstChange, changes, encodedPairs[start:start + self.chunkSize])
+                 for start in range(0, len(encodedPairs), self.chunkSize)]
+
+        for processId, applied, steps, encodedResult in self._GetPool().imap(_NormalizeChunk, tasks):
+            self._applied[processId] = applied
+            self.steps += steps
+
+            for encoded1, encoded2 in encodedResult:
+                yield (DecodeTerm(encoded1), DecodeTerm(encoded2))
+
+    def Close(self) -> None:
+        """
+        This function stops the worker processes. The pool starts them again, with no rules, if it is used afterwards.
+        """
+        with self._lock:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool.join()
+                self._pool = None
+
+            self._applied = {}
+            self._changes = [(None, self._rules)]
+            self._firstChange = 0
+
+    def _GetPool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = multiprocessing.get_context("spawn").Pool(self.processes)
+
+            return self._pool
+
+
+_WORKER_NORMALIZER = None # [changes applied, rule index, cache] of a NormalizerPool worker
+
+
+def _NormalizeChunk(task: Tuple[Signature, str, int, list, List[Tuple[tuple, tuple]]]) -> Tuple[int, int, int, List[Tuple[tuple, tuple]]]:
+    global _WORKER_NORMALIZER
+
+    signature, strategy, firstChange, changes, encodedPairs = task
+    if _WORKER_NORMALIZER is None:
+        _WORKER_NORMALIZER = [0, DiscriminationTree(), NormalFormCache()]
+
+    applied, ruleTree, cache = _WORKER_NORMALIZER
+    if applied < firstChange: # a worker started in place of one which died, after the log was shortened
+        raise RuntimeError("The worker is missing changes of the rules which are not kept anymore!")
+
+    for added, rule in changes[applied - firstChange:]:
+        if added is None:
+            ruleTree = DiscriminationTree([CompileRule(curr_rule, signature) for curr_rule in rule])
+            cache.Clear()
+        elif added:
+            ruleTree.Insert(CompileRule(rule, signature))
+            cache.RuleAdded(CompileRule(rule, signature))
+        else:
+            ruleTree.Remove(CompileRule(rule, signature))
+            cache.RuleRemoved(CompileRule(rule, signature))
+    _WORKER_NORMALIZER = [firstChange + len(changes), ruleTree, cache]
+
+    normalizer = Normalizer(ruleTree, strategy, cache)
+    encodedResult = [(EncodeTerm(normalizer.Normalize(DecodeTerm(encoded1))), EncodeTerm(normalizer.Normalize(DecodeTerm(encoded2))))
+                     for encoded1, encoded2 in encodedPairs]
+
+    return (os.getpid(), firstChange + len(changes), normalizer.steps, encodedResult)
+
+
+_OVERLAP_POOLS = {} # number of processes -> OverlapPool
+_OVERLAP_POOLS_LOCK = threading.Lock()
+
+
+def GetOverlapPool(processes: Optional[int] = None) -> OverlapPool:
+    """
+    This function returns the shared overlap pool with {processes} workers, creating it the first time.
+    The shared pools are closed when the interpreter exits.
+
+    Args:
+        processes (Optional[int]): the number of worker processes. If None, one per core
+
+    Returns:
+        OverlapPool: the shared pool
+    """
+    processes = processes if processes is not None else (os.cpu_count() or 1)
+
+    with _OVERLAP_POOLS_LOCK:
+        pool = _OVERLAP_POOLS.get(processes)
+        if pool is None:
+            pool = OverlapPool(processes)
+            _OVERLAP_POOLS[processes] = pool
+
+    return pool
+
+
+@atexit.register
+def _CloseOverlapPools() -> None:
+    for pool in _OVERLAP_POOLS.values():
+        pool.Close()
@@ -0,0 +1,267 @@
+import itertools
+import re
+from typing import Optional, Tuple, Union, Iterable, Iterator
+from .exceptions import ParseError
+from .signature import Signature, GetSignature
+from .term import Term, Variable, Function
+from .profiling import Profiled, PARSING
+
+
+# kinds of tokens
+NAME = "name"           # the name of a function or variable, e.g. f, x or x'
+LPAREN = "("
+RPAREN = ")"
+COMMA = ","
+SEMICOLON = ";"
+ARROW = "->"
+EQUALS = "="
+END = "end"             # the end of the input
+
+# (kind, value, offset of the first character)
+Token = Tuple[str, str, int]
+
+_TOKEN_PATTERN = re.compile(r"(?P<space>\s+)|(?P<arrow>->)|(?P<symbol>[(),;=])|(?P<name>(?:[^\s(),;=-]|-(?!>))+)")
+
+
+def Tokenize(source: Union[str, Iterable[str]]) -> Iterator[Token]:
+    """
+    This function splits {source} into tokens, in a single pass. Whitespace only separates tokens.
+    The source can be a string or any iterable of strings (e.g. an open file), which is read one chunk at a time;
+    a token may be split between two chunks.
+
+    Args:
+        source (Union[str, Iterable[str]]): the text to split
+
+    Returns:
+        Iterator[Token]: the tokens, as (kind, value, offset) tuples, ending with an END token
+
+    Raises:
+        ParseError: if the text contains a character which can't start a token
+    """
+    chunks = (source,) if isinstance(source, str) else source
+    pending = ""   # the start of a token which may continue in the next chunk
+    consumed = 0   # the offset of the first character of {pending}
+
+    for chunk in itertools.chain(chunks, (None,)): # None marks the end of the source
+        buffer = pending + (chunk or "")
+        position = 0
+
+        while position < len(buffer):
+            match = _TOKEN_PATTERN.match(buffer, position)
+            if match is None:
+                raise ParseError(f"Unexpected character {buffer[position]!r} (at character {consumed + position})",
+                                 buffer, consumed + position)
+
+            if match.end() == len(buffer) and chunk is not None:
+                break # the token might go on in the next chunk
+
+            kind = match.lastgroup
+            if kind != "space":
+                yield ({"arrow": ARROW, "symbol": match.group(), "name": NAME}[kind], match.group(), consumed + position)
+            position = match.end()
+
+        pending = buffer[position:]
+        consumed += position
+
+    yield (END, "", consumed)
+
+
+class TermParser:
+    """
+    Single-pass parser from a stream of tokens to interned terms.
+
+    Every symbol is checked against the signature while it is read: functions with arguments need
+    exactly {arity} of them between parentheses, constants may be written with or without "()"
+    and variables never take arguments. The descent into the arguments is kept on an explicit stack
+    instead of the Python call stack, so a term is parsed in linear time whatever its depth, and every
+    error carries the offset of the token where it was found.
+    """
+
+    def __init__(self, source: Union[str, Iterable[str]], signature: Optional[Signature] = None):
+        signature = GetSignature(signature)
+
+        self.functions = signature.functions
+        self.variables = signature.variables
+        self.text = source if isinstance(source, str) else ""
+        self._tokens = Tokenize(source)
+        self._next = next(self._tokens)
+
+    def Peek(self) -> Token:
+        """
+        This function returns the next token without consuming it.
+
+        Returns:
+            Token: the next token
+        """
+        return self._next
+
+    def Next(self) -> Token:
+        """
+        This function consumes the next token.
+
+        Returns:
+            Token: the consumed token
+        """
+        token = self._next
+        if token[0] != END:
+            self._next = next(self._tokens)
+
+        return token
+
+    def Expect(self, kind: str, message: Optional[str] = None) -> Token:
+        """
+        This function consumes the next token, which has to be of the given kind.
+
+        Args:
+            kind (str): the expected kind of token
+            message (Optional[str]): the error message if the token is of another kind
+
+        Returns:
+            Token: the consumed token
+
+        Raises:
+            ParseError: if the next token is of another kind
+        """
+        token = self.Next()
+        if token[0] != kind:
+            raise self.Error(message or f"Expected {_Describe((kind, kind, 0))}, found {_Describe(token)}!", token)
+
+        return token
+
+    def AtEnd(self) -> bool:
+        return self._next[0] == END
+
+    def Error(self, message: str, token: Token) -> ParseError:
+        """
+        This function builds the ParseError for {token}, with the offset of the token added to the message.
+
+        Args:
+            message (str): what went wrong
+            token (Token): the token where the error was found
+
+        Returns:
+            ParseError: the error, to be raised by the caller
+        """
+        return ParseError(f"{message} (at character {token[2]})", self.text, token[2])
+
+    @Profiled(PARSING)
+    def ParseTerm(self) -> Term:
+        """
+        This function reads the next term from the tokens.
+
+        Returns:
+            Term: the interned term
+
+        Raises:
+            ParseError: if the tokens don't form a term of the signature
+        """
+        stack = [] # (symbol, arity, arguments read so far) of every function whose arguments are being read
+
+        while True:
+            token = self.Next()
+            kind, value, _ = token
+
+            if kind != NAME:
+                raise self.Error(f"Expected a function or a variable, found {_Describe(token)}!", token)
+
+            if value in self.variables:
+                if self._next[0] == LPAREN:
+                    raise self.Error(f"The variable {value} can't have arguments!", self._next)
+
+                term = Variable(value)
+            elif value in self.functions:
+                arity = self.functions[value]
+
+                if self._next[0] == LPAREN:
+                    self.Next()
+
+                    if arity > 0:
+                        stack.append((value, arity, []))
+                        continue
+
+                    self.Expect(RPAREN, f"The function {value} is constant, it can't have arguments!")
+                elif arity > 0:
+                    raise self.Error(f"The function {value} expects {arity} arguments!", self._next)
+
+                term = Function(value)
+            else:
+                raise self.Error(f"{value} is neither a function nor a variable!", token)
+
+            # give the term to the function it is an argument of, closing every function which got all of its arguments
+            while stack:
+                symbol, arity, arguments = stack[-1]
+                arguments.append(term)
+                token = self.Next()
+
+                if len(arguments) < arity:
+                    if token[0] != COMMA:
+                        raise self.Error(f"The function {symbol} expects {arity} arguments, but only got {len(arguments)}!", token)
+                    break
+
+                if token[0] == COMMA:
+                    raise self.Error(f"The function {symbol} expects only {arity} arguments!", token)
+
+                if token[0] != RPAREN:
+                    raise self.Error(f"Expected {_Describe((RPAREN, RPAREN, 0))}, found {_Describe(token)}!", token)
+
+                stack.pop()
+                term = Function(symbol, arguments)
+            else:
+                return term
+
+
+def _Describe(token: Token) -> str:
+    if token[0] == END:
+        return "the end of the input"
+
+    return f"\"{token[1]}\""
+
+
+def ParseTerm(text: str, signature: Optional[Signature] = None) -> Term:
+    """
+    This function takes in the string representation of a term (e.g. "f(x, i(y))") and returns the term.
+
+    Args:
+        text (str): the term to parse
+        signature (Optional[Signature]): the functions and variables of our language
+
+    Returns:
+        Term: the interned term
+
+    Raises:
+        ParseError: if the string is not exactly one term of the signature
+    """
+    parser = TermParser(text, signature)
+    term = parser.ParseTerm()
+
+    if not parser.AtEnd():
+        raise parser.Error(f"Unexpected {_Describe(parser.Peek())} after the end of the term!", parser.Peek())
+
+    return term
+
+
+def ParseTerms(source: Union[str, Iterable[str]], signature: Optional[Signature] = None) -> Iterator[Term]:
+    """
+    This function reads every term of {source}, one after the other. The terms can be separated by
+    whitespace or by semicolons, so a file with one term per line can be read as it is.
+
+    Args:
+        source (Union[str, Iterable[str]]): the text to parse, or an iterable of chunks of it (e.g. an open file)
+        signature (Optional[Signature]): the functions and variables of our language
+
+    Returns:
+        Iterator[Term]: the terms, in the order they appear
+
+    Raises:
+        ParseError: if some part of the source is not a term of the signature
+    """
+    parser = TermParser(source, signature)
+
+    while True:
+        while parser.Peek()[0] == SEMICOLON:
+            parser.Next()
+
+        if parser.AtEnd():
+            return
+
+        yield parser.ParseTerm()
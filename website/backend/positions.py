@@ -0,0 +1,257 @@
+from typing import List, Tuple, Union, Iterator
+from .term import Term
+from .exceptions import PositionError
+
+
+# a position is the path from the root to a subterm: the (1-based) index of the argument taken at every level,
+# e.g. (2, 1) is the first argument of the second argument of the root and () is the root itself.
+# The UI shows positions as strings, "2_1" and "" (see PositionToString and StringToPosition)
+Position = Tuple[int, ...]
+
+
+def PositionToString(position: Position) -> str:
+    """
+    This function returns {position} in the format shown by the UI.
+
+    Args:
+        position (Position): the position, e.g. (2, 1, 3)
+
+    Returns:
+        str: the position in format "{number}_{number}_{number}", "" for the root
+    """
+    return "_".join(map(str, position))
+
+
+def StringToPosition(position: str) -> Position:
+    """
+    This function reads a position in the format shown by the UI.
+
+    Args:
+        position (str): the position in format "{number}_{number}_{number}", "" for the root
+
+    Returns:
+        Position: the position, e.g. (2, 1, 3)
+
+    Raises:
+        PositionError: if {position} isn't in the right format
+    """
+    if position == "":
+        return ()
+
+    try:
+        return tuple(int(index) for index in position.split("_"))
+    except ValueError:
+        raise PositionError(f"{position!r} is not a position!") from None
+
+
+def ToPosition(position: Union[Position, str]) -> Position:
+    """
+    This function returns {position} as a tuple, reading it first if it is a string from the UI.
+
+    Args:
+        position (Union[Position, str]): the position
+
+    Returns:
+        Position: the position as a tuple
+    """
+    return StringToPosition(position) if isinstance(position, str) else tuple(position)
+
+
+def Positions(term: Term) -> Iterator[Tuple[Position, Term]]:
+    """
+    This function yields every position of {term} together with the subterm found there, in one
+    pre-order traversal (the root first, then the arguments from left to right).
+
+    Args:
+        term (Term): the term
+
+    Returns:
+        Iterator[Tuple[Position, Term]]: the positions and their subterms
+    """
+    stack = [((), term)]
+    while stack:
+        position, curr_term = stack.pop()
+        yield position, curr_term
+
+        for index in range(len(curr_term.arguments), 0, -1):
+            stack.append(((*position, index), curr_term.arguments[index - 1]))
+
+
+def GetSubterm(term: Term, position: Position) -> Term:
+    """
+    This function returns the subterm of {term} at {position}, in O(depth).
+
+    Args:
+        term (Term): the term
+        position (Position): the position of the subterm
+
+    Returns:
+        Term: the subterm
+
+    Raises:
+        PositionError: if {position} doesn't exist in {term}
+    """
+    for index in position:
+        if not 0 < index <= len(term.arguments):
+            raise PositionError(f"Couldn't find the subterm at position {PositionToString(position)}. Stopped at {index}.")
+        term = term.arguments[index - 1]
+
+    return term
+
+
+def ReplaceSubterm(term: Term, position: Position, replacement: Term) -> Term:
+    """
+    This function returns a new term created from replacing the subterm of {term} at {position} with {replacement}.
+    Only the terms on the path to {position} are rebuilt, the rest are shared with {term}.
+
+    Args:
+        term (Term): the term to build on top of
+        position (Position): the position of the subterm to replace
+        replacement (Term): the term to put in its place
+
+    Returns:
+        Term: the new term
+
+    Raises:
+        PositionError: if {position} doesn't exist in {term}
+    """
+    path = []
+    for index in position:
+        if not 0 < index <= len(term.arguments):
+            raise PositionError(f"Cannot replace the subterm at position {PositionToString(position)}! Stopped at {index}.")
+        path.append((term, index - 1))
+        term = term.arguments[index - 1]
+
+    for parent, index in reversed(path):
+        replacement = Term(parent.value, parent.arguments[:index] + (replacement,) + parent.arguments[index + 1:],
+                           parent.isVariable)
+
+    return replacement
+
+
+# The same operations on the nested list encoding, e.g. ["f", ["x", "i", ["y"]]]. In the arguments of a function,
+# an argument takes up one item (a variable or a constant) or two (a function and the list of its arguments), so
+# the subterms of a list term are slices of its arguments list.
+
+def _ListArguments(term: List) -> Iterator[Tuple[int, int]]:
+    if len(term) == 1:
+        return
+
+    term_args = term[1]
+    i = 0
+    while i < len(term_args):
+        end = i + 2 if i + 1 < len(term_args) and type(term_args[i + 1]) == list else i + 1
+        yield i, end
+        i = end
+
+
+def _FindListArgument(term: List, index: int, position: Position) -> Tuple[int, int]:
+    for curr_index, bounds in enumerate(_ListArguments(term), 1):
+        if curr_index == index:
+            return bounds
+
+    raise PositionError(f"Couldn't find the subterm at position {PositionToString(position)}. Stopped at {index}.")
+
+
+def ListPositions(term: List) -> Iterator[Tuple[Position, List]]:
+    """
+    This function yields every position of {term} together with the subterm found there, in one
+    pre-order traversal, which is also the order of the symbols in FlattenList(term).
+
+    Args:
+        term (List): list representing a term
+
+    Returns:
+        Iterator[Tuple[Position, List]]: the positions and their subterms
+    """
+    stack = [((), term)]
+    while stack:
+        position, subterm = stack.pop()
+        yield position, subterm
+
+        arguments = [((*position, index), subterm[1][start:end])
+                     for index, (start, end) in enumerate(_ListArguments(subterm), 1)]
+        stack.extend(reversed(arguments))
+
+
+def GetPositionFromListIndex(term: List, index: int) -> Position:
+    """
+    This function takes in an index from the term (imagine it as one long non-nested list, like the
+    subterms the UI lets the user pick from) and returns the position of the element.
+
+    Args:
+        term (List): list representing a term
+        index (int): the index of the subterm we'd like to get
+
+    Returns:
+        Position: position of the subterm, () for the root
+
+    Raises:
+        PositionError: if {term} has fewer than {index} + 1 symbols
+    """
+    for curr_index, (position, _) in enumerate(ListPositions(term)):
+        if curr_index == index:
+            return position
+
+    raise PositionError(f"There are not enough subterms for index {index}!")
+
+
+def GetSubtermAtPosition(term: List, position: Union[Position, str] = ()) -> List:
+    """
+    This function takes in a position from the term and returns the subterm from
+    that position onward, in O(depth).
+
+    Args:
+        term (List): list representing a term
+        position (Union[Position, str]): position of the subterm you'd like to get, e.g. (2, 1, 3) or,
+                                         as the UI shows it, "2_1_3". The root is () or ""
+
+    Returns:
+        List: returns the list of lists
+
+    Raises:
+        PositionError: if {position} doesn't exist in {term}
+    """
+    position = ToPosition(position)
+
+    for index in position:
+        start, end = _FindListArgument(term, index, position)
+        term = term[1][start:end]
+
+    return term
+
+
+def ReplaceSubtermAtPosition(original_term: List, replacement_term: List, position: Union[Position, str] = ()) -> List:
+    """
+    This function takes in a position from {original_term} and returns a new term created from replacing
+    everything from {position} in {original_term} with {replacement_term}, in O(depth).
+    This function does NOT modify {original_term}: only the lists on the path to {position} are copied,
+    the others are shared with it.
+
+    Args:
+        original_term (List): list representing a term which will be built on top of
+        replacement_term (List): list representing a term which will replace a subterm from {original_term}
+        position (Union[Position, str]): position of the subterm you'd like to replace, e.g. (2, 1, 3) or,
+                                         as the UI shows it, "2_1_3". The root is () or ""
+
+    Returns:
+        List: returns the new term after replacement
+
+    Raises:
+        PositionError: if {position} doesn't exist in {original_term}
+    """
+    position = ToPosition(position)
+
+    path = []
+    term = original_term
+    for index in position:
+        start, end = _FindListArgument(term, index, position)
+        path.append((term, start, end))
+        term = term[1][start:end]
+
+    # a subterm is the slice of the arguments it takes up, so the replacement is spliced in as it is
+    new_term = replacement_term
+    for parent, start, end in reversed(path):
+        new_term = [parent[0], parent[1][:start] + new_term + parent[1][end:]]
+
+    return new_term
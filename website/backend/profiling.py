@@ -0,0 +1,264 @@
+import collections
+import contextvars
+import functools
+import threading
+import time
+import uuid
+from typing import Optional, List, Dict, Any, Callable
+
+
+# areas of the engine the hooked functions belong to
+PARSING = "parsing"
+CONVERSION = "conversion"         # between terms, nested lists and trees
+MATCHING = "matching"
+ORDERING = "ordering"
+UNIFICATION = "unification"
+CRITICAL_PAIRS = "critical pairs"
+NORMALIZATION = "normalization"
+
+# the number of finished profiles kept for GetProfiles
+MAX_PROFILES = 50
+
+_ACTIVE = contextvars.ContextVar("profile", default=None) # the profile of the current request or job
+_activeCount = 0 # profiles active in any thread; while it is 0, a hooked function only pays for one check
+_activeLock = threading.Lock()
+
+_finished = collections.deque(maxlen=MAX_PROFILES)
+_finishedLock = threading.Lock()
+
+
+class Profile:
+    """
+    Counters of the hooked engine functions, collected while the profile is active (see Profiling):
+    the number of calls and the cumulative wall time of every function, like the cumtime of cProfile
+    (the time of a function includes the hooked functions it calls, and a recursive call is only timed
+    once), and the hits and misses of the caches.
+
+    A profile is active in one thread (or asyncio task) at a time, so it takes no locks. Calls made in
+    worker processes are not counted.
+    """
+
+    def __init__(self, name: str = "", profileId: Optional[str] = None):
+        self.id = profileId or uuid.uuid4().hex
+        self.name = name
+        self.started = time.time()
+        self.seconds = 0.0 # wall time while the profile was active
+        self.functions = {} # name -> [category, calls, seconds]
+        self.caches = {}    # name -> [hits, misses]
+        self._running = set() # the hooked functions being timed
+        self._start = 0.0     # when the profile was last started
+
+    def Call(self, name: str, category: str, function: Callable, args: tuple, kwargs: dict) -> Any:
+        """
+        This function calls {function} and records the call under {name}.
+
+        Args:
+            name (str): the name of the hooked function
+            category (str): the area of the engine it belongs to
+            function (Callable): the function
+            args (tuple): its positional arguments
+            kwargs (dict): its keyword arguments
+
+        Returns:
+            Any: what the function returned
+        """
+        counters = self.functions.get(name)
+        if counters is None:
+            counters = self.functions[name] = [category, 0, 0.0]
+        counters[1] += 1
+
+        if name in self._running: # a recursive call, already timed by the outer one
+            return function(*args, **kwargs)
+
+        self._running.add(name)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            counters[2] += time.perf_counter() - start
+            self._running.discard(name)
+
+    def RecordCache(self, name: str, hits: int, misses: int) -> None:
+        """
+        This function adds {hits} and {misses} to the counters of the cache {name}.
+
+        Args:
+            name (str): the name of the cache
+            hits (int): the lookups which found their value
+            misses (int): the lookups which didn't
+        """
+        counters = self.caches.setdefault(name, [0, 0])
+        counters[0] += hits
+        counters[1] += misses
+
+    def ToDict(self) -> Dict:
+        """
+        This function returns the counters of the profile, as they are shown by the /stats route.
+
+        Returns:
+            Dict: id, name, started, seconds, the calls, seconds and seconds per call of every function
+            (slowest first) and the hits, misses and hit rate of every cache
+        """
+        functions = sorted(self.functions.items(), key=lambda item: -item[1][2])
+        return {"id": self.id, "name": self.name, "started": self.started, "seconds": self.seconds,
+                "functions": {name: {"category": category, "calls": calls, "seconds": seconds,
+                                     "seconds_per_call": seconds / calls if calls else 0.0}
+                              for name, (category, calls, seconds) in functions},
+                "caches": {name: {"hits": hits, "misses": misses,
+                                  "hit_rate": hits / (hits + misses) if hits + misses else 0.0}
+                           for name, (hits, misses) in self.caches.items()}}
+
+    def Format(self) -> List[str]:
+        """
+        This function returns the counters of the profile as the lines of a table, for the command line.
+
+        Returns:
+            List[str]: the lines, slowest function first
+        """
+        data = self.ToDict()
+        lines = [f"Profile {data['name'] or data['id']}: {data['seconds']:.3f}s\n",
+                 f"{'function':<40} {'category':<15} {'calls':>9} {'seconds':>9} {'per call':>10}\n"]
+        lines += [f"{name:<40} {counters['category']:<15} {counters['calls']:>9} {counters['seconds']:>9.4f} "
+                  f"{counters['seconds_per_call'] * 1e6:>8.1f}us\n" for name, counters in data["functions"].items()]
+        lines += [f"cache {name}: {counters['hits']} hits, {counters['misses']} misses ({counters['hit_rate']:.1%})\n"
+                  for name, counters in data["caches"].items()]
+        return lines
+
+
+def Profiled(category: str, name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """
+    This function builds the decorator which hooks a function into the active profile. Without an active
+    profile the hook only checks a global counter before calling the function, so the hot functions of the
+    engine can stay hooked.
+
+    Args:
+        category (str): the area of the engine the function belongs to, e.g. MATCHING
+        name (Optional[str]): the name of the function in the profile. If None, its qualified name is used
+
+    Returns:
+        Callable[[Callable], Callable]: the decorator
+    """
+    def Decorate(function: Callable) -> Callable:
+        key = name or function.__qualname__
+
+        @functools.wraps(function)
+        def Hooked(*args, **kwargs):
+            if not _activeCount:
+                return function(*args, **kwargs)
+
+            profile = _ACTIVE.get()
+            if profile is None:
+                return function(*args, **kwargs)
+
+            return profile.Call(key, category, function, args, kwargs)
+
+        return Hooked
+
+    return Decorate
+
+
+def RecordCache(name: str, hits: int, misses: int) -> None:
+    """
+    This function adds the hits and misses of the cache {name} to the active profile, if there is one.
+
+    Args:
+        name (str): the name of the cache
+        hits (int): the lookups which found their value
+        misses (int): the lookups which didn't
+    """
+    profile = _ACTIVE.get() if _activeCount else None
+    if profile is not None:
+        profile.RecordCache(name, hits, misses)
+
+
+def StartProfile(profile: Profile) -> contextvars.Token:
+    """
+    This function makes {profile} the active profile of the current thread. Every call has to be
+    matched by a call of StopProfile.
+
+    Args:
+        profile (Profile): the profile to collect the counters in
+
+    Returns:
+        contextvars.Token: the token to give to StopProfile
+    """
+    global _activeCount
+
+    with _activeLock:
+        _activeCount += 1
+    profile._start = time.perf_counter()
+    return _ACTIVE.set(profile)
+
+
+def StopProfile(token: contextvars.Token) -> Profile:
+    """
+    This function deactivates the profile started with {token} and keeps it for GetProfiles.
+
+    Args:
+        token (contextvars.Token): the token returned by StartProfile
+
+    Returns:
+        Profile: the profile
+    """
+    global _activeCount
+
+    profile = _ACTIVE.get()
+    _ACTIVE.reset(token)
+    with _activeLock:
+        _activeCount -= 1
+
+    profile.seconds += time.perf_counter() - profile._start
+    with _finishedLock:
+        _finished.append(profile)
+
+    return profile
+
+
+class Profiling:
+    """
+    Context manager which keeps {profile} active while its block runs:
+
+        with Profiling(Profile("completion")) as profile:
+            DetermineCompleteness(...)
+        print(profile.ToDict())
+    """
+
+    def __init__(self, profile: Optional[Profile] = None):
+        self.profile = profile if profile is not None else Profile()
+        self._token = None
+
+    def __enter__(self) -> Profile:
+        self._token = StartProfile(self.profile)
+        return self.profile
+
+    def __exit__(self, *args) -> None:
+        StopProfile(self._token)
+
+
+def GetProfiles() -> List[Dict]:
+    """
+    This function returns the last MAX_PROFILES finished profiles of this process.
+
+    Returns:
+        List[Dict]: the profiles, as returned by Profile.ToDict, the newest first
+    """
+    with _finishedLock:
+        profiles = list(_finished)
+
+    return [profile.ToDict() for profile in reversed(profiles)]
+
+
+def GetProfile(profileId: str) -> Optional[Dict]:
+    """
+    This function returns the finished profile with the id {profileId}.
+
+    Args:
+        profileId (str): the id of the profile (for a completion job, the id of the job)
+
+    Returns:
+        Optional[Dict]: the profile, as returned by Profile.ToDict, or None if it isn't kept anymore
+    """
+    with _finishedLock:
+        profiles = [profile for profile in _finished if profile.id == profileId]
+
+    return profiles[-1].ToDict() if profiles else None
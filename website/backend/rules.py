@@ -0,0 +1,213 @@
+from typing import Optional, List, Tuple, Dict, Union
+from .parser import ParseTerm
+from .signature import Signature, GetSignature
+from .exceptions import ParseError
+from .term import Term, ListToTerm, TermToString, GetTermVariables
+from .profiling import Profiled, MATCHING
+
+
+# instructions of a matching program, see CompileMatchingProgram
+MATCH_FUNCTION = 0 # the current subterm must be the function {symbol} with {arity} arguments
+MATCH_BIND = 1     # the current subterm is bound to the variable slot {slot}
+MATCH_CHECK = 2    # the current subterm must be the term already bound to the variable slot {slot}
+
+
+class CompiledRule:
+    """
+    A rewrite rule {input} -> {output} which is parsed only once.
+
+    It keeps both sides as interned terms, the set of variables of the left-hand side,
+    the head symbol of the left-hand side and a matching program for it.
+    It behaves like the (input, output) tuple it was built from, so it can be used
+    anywhere a rule tuple is expected.
+    """
+    __slots__ = ("input", "output", "lhs", "rhs", "variables", "head", "program", "slots")
+
+    def __init__(self, substitution_input: str, substitution_output: str, signature: Optional[Signature] = None):
+        signature = GetSignature(signature)
+
+        self.lhs = ParseTerm(substitution_input, signature)
+        self.rhs = ParseTerm(substitution_output, signature)
+
+        self.input = TermToString(self.lhs)
+        self.output = TermToString(self.rhs)
+        self.variables = frozenset(GetTermVariables(self.lhs))
+        self.head = None if self.lhs.isVariable else self.lhs.value
+        self.program, self.slots = CompileMatchingProgram(self.lhs)
+
+    def __iter__(self):
+        return iter((self.input, self.output))
+
+    def __getitem__(self, index: int) -> str:
+        return (self.input, self.output)[index]
+
+    def __len__(self) -> int:
+        return 2
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CompiledRule):
+            return self.lhs is other.lhs and self.rhs is other.rhs
+
+        return isinstance(other, tuple) and other == (self.input, self.output)
+
+    def __hash__(self) -> int:
+        return hash((self.input, self.output))
+
+    def __repr__(self) -> str:
+        return f"CompiledRule({self.input!r}, {self.output!r})"
+
+    @Profiled(MATCHING)
+    def Match(self, term: Term) -> Optional[List[Term]]:
+        """
+        This function runs the matching program of the left-hand side against {term}.
+
+        Args:
+            term (Term): the term to match
+
+        Returns:
+            Optional[List[Term]]: the term bound to every variable slot, or None if the rule doesn't match
+        """
+        if self.head is not None and (term.isVariable or term.value != self.head or len(term.arguments) != self.program[0][2]):
+            return None # cheap rejection before running the whole program
+
+        bindings = [None] * len(self.slots)
+        stack = [term]
+        for operation, argument1, argument2 in self.program:
+            curr_term = stack.pop()
+
+            if operation == MATCH_FUNCTION:
+                if curr_term.isVariable or curr_term.value != argument1 or len(curr_term.arguments) != argument2:
+                    return None
+
+                stack.extend(reversed(curr_term.arguments))
+            elif operation == MATCH_BIND:
+                bindings[argument1] = curr_term
+            elif bindings[argument1] is not curr_term:
+                return None
+
+        return bindings
+
+    def Instantiate(self, bindings: List[Term]) -> Term:
+        """
+        This function builds the right-hand side of the rule under the bindings found by Match.
+
+        Args:
+            bindings (List[Term]): the terms bound to every variable slot
+
+        Returns:
+            Term: the instantiated right-hand side
+        """
+        substitution = {self.slots[slot]: bindings[slot] for slot in range(len(self.slots))}
+
+        return ApplyVariableSubstitution(self.rhs, substitution)
+
+    def Rewrite(self, term: Term) -> Optional[Term]:
+        """
+        This function applies the rule once, at the leftmost-outermost position of {term} where it matches.
+
+        Args:
+            term (Term): the term to rewrite
+
+        Returns:
+            Optional[Term]: the rewritten term or None if the rule can't be applied anywhere
+        """
+        bindings = self.Match(term)
+        if bindings is not None:
+            return self.Instantiate(bindings)
+
+        for index, argument in enumerate(term.arguments):
+            newArgument = self.Rewrite(argument)
+
+            if newArgument is not None:
+                arguments = term.arguments[:index] + (newArgument,) + term.arguments[index + 1:]
+                return Term(term.value, arguments, term.isVariable)
+
+        return None
+
+
+def CompileMatchingProgram(pattern: Term) -> Tuple[Tuple[Tuple[int, object, int], ...], Tuple[str, ...]]:
+    """
+    This function compiles {pattern} into a flat matching program, in pre-order.
+    Each variable gets a slot the first time it appears (MATCH_BIND) and is compared
+    against that slot on every other appearance (MATCH_CHECK).
+
+    Args:
+        pattern (Term): the left-hand side of a rule
+
+    Returns:
+        Tuple: the program and the name of the variable held in each slot
+    """
+    program = []
+    slots = {}
+
+    stack = [pattern]
+    while stack:
+        curr_term = stack.pop()
+
+        if curr_term.isVariable:
+            if curr_term.value in slots:
+                program.append((MATCH_CHECK, slots[curr_term.value], 0))
+            else:
+                slots[curr_term.value] = len(slots)
+                program.append((MATCH_BIND, slots[curr_term.value], 0))
+        else:
+            program.append((MATCH_FUNCTION, curr_term.value, len(curr_term.arguments)))
+            stack.extend(reversed(curr_term.arguments))
+
+    return (tuple(program), tuple(slots))
+
+
+def ApplyVariableSubstitution(term: Term, substitution: Dict[str, Term]) -> Term:
+    """
+    This function replaces every variable of {term} found in {substitution} with its value.
+
+    Args:
+        term (Term): the term to instantiate
+        substitution (Dict[str, Term]): variable name -> term
+
+    Returns:
+        Term: the instantiated term
+    """
+    if term.isVariable:
+        return substitution.get(term.value, term)
+
+    if not term.arguments:
+        return term
+
+    return Term(term.value, tuple(ApplyVariableSubstitution(argument, substitution) for argument in term.arguments))
+
+
+_COMPILED_RULES = {}
+_COMPILED_RULES_LIMIT = 4096
+
+
+def CompileRule(substitution: Union[Tuple[str, str], CompiledRule], signature: Optional[Signature] = None) -> CompiledRule:
+    """
+    This function returns the compiled form of {substitution}, parsing it only the first time
+    it is seen with the same functions and variables.
+
+    Args:
+        substitution (Union[Tuple[str, str], CompiledRule]): the rule to compile
+        signature (Optional[Signature]): the functions and variables of our language
+
+    Returns:
+        CompiledRule: the compiled rule
+
+    Raises:
+        ParseError: if one of the sides of the rule is not a term of the signature
+    """
+    if isinstance(substitution, CompiledRule):
+        return substitution
+
+    signature = GetSignature(signature)
+    key = (substitution[0], substitution[1], signature.Key())
+
+    rule = _COMPILED_RULES.get(key)
+    if rule is None:
+        if len(_COMPILED_RULES) >= _COMPILED_RULES_LIMIT:
+            _COMPILED_RULES.clear()
+
+        rule = CompiledRule(substitution[0], substitution[1], signature)
+        _COMPILED_RULES[key] = rule
+
+    return rule
@@ -0,0 +1,107 @@
+from typing import Optional, Dict, Iterable
+from .exceptions import SignatureError
+
+
+class Signature:
+    """
+    The language the engine works in: the functions with their arities, the variables,
+    and the precedence and weights used by the reduction orderings.
+
+    Every engine function takes the signature as an argument instead of reading it from the
+    Flask session, so the engine can run outside of a request (in a worker process, a batch
+    job or a benchmark). Variables created while renaming terms apart are only added to
+    the signature object, never written back to the session.
+    """
+
+    def __init__(self, functions: Optional[Dict[str, int]] = None, variables: Optional[Iterable[str]] = None,
+                 precedences: Optional[Dict[str, int]] = None, weights: Optional[Dict[str, int]] = None,
+                 ordering: str = "lpo"):
+        self.functions = dict(functions) if functions else {}
+        self.variables = set(variables) if variables else set()
+        self.precedences = dict(precedences) if precedences else {}
+        self.weights = dict(weights) if weights else {}
+        self.ordering = ordering
+
+        for name in self.variables:
+            if name in self.functions:
+                raise SignatureError(f"{name} can't be both a function and a variable!")
+
+    def __repr__(self) -> str:
+        return f"Signature(functions={self.functions}, variables={sorted(self.variables)})"
+
+    def IsFunction(self, name: str) -> bool:
+        return name in self.functions
+
+    def IsVariable(self, name: str) -> bool:
+        return name in self.variables
+
+    def Arity(self, name: str) -> int:
+        """
+        This function returns the arity of the function {name}.
+
+        Args:
+            name (str): name of the function
+
+        Returns:
+            int: the number of arguments of the function
+
+        Raises:
+            SignatureError: if there is no function called {name}
+        """
+        if name not in self.functions:
+            raise SignatureError(f"There is no function with the name {name}!")
+
+        return self.functions[name]
+
+    def AddVariable(self, name: str) -> None:
+        """
+        This function adds the variable {name} to the signature, if it isn't there already.
+
+        Args:
+            name (str): name of the variable
+
+        Raises:
+            SignatureError: if there is a function called {name}
+        """
+        if name in self.functions:
+            raise SignatureError(f"There is already a function with the name {name}!")
+
+        self.variables.add(name)
+
+    def Key(self) -> tuple:
+        """
+        This function returns a hashable snapshot of the functions and variables, so parsed
+        terms and rules can be cached per signature.
+
+        Returns:
+            tuple: the functions and the variables of the signature
+        """
+        return (frozenset(self.functions.items()), frozenset(self.variables))
+
+    def Copy(self) -> "Signature":
+        return Signature(self.functions, self.variables, self.precedences, self.weights, self.ordering)
+
+    @staticmethod
+    def FromSession() -> "Signature":
+        """
+        This function builds the signature saved in the current user session.
+
+        Returns:
+            Signature: the signature of the current user
+        """
+        from .database import LoadFunctions, LoadVariables, LoadPrecedences, LoadWeights, LoadOrderingName
+        return Signature(LoadFunctions(), LoadVariables(), LoadPrecedences(), LoadWeights(), LoadOrderingName())
+
+
+def GetSignature(signature: Optional[Signature] = None) -> Signature:
+    """
+    This function returns {signature}, or the signature of the current user session if it is None.
+    Only the Flask views should rely on the session fallback.
+
+    Args:
+        signature (Optional[Signature]): the signature given by the caller
+
+    Returns:
+        Signature: the signature to work with
+    """
+    return Signature.FromSession() if signature is None else signature
@@ -0,0 +1,196 @@
+import json
+import sqlite3
+import threading
+from typing import Optional, Any, List, Dict
+
+
+class StorageBackend:
+    """
+    Interface of the stores which keep the workspaces of the users.
+
+    A workspace is a set of keys ("functions", "variables", "terms", ...), each holding a JSON value.
+    Keys are read and written one at a time, so a request only pays for the keys it actually uses.
+    Values go through JSON on the way in and out: callers always get a fresh copy and tuples come back as lists.
+    """
+    name = ""
+
+    def Get(self, workspace: str, key: str, default: Any = None) -> Any:
+        """
+        This function returns the value of {key} in {workspace}.
+
+        Args:
+            workspace (str): the id of the workspace
+            key (str): the key to read
+            default (Any): the value returned if the key was never written
+
+        Returns:
+            Any: the value of the key
+        """
+        raise NotImplementedError
+
+    def Set(self, workspace: str, key: str, value: Any) -> None:
+        """
+        This function writes {value} to {key} in {workspace}.
+
+        Args:
+            workspace (str): the id of the workspace
+            key (str): the key to write
+            value (Any): a value which can be written as JSON
+        """
+        raise NotImplementedError
+
+    def SetMany(self, workspace: str, values: Dict[str, Any]) -> None:
+        """
+        This function writes every value of {values} to its key in {workspace}, all at once.
+
+        Args:
+            workspace (str): the id of the workspace
+            values (Dict[str, Any]): the values to write, by key
+        """
+        for key, value in values.items():
+            self.Set(workspace, key, value)
+
+    def Delete(self, workspace: str, key: str) -> None:
+        """
+        This function removes {key} from {workspace}. Removing a missing key does nothing.
+
+        Args:
+            workspace (str): the id of the workspace
+            key (str): the key to remove
+        """
+        raise NotImplementedError
+
+    def Keys(self, workspace: str) -> List[str]:
+        """
+        This function returns the keys written in {workspace}.
+
+        Args:
+            workspace (str): the id of the workspace
+
+        Returns:
+            List[str]: the keys, sorted
+        """
+        raise NotImplementedError
+
+    def Has(self, workspace: str, key: str) -> bool:
+        return key in self.Keys(workspace)
+
+
+class MemoryStorage(StorageBackend):
+    """
+    Store which keeps the workspaces in a dictionary of this process. Meant for tests and scripts.
+    """
+    name = "memory"
+
+    def __init__(self):
+        self._values = {} # (workspace, key) -> JSON string
+        self._lock = threading.Lock()
+
+    def Get(self, workspace: str, key: str, default: Any = None) -> Any:
+        value = self._values.get((workspace, key))
+        return default if value is None else json.loads(value)
+
+    def Set(self, workspace: str, key: str, value: Any) -> None:
+        with self._lock:
+            self._values[(workspace, key)] = json.dumps(value)
+
+    def SetMany(self, workspace: str, values: Dict[str, Any]) -> None:
+        encoded = {(workspace, key): json.dumps(value) for key, value in values.items()}
+        with self._lock:
+            self._values.update(encoded)
+
+    def Delete(self, workspace: str, key: str) -> None:
+        with self._lock:
+            self._values.pop((workspace, key), None)
+
+    def Keys(self, workspace: str) -> List[str]:
+        return sorted(key for curr_workspace, key in list(self._values) if curr_workspace == workspace)
+
+    def Has(self, workspace: str, key: str) -> bool:
+        return (workspace, key) in self._values
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Store which keeps the workspaces in a SQLite table, one row per (workspace, key).
+    Every thread keeps its own connection to the database.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+        with self._Connection() as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS workspace_values (
+                    workspace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    PRIMARY KEY (workspace, key)
+                )""")
+
+    def _Connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            self._local.connection = connection
+
+        return connection
+
+    def Get(self, workspace: str, key: str, default: Any = None) -> Any:
+        row = self._Connection().execute("SELECT value FROM workspace_values WHERE workspace = ? AND key = ?",
+                                         (workspace, key)).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def Set(self, workspace: str, key: str, value: Any) -> None:
+        with self._Connection() as connection:
+            connection.execute("INSERT OR REPLACE INTO workspace_values (workspace, key, value) VALUES (?, ?, ?)",
+                               (workspace, key, json.dumps(value)))
+
+    def SetMany(self, workspace: str, values: Dict[str, Any]) -> None:
+        with self._Connection() as connection: # a single transaction
+            connection.executemany("INSERT OR REPLACE INTO workspace_values (workspace, key, value) VALUES (?, ?, ?)",
+                                   [(workspace, key, json.dumps(value)) for key, value in values.items()])
+
+    def Delete(self, workspace: str, key: str) -> None:
+        with self._Connection() as connection:
+            connection.execute("DELETE FROM workspace_values WHERE workspace = ? AND key = ?", (workspace, key))
+
+    def Keys(self, workspace: str) -> List[str]:
+        rows = self._Connection().execute("SELECT key FROM workspace_values WHERE workspace = ? ORDER BY key",
+                                          (workspace,)).fetchall()
+        return [row[0] for row in rows]
+
+    def Has(self, workspace: str, key: str) -> bool:
+        row = self._Connection().execute("SELECT 1 FROM workspace_values WHERE workspace = ? AND key = ?",
+                                         (workspace, key)).fetchone()
+        return row is not None
+
+
+STORAGE_BACKENDS = (SQLiteStorage.name, MemoryStorage.name)
+
+
+def CreateStorage(name: str = SQLiteStorage.name, path: Optional[str] = None) -> StorageBackend:
+    """
+    This function builds the store called {name}.
+
+    Args:
+        name (str): "sqlite" or "memory"
+        path (Optional[str]): path of the database, only used by the SQLite store
+
+    Returns:
+        StorageBackend: the new store
+
+    Raises:
+        ValueError: if the name is unknown or the SQLite store has no path
+    """
+    if name == SQLiteStorage.name:
+        if not path:
+            raise ValueError("The SQLite store needs the path of its database!")
+        return SQLiteStorage(path)
+
+    if name == MemoryStorage.name:
+        return MemoryStorage()
+
+    raise ValueError(f"Unknown storage backend {name}! Expected one of {', '.join(STORAGE_BACKENDS)}.")
@@ -1,8 +1,14 @@
-from flask import session, flash
-from typing import List
+from flask import flash
+from typing import List, Union, Optional
 from .database import *
-from .representation_changes import ChangeTreeToList, CreateTree, CreateInputStringFromTree, ChangeListToTree, ModifyListToArgumentList
-from .variables import AddVariable
+from .representation_changes import ChangeTreeToList, CreateTree, CreateInputStringFromTree, ChangeListToTree
+from .parser import ParseTerm
+from .signature import Signature, GetSignature
+from .exceptions import NotFoundError, PositionError, DuplicateError
+from .term import ListToTerm, TermToList, TermToString, ReplaceAllOccurrences
+from .positions import ReplaceSubtermAtPosition
+from .rules import CompiledRule, CompileRule
+from .unification import UnifyAll, UnificationError
 
 def ModifySubstitution(old_substitution_input: str, old_substitution_output: str, 
                         new_substitution_input: str, new_substitution_output: str) -> None:
@@ -20,19 +26,16 @@ def ModifySubstitution(old_substitution_input: str, old_substitution_output: str
     old_substitution_output = old_substitution_output.replace(" ", "")
     new_substitution_output = new_substitution_output.replace(" ", "")
     
-    if "substitutions" not in session:
-        flash("ERROR: There are no substitutions loaded in the session.", category="error")
-        return
+    if not LoadSubstitutions():
+        raise NotFoundError("There are no substitutions in the workspace.")
     
     substitutions = LoadSubstitutions()
     
     if old_substitution_input not in substitutions.keys():
-        flash(f"ERROR: Could not find {old_substitution_input} as an input for any substitution!", category="error")
-        return
+        raise NotFoundError(f"Could not find {old_substitution_input} as an input for any substitution!")
     
     if old_substitution_output not in substitutions[old_substitution_input]:
-        flash(f"ERROR: Could not find any substitution going from {old_substitution_input} to {old_substitution_output}!", category="error")
-        return
+        raise NotFoundError(f"Could not find any substitution going from {old_substitution_input} to {old_substitution_output}!")
 
     if old_substitution_input != new_substitution_input: # modify the substitution input if requsted
         DeleteSubstitution(old_substitution_input, old_substitution_output, False)
@@ -64,9 +67,7 @@ def AddSubstitution(substitution_input: str, substitution_output: str, verbose:
 
     if substitution_input in substitutions.keys():
         if substitution_output in substitutions[substitution_input]:
-            flash(f"ERROR: There is already a substitution going from {substitution_input} to {substitution_output}.",
-                    category="error")
-            return
+            raise DuplicateError(f"There is already a substitution going from {substitution_input} to {substitution_output}.")
         
         substitutions[substitution_input].append(substitution_output)
     else:
@@ -93,12 +94,10 @@ def DeleteSubstitution(substitution_input: str, substitution_output: str, verbos
     substitutions = LoadSubstitutions()
 
     if substitution_input not in substitutions.keys():
-        flash(f"ERROR: There is no subtitution with the input {substitution_input}!", category="error")
-        return
+        raise NotFoundError(f"There is no subtitution with the input {substitution_input}!")
     
     if substitution_output not in substitutions[substitution_input]:
-        flash(f"ERROR: There is no subtitution going from {substitution_input} to {substitution_output}!", category="error")
-        return
+        raise NotFoundError(f"There is no subtitution going from {substitution_input} to {substitution_output}!")
 
     if len(substitutions[substitution_input]) == 1:
         substitutions.pop(substitution_input)
@@ -414,17 +413,18 @@ def RuleEliminateSubstitutions(substitutions: dict, verbose: bool = False) -> di
     return modified_substitutions
 
 
-def IsTermGround(term: List) -> bool:
+def IsTermGround(term: List, signature: Optional[Signature] = None) -> bool:
     """
     This function takes in a term and checks if it is ground (there are no variables).
     
     Args:
         term (List): list representing a term
+        signature (Optional[Signature]): the functions and variables of our language
 
     Returns:
         bool: returns True if term is ground
     """
-    variables = LoadVariables()
+    variables = GetSignature(signature).variables
     
     if len(variables) == 0:
         return True # there are no variables in our language, so of course this is ground
@@ -450,427 +450,110 @@ def IsTermGround(term: List) -> bool:
     return True # passed all checks, this is ground
 
 
-def ApplySubstitutionRecursive(substitution : Tuple[str, str], term : List) -> Optional[List]:
-    substitutionInput = ChangeTreeToList(CreateTree(substitution[0]))
+def ApplySubstitutionRecursive(substitution : Tuple[str, str], term : List, signature: Optional[Signature] = None) -> Optional[List]:
+    signature = GetSignature(signature)
+    variables = signature.variables
+    substitutionInput = ParseTerm(substitution[0], signature)
+    substitutionOutput = TermToList(ParseTerm(substitution[1], signature))
 
-    newTerm = ChangeTreeToList(ChangeListToTree(term))
+    newTerm = ListToTerm(term, variables)
 
-    if substitutionInput == newTerm and substitutionInput:
-        newTerm = ChangeTreeToList(CreateTree(substitution[1]))
-    else:
-        subterms = []
-        i = 0
-        if len(newTerm) == 1: # constant function
-            return None
-        
-        term_args = newTerm[1]
-        while i < len(term_args):
-            if i + 1 == len(term_args): # last element
-                subterms.append([term_args[i]])
-                i += 1
-            elif type(term_args[i + 1]) == list: # this is a function
-                subterms.append([term_args[i], term_args[i + 1]])
-                i += 2
-            else: # this is a variable
-                subterms.append([term_args[i]])
-                i += 1
-        
-        for index, subterm in enumerate(subterms):
-            newerTerm = ApplySubstitutionRecursive(substitution, subterm)
-            if newerTerm != None:
-                subterms[index] = newerTerm
-        
-        newTerm[1] = []
-        for subterm in subterms:
-            for subsubterm in subterm:
-                newTerm[1].append(subsubterm)
-        
-    return newTerm
-
-
-def ApplySubstitution(substitution : Tuple[str, str], term : List) -> Optional[List]:
-    # printTerm = ChangeTreeToList(ChangeListToTree(term))
-    # printSubstitution = (substitution[0], substitution[1])
-    # print(f"Trying to apply {substitution} to {term}")
-    inputList = ChangeTreeToList(CreateTree(substitution[0]))
-    
-    newTerm = ChangeTreeToList(ChangeListToTree(term))
-    
-    # f(f(x, y), z)
-    
-    # f(f(x', y'), z')
-    # f(f(f(x', y'), z'), z)
-    
-    # f(f(x', y'), z') -> {x', y', z'}
-    # f(f(f(x', y'), z'), z) -> {x', y', z', z}
-    # {x' -> x'', y' -> y'', z' -> z''}
-    # f(f(f(x'', y''), z''), z)
-    
-    # f(f(x'', y''), f(z'', z))
-    # f(f(x', y'), f(z', z))
-    
-    res = ReplaceCoincidingVariables(GetUniqueVariables(inputList), GetUniqueVariables(newTerm), newTerm, inputList)
-    # print(f"{newTerm} after replacing coinciding variables: {res[0]}")
-    
-    newTerm, varRules = res[0], res[1]
+    if substitutionInput is not None and substitutionInput == newTerm:
+        return substitutionOutput
     
-    termArgumentList = ModifyListToArgumentList(newTerm)
-    
-    # print(f"Input argument list: {inputArgumentList}")
-    # print(f"Term argument list: {termArgumentList}")
-    
-    flatInput = FlattenList(inputList)
-    flatTerm = FlattenList(newTerm)
-    rulesSet = [] # rules for the variables
-
-    functions = LoadFunctions()
-    variables = LoadVariables()
-    i, j = 0, 0
-    notFoundNow = False
-    while not notFoundNow and i < len(flatInput) and j < len(flatTerm):
-        if flatInput[i] in variables:
-            if flatTerm[j] in variables:
-                for rule in rulesSet:
-                    if flatInput[i] == rule[0]:
-                        if flatTerm[j] != rule[1]: 
-                            # if we already have a rule of {flatInput[i]} goes to something and that something is not
-                            # {flatTerm[j]} then the same variable in the input appears under two different subterms in {term}
-                            notFoundNow = True
-                            break
-                if (flatInput[i], flatTerm[j]) not in rulesSet:
-                    rulesSet.append((flatInput[i], flatTerm[j]))
-            else:
-                subterm = ""
-                argumentsLeft = []
-                
-                while argumentsLeft != [] or subterm == "":
-                    subterm += flatTerm[j]
-                    
-                    if flatTerm[j] in functions:
-                        if termArgumentList[j] != 0: # function is not constant
-                            subterm += "("
-                        
-                            argumentsLeft.append(termArgumentList[j])
-                            if len(argumentsLeft) >= 2:
-                                argumentsLeft[-2] -= 1
-                        else: # function is constant
-                            if len(argumentsLeft) >= 1:
-                                argumentsLeft[-1] -= 1
-                                
-                                while argumentsLeft != [] and argumentsLeft[-1] == 0:
-                                    subterm += ")"
-                                    argumentsLeft.pop()
-                            
-                                if argumentsLeft != []:
-                                    subterm += ", "
-                    else:
-                        argumentsLeft[-1] -= 1
-                        
-                        while argumentsLeft != [] and argumentsLeft[-1] == 0:
-                            subterm += ")"
-                            argumentsLeft.pop()
-                    
-                        if argumentsLeft != []:
-                            subterm += ", "
-                    
-                    j += 1
-                    
-                    # if j == len(flatTerm):
-                    #     if argumentsLeft != []:
-                    #         return None
-                
-                for rule in rulesSet:
-                    if flatInput[i] == rule[0]:
-                        if subterm != rule[1]:
-                            # if we already have a rule of {flatInput[i]} goes to something and that something is not
-                            # {subterm} then the same variable in the input appears under two different subterms in {term}
-                            notFoundNow = True
-                            break
-                
-                if (flatInput[i], subterm) not in rulesSet:
-                    rulesSet.append((flatInput[i], subterm))
-                j -= 1
-        else:
-            if flatTerm[j] in variables: # if input is expecting a function, then the term has to be the same function
-                notFoundNow = True
-                break
-            else:
-                if flatInput[i] != flatTerm[j]: # if both are functions, they have to be the same function
-                    notFoundNow = True
-                    break
-        i += 1
-        j += 1
-    
-    if i < len(flatInput) or j < len(flatTerm):
-        notFoundNow = True
-        
-    if notFoundNow:
-        # print(f"Rules {rulesSet} for term {newTerm}")
-        if len(newTerm) == 1:
-            return None
-        
-        subterms = []
-        i = 0
-        term_args = newTerm[1]
-        
-        while i < len(term_args):
-            if i + 1 == len(term_args): # last element
-                subterms.append([term_args[i]])
-                i += 1
-            elif type(term_args[i + 1]) == list: # this is a function
-                subterms.append([term_args[i], term_args[i + 1]])
-                i += 2
-            else: # this is a variable (or a constant function)
-                subterms.append([term_args[i]])
-                i += 1
-                
-        for index, subterm in enumerate(subterms):
-            newSubTerm = ApplySubstitution(substitution, subterm)
-            
-            if newSubTerm != None:
-                newTerm = ReplaceSubtermAtPosition(newTerm, newSubTerm, f"{index + 1}")
-                
-                for key, value in varRules.items():
-                    tempTerm = ApplySubstitutionRecursive((value, key), newTerm)
-                    
-                    if tempTerm != None:
-                        newTerm = tempTerm
-                return newTerm
-            
+    if len(term) == 1: # constant function
         return None
     
-    # print(f"Rules: {rulesSet}")
-    
-    rules = {}
-    for rule in rulesSet:
-        rules[rule[0]] = [rule[1]]
-    
-    # rules = Unification(rules)
-    # print(f"{rules} for term {term}")
-    newSubstitutionInput = ChangeTreeToList(CreateTree(substitution[0]))
-    newSubstitutionOutput = ChangeTreeToList(CreateTree(substitution[1]))
-    
-    # f(x, y)
-    # f(f(y, z), f(x, y))
-    # {x -> f(y, z), y -> f(x, y)}
-    # f(f(y, z), y)
-    # f(f(f(x, y), z), f(x, y))
-    # variables = LoadVariables()
-    # rulesForCoincidingVariables = {}
-    # for lhs1 in rules.keys():
-    #     for lhs2 in rules.keys():
-    #         if lhs1 == lhs2:
-    #             continue
-            
-    #         outputListFlat = FlattenList(ChangeTreeToList(CreateTree(rules[lhs2][0])))
-    #         if lhs1 in outputListFlat:
-    #             newVar = lhs1
-                
-    #             found = True
-    #             while found:
-    #                 newVar = newVar + "'"
-    #                 found = False
-    #                 for key, value in rules.items():
-    #                     inputFlat = FlattenList(ChangeTreeToList(CreateTree(key)))
-    #                     outputFlat = FlattenList(ChangeTreeToList(CreateTree(value[0])))
-                        
-    #                     if newVar in inputFlat or newVar in outputFlat:
-    #                         found = True
-    #                         break
-                
-    #             if newVar not in variables:
-    #                 AddVariable(newVar, False)
-                
-    #             rulesForCoincidingVariables[lhs1] = [newVar]
-    
-    # for lhs in rules.keys():
-    #     for rhs in rules[lhs]:
-    #         outputToChange = ChangeTreeToList(CreateTree(rhs))
-            
-    #         for key, value in rulesForCoincidingVariables.items():
-    #             newOutput = ApplySubstitutionRecursive((key, value[0]), outputToChange)
-                
-    #             if newOutput != None:
-    #                 outputToChange = newOutput
-            
-    #         rules[lhs] = [CreateInputStringFromTree(ChangeListToTree(outputToChange))]
-    
-    for key, value in rules.items():
-        newInput = ApplySubstitutionRecursive((key, value[0]), newSubstitutionInput)
-        newOutput = ApplySubstitutionRecursive((key, value[0]), newSubstitutionOutput)
-        if newInput != None:
-            newSubstitutionInput = newInput
-        
-        if newOutput != None:
-            # print(f"Applied {key} -> {value} on {newSubstitutionOutput} and got {newOutput}!")
-            newSubstitutionOutput = newOutput
-    
-    # print(f"Rules for coinciding variables: {rulesForCoincidingVariables}")
-    # for key, value in rulesForCoincidingVariables.items():
-    #     newInput = ApplySubstitutionRecursive((value[0], key), newSubstitutionInput)
-    #     newOutput = ApplySubstitutionRecursive((value[0], key), newSubstitutionOutput)
-    #     if newInput != None:
-    #         newSubstitutionInput = newInput
-        
-    #     if newOutput != None:
-    #         print(f"Applied {key} -> {value} on {newSubstitutionOutput} and got {newOutput}!")
-    #         newSubstitutionOutput = newOutput
+    if substitutionInput is None or not substitutionOutput:
+        return TermToList(newTerm)
     
-    newSubstitution = (CreateInputStringFromTree(ChangeListToTree(newSubstitutionInput)), 
-                        CreateInputStringFromTree(ChangeListToTree(newSubstitutionOutput)))
-    
-    # print(f"New substitution: {newSubstitution} on term {newTerm}")
-        
-    newTerm = ApplySubstitutionRecursive(newSubstitution, newTerm)
-    if newTerm == None:
-        return None
-    
-    for key, value in varRules.items():
-        tempTerm = ApplySubstitutionRecursive((value, key), newTerm)
-        
-        if tempTerm != None:
-            newTerm = tempTerm
-        
-    return newTerm
+    # every occurrence of the input is an interned subterm, so we can swap them all in a single pass
+    return TermToList(ReplaceAllOccurrences(newTerm, substitutionInput, ListToTerm(substitutionOutput, variables)))
 
 
-def TermIsVariable(term : List) -> bool:
-    variables = LoadVariables()
-    if len(term) == 1 and term[0] in variables:
-        return True
-    
-    return False
-
-
-def Unification(substitutions : Dict[str, List]) -> Optional[Dict[str, List]]:
-    times = 1000
-    while True:
-        initial_substitutions = {}
-        for lhs in substitutions.keys():
-            initial_substitutions[lhs] = []
-            for rhs in substitutions[lhs]:
-                initial_substitutions[lhs].append(rhs)
-        
-        substitutions = RuleDeleteSubstitutions(substitutions)
-        # print(f"After deletion: {substitutions}")
-        substitutions = RuleDecomposeSubstitutions(substitutions)
-        # print(f"After decomposition: {substitutions}")
-        substitutions = RuleOrientSubstitutions(substitutions)
-        # print(f"After orientation: {substitutions}")
-        substitutions = RuleEliminateSubstitutions(substitutions)
-        # print(f"After elimination: {substitutions}")
-        
-        if initial_substitutions == substitutions:
-            return substitutions
-        
-        if times == 0:
-            break
-        
-        times -= 1
-        
-    return None
+def ApplySubstitution(substitution : Union[Tuple[str, str], CompiledRule], term : List,
+                      signature: Optional[Signature] = None) -> Optional[List]:
+    """
+    This function applies {substitution} once, at the leftmost-outermost position of {term} where its input matches.
 
+    Args:
+        substitution (Union[Tuple[str, str], CompiledRule]): the rule to apply
+        term (List): list representing the term to rewrite
+        signature (Optional[Signature]): the functions and variables of our language
 
-def GetUniqueVariables(term: List) -> List:
-    variables = []
-    
-    term = FlattenList(term)
-    for subterm in term:
-        if TermIsVariable([subterm]):
-            if subterm not in variables:
-                variables.append(subterm)
+    Returns:
+        Optional[List]: returns the rewritten term or None if the rule can't be applied anywhere
+    """
+    # the rule is parsed only once and its matching program works directly on the structure of the term,
+    # so the variables of {term} never have to be renamed apart from the ones of the rule
+    signature = GetSignature(signature)
+    newTerm = CompileRule(substitution, signature).Rewrite(ListToTerm(term, signature.variables))
     
-    return variables
+    return TermToList(newTerm) if newTerm is not None else None
 
 
-def ReplaceCoincidingVariables(vars1: List, vars2: List, term: List, rule: List) -> Tuple[List, Dict[str, str]]:
-    nonuniqueVars = []
-    for var in vars1:
-        if var in vars2:
-            nonuniqueVars.append(var)
+def TermIsVariable(term : List, signature: Optional[Signature] = None) -> bool:
+    variables = GetSignature(signature).variables
     
-    varRules = {}
-        
-    variables = LoadVariables()
-    flatTerm = FlattenList(term)
-    flatRule = FlattenList(rule)
-
-    for var in nonuniqueVars:
-        newVarName = var + "'"
-        while newVarName in flatTerm or newVarName in varRules.values() or newVarName in flatRule:
-            newVarName += "'"
-        
-        varRules[var] = newVarName
-        if newVarName not in variables:
-            AddVariable(newVarName, False)
-    
-    newTerm = ChangeTreeToList(ChangeListToTree(term))
-    
-    for key, value in varRules.items():
-        newTerm = ApplySubstitutionRecursive((key, value), newTerm)
+    if len(term) == 1 and term[0] in variables:
+        return True
     
-    return (newTerm, varRules)
+    return False
 
 
-def ReplaceSubtermAtPosition(original_term: List, replacement_term: List, position: str = "") -> List:
+def Unification(substitutions : Dict[str, List], signature: Optional[Signature] = None) -> Dict[str, List]:
     """
-    This function takes in a position from {original_term} and returns a new term created from replacing
-    everything from {position} in {original_term} with {replacement_term}.
-    This function does NOT modify {original_term} outside of its scope.
-    
+    This function solves the unification problem given by {substitutions}, where every
+    input =? output pair is an equation.
+
     Args:
-        original_term (List): list representing a term which will be built on top of
-        replacement_term (List): list representing a term which will replace a subterm from {original_term}
-        position (str): position of the subterm you'd like to get (in format "{number}_{number}_{number}").
-                        If you want to get the root, position is = ""
+        substitutions (Dict[str, List]): the equations to solve
+        signature (Optional[Signature]): the functions and variables of our language
 
     Returns:
-        List: returns the new term after replacement
+        Dict[str, List]: the most general unifier in solved form (variable =? term)
+
+    Raises:
+        ParseError: if one of the equations is not made of terms of the signature
+        UnificationError: if the equations have no solution
     """
-    if position == "":
-        return replacement_term
-    
-    indeces = position.split("_")
-    
-    head = ChangeListToTree(original_term)
-    
-    # f(f(f(x', y'), z'), z)
-    # f(f(x', y'), f(z', z))
-    # 1
+    signature = GetSignature(signature)
+    equations = []
+    for lhs in substitutions.keys():
+        for rhs in substitutions[lhs]:
+            term1 = ParseTerm(lhs, signature)
+            term2 = ParseTerm(rhs, signature)
+            equations.append((term1, term2))
     
-    curr_node = head
-    for i in range(0, len(indeces)):
-        index = int(indeces[i]) - 1
-        if curr_node.next != None:
-            curr_node = curr_node.next[index] # f(f(x', y'))
-        else:
-            flash(f"ERROR: Cannot replace subterm at index {index + 1}! The position {position} doesn't exist.", category="error")
-            return []
+    unifier = UnifyAll(equations)
     
-    curr_node.previous.next[int(indeces[-1]) - 1] = ChangeListToTree(replacement_term)
+    return {variable: [TermToString(term)] for variable, term in unifier.items()}
+
+
+def GetUniqueVariables(term: List, signature: Optional[Signature] = None) -> List:
+    signature = GetSignature(signature)
+    variables = []
     
-    new_term = ChangeTreeToList(head)
+    term = FlattenList(term)
+    for subterm in term:
+        if TermIsVariable([subterm], signature):
+            if subterm not in variables:
+                variables.append(subterm)
     
-    return new_term
+    return variables
 
 
 import re
 
-def create_regex_substitution(string1, string2):
-    # Define the regex patterns for functions and variables
-    functionsDict = LoadFunctions()
-    functions = []
-    for function in functionsDict.keys():
-        functions.append(function)
-        
-    variables = list(LoadVariables())
+def create_regex_substitution(string1, string2, signature: Optional[Signature] = None):
+    signature = GetSignature(signature)
     
     variablesOrder = {}
-    flatList = FlattenList(ChangeTreeToList(CreateTree(string1)))
+    flatList = FlattenList(ChangeTreeToList(CreateTree(string1, signature)))
     
     current_index = 1
     for term in flatList:
-        if TermIsVariable(term):
+        if TermIsVariable([term], signature):
             if term not in variablesOrder.keys():
                 variablesOrder[term] = current_index
                 current_index += 1
@@ -878,7 +561,7 @@ def create_regex_substitution(string1, string2):
 # Generate regex patterns for string 1
 # Escape special characters in the string
     regex_pattern1 = re.escape(string1)
-    variables1 = GetUniqueVariables(ChangeTreeToList(CreateTree(string1)))
+    variables1 = GetUniqueVariables(ChangeTreeToList(CreateTree(string1, signature)), signature)
 
     for index,var in enumerate(variables1):
         first_index = regex_pattern1.find(var)
@@ -890,7 +573,7 @@ def create_regex_substitution(string1, string2):
 
 # Generate regex patterns for string 2
     regex_pattern2 = string2
-    variables2 = GetUniqueVariables(ChangeTreeToList(CreateTree(string2)))
+    variables2 = GetUniqueVariables(ChangeTreeToList(CreateTree(string2, signature)), signature)
 
     for index,var in enumerate(variables2):
         replacement = r"\\" + str(variablesOrder[var])
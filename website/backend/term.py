@@ -0,0 +1,339 @@
+import threading
+from typing import Optional, List, Tuple, Iterable
+from weakref import WeakValueDictionary
+from .node import Node
+from .profiling import Profiled, CONVERSION
+
+
+# every term ever built lives in this table exactly once, so two equal terms are always the same object
+_TERM_TABLE = WeakValueDictionary()
+_TERM_TABLE_LOCK = threading.Lock() # the jobs and the Flask requests build terms from several threads
+
+
+class Term:
+    """
+    Immutable, hash-consed first-order term.
+
+    Terms are interned: building the same term twice returns the same object, so equality is an
+    identity check and identical subterms are shared instead of copied.
+    """
+    __slots__ = ("value", "arguments", "isVariable", "size", "_hash", "__weakref__")
+
+    def __new__(cls, value: str, arguments: Tuple["Term", ...] = (), isVariable: bool = False):
+        arguments = tuple(arguments)
+        key = (value, isVariable, arguments)
+
+        term = _TERM_TABLE.get(key)
+        if term is not None:
+            return term
+
+        with _TERM_TABLE_LOCK:
+            # another thread may have built the term since the lookup above
+            term = _TERM_TABLE.get(key)
+            if term is not None:
+                return term
+
+            term = cls._Build(key, value, arguments, isVariable)
+            _TERM_TABLE[key] = term
+
+        return term
+
+    @classmethod
+    def _Build(cls, key: Tuple, value: str, arguments: Tuple["Term", ...], isVariable: bool) -> "Term":
+        term = object.__new__(cls)
+        object.__setattr__(term, "value", value)
+        object.__setattr__(term, "arguments", arguments)
+        object.__setattr__(term, "isVariable", isVariable)
+        object.__setattr__(term, "size", 1 + sum(argument.size for argument in arguments))
+        object.__setattr__(term, "_hash", hash(key))
+        return term
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Term objects are immutable!")
+
+    def __delattr__(self, name):
+        raise AttributeError("Term objects are immutable!")
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other) -> bool:
+        return self is other
+
+    def __ne__(self, other) -> bool:
+        return self is not other
+
+    def __reduce__(self):
+        # unpickling goes through __new__ again, so terms coming back from another process are re-interned
+        return (Term, (self.value, self.arguments, self.isVariable))
+
+    def __copy__(self) -> "Term":
+        return self
+
+    def __deepcopy__(self, memo) -> "Term":
+        return self
+
+    def __repr__(self) -> str:
+        return f"Term({TermToString(self)!r})"
+
+    def __str__(self) -> str:
+        return TermToString(self)
+
+
+def Variable(name: str) -> Term:
+    """
+    This function returns the (unique) term representing the variable {name}.
+
+    Args:
+        name (str): name of the variable
+
+    Returns:
+        Term: the interned variable term
+    """
+    return Term(name, (), True)
+
+
+def Function(name: str, arguments: Iterable[Term] = ()) -> Term:
+    """
+    This function returns the (unique) term {name}({arguments}).
+
+    Args:
+        name (str): name of the function symbol
+        arguments (Iterable[Term]): the arguments of the function, empty for constants
+
+    Returns:
+        Term: the interned function term
+    """
+    return Term(name, tuple(arguments), False)
+
+
+@Profiled(CONVERSION)
+def ListToTerm(term: List, variables: Optional[set] = None) -> Optional[Term]:
+    """
+    This function takes in a list of lists and returns the corresponding interned term.
+
+    Args:
+        term (List): the list of lists representing a term (e.g. ["f", ["x", "i", ["y"]]])
+        variables (Optional[set]): the variables in our language. If None, they are loaded from the session
+
+    Returns:
+        Optional[Term]: returns the term or None if the list is empty
+    """
+    if term == []:
+        return None
+
+    if variables is None:
+        from .signature import GetSignature
+        variables = GetSignature().variables
+
+    if len(term) == 1:
+        return Variable(term[0]) if term[0] in variables else Function(term[0])
+
+    return Function(term[0], _ListArgumentsToTerms(term[1], variables))
+
+
+def _ListArgumentsToTerms(term_args: List, variables: set) -> List[Term]:
+    arguments = []
+
+    i = 0
+    while i < len(term_args):
+        if i + 1 < len(term_args) and type(term_args[i + 1]) == list: # this is a function with arguments
+            arguments.append(Function(term_args[i], _ListArgumentsToTerms(term_args[i + 1], variables)))
+            i += 2
+        else: # this is a variable (or a constant function)
+            arguments.append(Variable(term_args[i]) if term_args[i] in variables else Function(term_args[i]))
+            i += 1
+
+    return arguments
+
+
+@Profiled(CONVERSION)
+def TermToList(term: Term) -> List:
+    """
+    This function takes in a term and returns the contents within a list of lists.
+
+    Args:
+        term (Term): the term you want to change the data structure of
+
+    Returns:
+        List: returns the list of lists
+    """
+    if not term.arguments:
+        return [term.value]
+
+    return [term.value, _TermArgumentsToList(term)]
+
+
+def _TermArgumentsToList(term: Term) -> List:
+    term_args = []
+
+    for argument in term.arguments:
+        term_args.append(argument.value)
+
+        if argument.arguments:
+            term_args.append(_TermArgumentsToList(argument))
+
+    return term_args
+
+
+def TreeToTerm(head: Node, variables: Optional[set] = None) -> Optional[Term]:
+    """
+    This function takes in the head of a tree and returns the corresponding interned term.
+
+    Args:
+        head (Node): head of the tree
+        variables (Optional[set]): the variables in our language. If None, they are loaded from the session
+
+    Returns:
+        Optional[Term]: returns the term or None if there's no tree
+    """
+    if head == None:
+        return None
+
+    if variables is None:
+        from .signature import GetSignature
+        variables = GetSignature().variables
+
+    if head.next == None:
+        return Variable(head.value) if head.value in variables else Function(head.value)
+
+    return Function(head.value, [TreeToTerm(child, variables) for child in head.next])
+
+
+def TermToTree(term: Term, previous: Optional[Node] = None) -> Node:
+    """
+    This function takes in a term and returns the contents within the form of a tree.
+
+    Args:
+        term (Term): the term you want to change the data structure of
+        previous (Optional[Node]): the parent of the created node (this shouldn't be given on the first call)
+
+    Returns:
+        Node: returns the head of the tree
+    """
+    head = Node(term.value, previous)
+
+    if term.arguments:
+        head.next = [TermToTree(argument, head) for argument in term.arguments]
+
+    return head
+
+
+def TermToString(term: Term) -> str:
+    """
+    This function takes in a term and returns its string representation (e.g. "f(x, i(y))").
+
+    Args:
+        term (Term): the term to print
+
+    Returns:
+        str: the string representation of the term
+    """
+    if not term.arguments:
+        return term.value
+
+    return f"{term.value}({', '.join(TermToString(argument) for argument in term.arguments)})"
+
+
+def GetTermVariables(term: Term) -> List[str]:
+    """
+    This function returns the names of the variables of {term}, in the order they first appear.
+
+    Args:
+        term (Term): the term to look into
+
+    Returns:
+        List[str]: the variables of the term, without duplicates
+    """
+    variables = {}
+
+    stack = [term]
+    while stack:
+        curr_term = stack.pop()
+
+        if curr_term.isVariable:
+            variables[curr_term.value] = None
+        else:
+            stack.extend(reversed(curr_term.arguments))
+
+    return list(variables)
+
+
+def ReplaceAllOccurrences(term: Term, old_subterm: Term, new_subterm: Term) -> Term:
+    """
+    This function replaces every occurrence of {old_subterm} in {term} with {new_subterm}.
+    Since subterms are shared, every distinct subterm is only visited once.
+
+    Args:
+        term (Term): the term to build on top of
+        old_subterm (Term): the subterm to look for
+        new_subterm (Term): the term to put in its place
+
+    Returns:
+        Term: the new term (or {term} itself, if {old_subterm} doesn't occur in it)
+    """
+    replaced = {old_subterm: new_subterm}
+
+    def Replace(curr_term: Term) -> Term:
+        result = replaced.get(curr_term)
+        if result is not None:
+            return result
+
+        if curr_term.arguments:
+            arguments = tuple(Replace(argument) for argument in curr_term.arguments)
+            result = curr_term if arguments == curr_term.arguments else Term(curr_term.value, arguments, curr_term.isVariable)
+        else:
+            result = curr_term
+
+        replaced[curr_term] = result
+        return result
+
+    return Replace(term)
+
+
+def EncodeTerm(term: Term) -> Tuple:
+    """
+    This function returns a compact encoding of {term}, cheap to pickle and send to another process:
+    the flat pre-order sequence of its symbols, each followed by its number of arguments (-1 for variables).
+    e.g. f(x, e) -> ("f", 2, "x", -1, "e", 0)
+
+    Args:
+        term (Term): the term to encode
+
+    Returns:
+        Tuple: the encoding of the term
+    """
+    encoded = []
+
+    stack = [term]
+    while stack:
+        curr_term = stack.pop()
+        encoded.append(curr_term.value)
+        encoded.append(-1 if curr_term.isVariable else len(curr_term.arguments))
+        stack.extend(reversed(curr_term.arguments))
+
+    return tuple(encoded)
+
+
+def DecodeTerm(encoded: Tuple) -> Term:
+    """
+    This function rebuilds the interned term encoded by EncodeTerm.
+
+    Args:
+        encoded (Tuple): the encoding of the term
+
+    Returns:
+        Term: the decoded term
+    """
+    terms = [] # the subterms are built from the last symbol to the first one
+    for index in range(len(encoded) - 2, -1, -2):
+        value, arity = encoded[index], encoded[index + 1]
+
+        if arity < 0:
+            terms.append(Term(value, (), True))
+        else:
+            arguments = tuple(terms[len(terms) - arity:][::-1]) if arity else ()
+            del terms[len(terms) - arity:]
+            terms.append(Term(value, arguments, False))
+
+    return terms[0]
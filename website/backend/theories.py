@@ -0,0 +1,459 @@
+import argparse
+import itertools
+import json
+import os
+import re
+import sys
+from typing import Optional, List, Tuple, Dict, Union, Iterable, Iterator
+from .exceptions import ParseError, SignatureError
+from .signature import Signature
+from .term import Term, ListToTerm, TermToList, TermToString
+from .parser import TermParser, ParseTerm, NAME, ARROW, EQUALS
+from .orderings import ORDERINGS
+
+
+# formats of the theory files
+TRS = "trs"         # the text format, see ReadTheory
+JSON_LINES = "jsonl" # one JSON object per line, with the terms in their list representation
+THEORY_FORMATS = (TRS, JSON_LINES)
+
+# sections of a TRS file which hold one item per line
+_BLOCK_SECTIONS = ("rules", "equations", "terms")
+# sections of a TRS file which hold their items on the same line
+_LINE_SECTIONS = ("functions", "variables", "precedence", "weights", "ordering")
+
+
+class Theory:
+    """
+    Everything a theory file can hold: a signature, rules, equations and named terms.
+
+    The rules and the equations are pairs of interned terms; a workspace keeps both of them as
+    substitutions, so the difference only matters to the tools which read the files directly.
+    """
+
+    def __init__(self, signature: Optional[Signature] = None, rules: Optional[Iterable[Tuple[Term, Term]]] = None,
+                 equations: Optional[Iterable[Tuple[Term, Term]]] = None, terms: Optional[Dict[str, Term]] = None,
+                 ordering: Optional[str] = None):
+        self.signature = signature if signature is not None else Signature()
+        self.rules = list(rules) if rules else []
+        self.equations = list(equations) if equations else []
+        self.terms = dict(terms) if terms else {}
+        self.ordering = ordering # the ordering named in the file, if any
+
+        if ordering is not None:
+            self.signature.ordering = ordering
+
+    def __repr__(self) -> str:
+        return (f"Theory({self.signature}, {len(self.rules)} rules, {len(self.equations)} equations, "
+                f"{len(self.terms)} terms)")
+
+
+def ReadTheory(source: Union[str, Iterable[str]], format: Optional[str] = None) -> Theory:
+    """
+    This function reads a theory file. In the TRS format the file is made of sections; the signature
+    has to come before the terms which use it and lines starting with "#" are comments:
+
+        functions: f/2, i/1, e/0
+        variables: x, y, z
+        precedence: f=2, i=1, e=0
+        weights: f=0, i=0, e=1
+        ordering: kbo
+        rules:
+        f(e, x) -> x
+        equations:
+        f(f(x, y), z) = f(x, f(y, z))
+        terms:
+        t1 = f(x, i(x))
+
+    Args:
+        source (Union[str, Iterable[str]]): the text of the file, or its lines (e.g. an open file)
+        format (Optional[str]): TRS or JSON_LINES. If None, it is guessed from the first line which is not empty
+
+    Returns:
+        Theory: the theory of the file
+
+    Raises:
+        ParseError: if the file is not a theory of the given format
+        SignatureError: if a name is used both as a function and as a variable
+    """
+    lines = iter(source.splitlines(keepends=True) if isinstance(source, str) else source)
+
+    if format is None:
+        skipped = []
+        for line in lines:
+            skipped.append(line)
+            if line.strip():
+                break
+        format = JSON_LINES if skipped and skipped[-1].lstrip().startswith("{") else TRS
+        lines = itertools.chain(skipped, lines)
+
+    if format == TRS:
+        return _ReadTRS(lines)
+
+    if format == JSON_LINES:
+        return _ReadJSONLines(lines)
+
+    raise ValueError(f"Unknown theory format {format}! Expected one of {', '.join(THEORY_FORMATS)}.")
+
+
+def _ReadTRS(lines: Iterable[str]) -> Theory:
+    signature = Signature()
+    theory = Theory(signature)
+    section = None
+
+    for number, line in enumerate(lines, 1):
+        text = line.strip()
+        if not text or text.startswith("#"):
+            continue
+
+        header, _, value = text.partition(":")
+        header = header.strip().lower()
+
+        if header in _BLOCK_SECTIONS and not value.strip():
+            section = header
+        elif header in _LINE_SECTIONS:
+            section = None
+            _ReadSignatureLine(theory, header, value, number, line)
+        elif section is None:
+            raise ParseError(f"Line {number}: expected one of the sections {', '.join(_LINE_SECTIONS + _BLOCK_SECTIONS)}!", line, 0)
+        else:
+            try:
+                parser = TermParser(line, signature)
+                if section == "terms":
+                    name = parser.Expect(NAME, "Expected the name of the term!")[1]
+                    parser.Expect(EQUALS)
+                    theory.terms[name] = parser.ParseTerm()
+                else:
+                    lhs = parser.ParseTerm()
+                    parser.Expect(ARROW if section == "rules" else EQUALS)
+                    (theory.rules if section == "rules" else theory.equations).append((lhs, parser.ParseTerm()))
+
+                if not parser.AtEnd():
+                    raise parser.Error("Unexpected text after the end of the line!", parser.Peek())
+            except ParseError as e:
+                raise ParseError(f"Line {number}: {e.message}", line, e.offset) from None
+
+    return theory
+
+
+def _ReadSignatureLine(theory: Theory, header: str, value: str, number: int, line: str) -> None:
+    signature = theory.signature
+    items = [item for item in re.split(r"[\s,]+", value.strip()) if item]
+
+    try:
+        if header == "functions":
+            for item in items:
+                name, _, arity = item.rpartition("/")
+                if not name:
+                    raise ValueError(f"the function {item} has no arity")
+                if name in signature.variables:
+                    raise SignatureError(f"Line {number}: {name} can't be both a function and a variable!")
+                signature.functions[name] = int(arity)
+        elif header == "variables":
+            for item in items:
+                if item in signature.functions:
+                    raise SignatureError(f"Line {number}: {item} can't be both a function and a variable!")
+                signature.variables.add(item)
+        elif header in ("precedence", "weights"):
+            values = signature.precedences if header == "precedence" else signature.weights
+            for item in items:
+                name, _, number_str = item.partition("=")
+                values[name] = int(number_str)
+        else:
+            if len(items) != 1 or items[0] not in ORDERINGS:
+                raise ValueError(f"expected one of {', '.join(ORDERINGS)}")
+            theory.ordering = signature.ordering = items[0]
+    except SignatureError:
+        raise
+    except ValueError as e:
+        raise ParseError(f"Line {number}: the {header} can't be read ({e})!", line, 0) from None
+
+
+def _ReadJSONLines(lines: Iterable[str]) -> Theory:
+    signature = Signature()
+    theory = Theory(signature)
+
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+
+        try:
+            record = json.loads(line)
+
+            if "functions" in record:
+                for name, arity in record["functions"].items():
+                    if name in signature.variables:
+                        raise SignatureError(f"Line {number}: {name} can't be both a function and a variable!")
+                    signature.functions[name] = int(arity)
+            elif "variables" in record:
+                for name in record["variables"]:
+                    if name in signature.functions:
+                        raise SignatureError(f"Line {number}: {name} can't be both a function and a variable!")
+                    signature.variables.add(name)
+            elif "precedence" in record:
+                signature.precedences.update(record["precedence"])
+            elif "weights" in record:
+                signature.weights.update(record["weights"])
+            elif "ordering" in record:
+                if record["ordering"] not in ORDERINGS:
+                    raise ValueError(f"expected one of {', '.join(ORDERINGS)}")
+                theory.ordering = signature.ordering = record["ordering"]
+            elif "rule" in record:
+                theory.rules.append(tuple(_ListToCheckedTerm(side, signature) for side in record["rule"]))
+            elif "equation" in record:
+                theory.equations.append(tuple(_ListToCheckedTerm(side, signature) for side in record["equation"]))
+            elif "term" in record:
+                theory.terms[record["name"]] = _ListToCheckedTerm(record["term"], signature)
+            else:
+                raise ValueError("unknown record")
+        except SignatureError:
+            raise
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise ParseError(f"Line {number}: the record can't be read ({e})!", line, 0) from None
+
+    return theory
+
+
+def _ListToCheckedTerm(term: List, signature: Signature) -> Term:
+    # the list representation skips the parser, so the symbols and arities are checked on the built term
+    if not isinstance(term, list) or not term:
+        raise ValueError(f"{term!r} is not the list representation of a term")
+
+    result = ListToTerm(term, signature.variables)
+    stack = [result]
+    while stack:
+        subterm = stack.pop()
+        if subterm.isVariable:
+            continue
+
+        if signature.functions.get(subterm.value) != len(subterm.arguments):
+            if subterm.value not in signature.functions:
+                raise ValueError(f"{subterm.value} is neither a function nor a variable")
+            raise ValueError(f"the function {subterm.value} expects {signature.functions[subterm.value]} arguments")
+        stack.extend(subterm.arguments)
+
+    return result
+
+
+def FormatTheory(theory: Theory, format: str = TRS) -> Iterator[str]:
+    """
+    This function writes {theory} in the given format, one line at a time, so it can be streamed to a file or a response.
+
+    Args:
+        theory (Theory): the theory to write
+        format (str): TRS or JSON_LINES
+
+    Returns:
+        Iterator[str]: the lines of the file, each ending with a newline
+    """
+    signature = theory.signature
+
+    if format == JSON_LINES:
+        yield json.dumps({"functions": signature.functions}) + "\n"
+        yield json.dumps({"variables": sorted(signature.variables)}) + "\n"
+        if signature.precedences:
+            yield json.dumps({"precedence": signature.precedences}) + "\n"
+        if signature.weights:
+            yield json.dumps({"weights": signature.weights}) + "\n"
+        if theory.ordering is not None:
+            yield json.dumps({"ordering": theory.ordering}) + "\n"
+        for lhs, rhs in theory.rules:
+            yield json.dumps({"rule": [TermToList(lhs), TermToList(rhs)]}) + "\n"
+        for lhs, rhs in theory.equations:
+            yield json.dumps({"equation": [TermToList(lhs), TermToList(rhs)]}) + "\n"
+        for name, term in theory.terms.items():
+            yield json.dumps({"name": name, "term": TermToList(term)}) + "\n"
+        return
+
+    if format != TRS:
+        raise ValueError(f"Unknown theory format {format}! Expected one of {', '.join(THEORY_FORMATS)}.")
+
+    yield f"functions: {', '.join(f'{name}/{arity}' for name, arity in signature.functions.items())}\n"
+    yield f"variables: {', '.join(sorted(signature.variables))}\n"
+    if signature.precedences:
+        yield f"precedence: {', '.join(f'{name}={value}' for name, value in signature.precedences.items())}\n"
+    if signature.weights:
+        yield f"weights: {', '.join(f'{name}={value}' for name, value in signature.weights.items())}\n"
+    if theory.ordering is not None:
+        yield f"ordering: {theory.ordering}\n"
+    if theory.rules:
+        yield "rules:\n"
+        for lhs, rhs in theory.rules:
+            yield f"{TermToString(lhs)} -> {TermToString(rhs)}\n"
+    if theory.equations:
+        yield "equations:\n"
+        for lhs, rhs in theory.equations:
+            yield f"{TermToString(lhs)} = {TermToString(rhs)}\n"
+    if theory.terms:
+        yield "terms:\n"
+        for name, term in theory.terms.items():
+            yield f"{name} = {TermToString(term)}\n"
+
+
+def ImportTheory(theory: Theory) -> Dict[str, int]:
+    """
+    This function adds {theory} to the current workspace. The signature of the theory is merged into the
+    one of the workspace, the rules and the equations are added to the substitutions and the named terms are
+    saved, replacing the terms with the same names. Every part is written with a single call, however big it is.
+
+    Args:
+        theory (Theory): the theory to add
+
+    Returns:
+        Dict[str, int]: the number of functions, variables, substitutions and terms which were added
+
+    Raises:
+        SignatureError: if the signature of the theory doesn't agree with the one of the workspace
+    """
+    from .database import (LoadFunctions, SaveFunctions, LoadVariables, SaveVariables, LoadSubstitutions, SaveSubstitutions,
+                           LoadPrecedences, SavePrecedences, LoadWeights, SaveWeights, SaveOrderingName, SaveTerms)
+
+    signature = theory.signature
+    functions = LoadFunctions()
+    variables = LoadVariables()
+
+    for name, arity in signature.functions.items():
+        if name in variables:
+            raise SignatureError(f"{name} is a variable in the workspace, but a function in the theory!")
+        if name in functions and functions[name] != arity:
+            raise SignatureError(f"The function {name} has arity {functions[name]} in the workspace, but {arity} in the theory!")
+
+    for name in signature.variables:
+        if name in functions:
+            raise SignatureError(f"{name} is a function in the workspace, but a variable in the theory!")
+
+    counts = {"functions": len(set(signature.functions) - set(functions)),
+              "variables": len(signature.variables - variables),
+              "substitutions": 0,
+              "terms": len(theory.terms)}
+
+    functions.update(signature.functions)
+    SaveFunctions(functions) # the new functions are put above the others, like adding a function from the website does
+
+    if signature.precedences:
+        precedences = LoadPrecedences()
+        precedences.update(signature.precedences)
+        SavePrecedences(precedences)
+
+    SaveVariables(variables | signature.variables)
+
+    if signature.weights:
+        weights = LoadWeights()
+        weights.update(signature.weights)
+        SaveWeights(weights)
+
+    if theory.ordering is not None:
+        SaveOrderingName(theory.ordering)
+
+    substitutions = LoadSubstitutions()
+    for lhs, rhs in theory.rules + theory.equations:
+        outputs = substitutions.setdefault(TermToString(lhs), [])
+        if TermToString(rhs) not in outputs:
+            outputs.append(TermToString(rhs))
+            counts["substitutions"] += 1
+    SaveSubstitutions(substitutions)
+
+    SaveTerms({name: (TermToString(term), TermToList(term)) for name, term in theory.terms.items()})
+
+    return counts
+
+
+def ExportTheory() -> Theory:
+    """
+    This function builds the theory of the current workspace: its signature, its substitutions (as rules) and its terms.
+
+    Returns:
+        Theory: the theory of the workspace
+    """
+    from .database import LoadSubstitutions, LoadAllTerms, LoadOrderingName
+
+    signature = Signature.FromSession()
+    rules = [(ParseTerm(lhs, signature), ParseTerm(rhs, signature))
+             for lhs, outputs in LoadSubstitutions().items() for rhs in outputs]
+    terms = {name: ListToTerm(term, signature.variables) for name, (_, term) in LoadAllTerms().items()}
+
+    return Theory(signature, rules, terms=terms, ordering=LoadOrderingName())
+
+
+def GuessTheoryFormat(path: str) -> Optional[str]:
+    """
+    This function returns the format of a theory file from its extension.
+
+    Args:
+        path (str): the name or path of the file
+
+    Returns:
+        Optional[str]: JSON_LINES for .jsonl files, TRS for .trs files, or None if the extension is not known
+    """
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return extension if extension in THEORY_FORMATS else None
+
+
+def Main(argv: Optional[List[str]] = None) -> int:
+    """
+    This function is the command line interface of the theory files:
+
+        python -m website.backend.theories convert theory.trs theory.jsonl
+        python -m website.backend.theories import theory.trs --workspace ID
+        python -m website.backend.theories export --workspace ID --format jsonl -o theory.jsonl
+
+    Args:
+        argv (Optional[List[str]]): the arguments. If None, the ones of the process are used
+
+    Returns:
+        int: the exit code
+    """
+    from .database import UseWorkspace
+    from .storage import CreateStorage
+
+    parser = argparse.ArgumentParser(prog="python -m website.backend.theories", description="Import and export theory files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="convert a theory file to another format")
+    convert.add_argument("input")
+    convert.add_argument("output")
+    convert.add_argument("--format", choices=THEORY_FORMATS, help="format of the output (default: from its extension)")
+
+    for name, help in (("import", "add a theory file to a workspace"), ("export", "write the theory of a workspace")):
+        command = commands.add_parser(name, help=help)
+        if name == "import":
+            command.add_argument("input")
+        else:
+            command.add_argument("-o", "--output", help="the file to write (default: standard output)")
+            command.add_argument("--format", choices=THEORY_FORMATS, help="format of the output (default: from its extension, or trs)")
+        command.add_argument("--workspace", required=True, help="the id of the workspace")
+        command.add_argument("--database", default=os.path.join("instance", "workspaces.sqlite3"),
+                             help="the SQLite store of the workspaces (default: %(default)s)")
+
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "export":
+            with UseWorkspace(CreateStorage("sqlite", args.database), args.workspace):
+                theory = ExportTheory()
+        else:
+            with open(args.input) as f:
+                theory = ReadTheory(f, GuessTheoryFormat(args.input))
+
+        if args.command == "import":
+            with UseWorkspace(CreateStorage("sqlite", args.database), args.workspace):
+                counts = ImportTheory(theory)
+            print(", ".join(f"{count} {name}" for name, count in counts.items()) + " imported.")
+            return 0
+
+        format = args.format or (GuessTheoryFormat(args.output) if args.output else None) or TRS
+        output = open(args.output, "w") if args.output else sys.stdout
+        try:
+            output.writelines(FormatTheory(theory, format))
+        finally:
+            if args.output:
+                output.close()
+    except (ParseError, SignatureError, OSError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(Main())
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+from typing import Optional, Dict, Any
+
+
+# levels of the trace events, from the most to the least detailed
+DEBUG = 10   # every critical pair and identity
+INFO = 20    # rules added, simplified or removed, and the timings of the run
+WARNING = 30 # identities which couldn't be oriented
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING}
+_LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+
+class Tracer:
+    """
+    Buffered trace of a completion run, written as JSON lines: one object per event, with the time,
+    the level and the name of the event, the fields given by the caller and the fixed {context} fields
+    (e.g. the id of the job).
+
+    Events below {level} are dropped right away. The others are kept in memory and written {bufferSize}
+    at a time; once the file would grow past {maxBytes}, it is renamed to {path}.1 (and {path}.1 to {path}.2, ...,
+    keeping {backupCount} old files) and a new file is started.
+    Callers which would have to build expensive fields should check IsEnabled first.
+    """
+
+    def __init__(self, path: str, level: int = INFO, bufferSize: int = 256, maxBytes: int = 10 * 1024 * 1024,
+                 backupCount: int = 3, context: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.level = level
+        self.bufferSize = bufferSize
+        self.maxBytes = maxBytes
+        self.backupCount = backupCount
+        self.context = dict(context) if context else {}
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "Tracer":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.Close()
+
+    def IsEnabled(self, level: int) -> bool:
+        return level >= self.level
+
+    def Event(self, level: int, event: str, **fields) -> None:
+        """
+        This function records the event {event}, if its level is high enough.
+
+        Args:
+            level (int): DEBUG, INFO or WARNING
+            event (str): the name of the event, e.g. "rule_added"
+            fields: the data of the event, which has to be serializable as JSON
+        """
+        if level < self.level:
+            return
+
+        record = {"time": time.time(), "level": _LEVEL_NAMES.get(level, level), "event": event, **self.context, **fields}
+        with self._lock:
+            self._buffer.append(json.dumps(record, default=str))
+            if len(self._buffer) >= self.bufferSize:
+                self._Write()
+
+    def Flush(self) -> None:
+        """
+        This function writes the buffered events to the file.
+        """
+        with self._lock:
+            self._Write()
+
+    def Close(self) -> None:
+        self.Flush()
+
+    def _Write(self) -> None:
+        if not self._buffer:
+            return
+
+        data = "\n".join(self._buffer) + "\n"
+        self._buffer = []
+
+        if os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.maxBytes:
+            self._Rotate()
+
+        with open(self.path, "a") as f:
+            f.write(data)
+
+    def _Rotate(self) -> None:
+        for index in range(self.backupCount - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+
+        if self.backupCount > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+class NullTracer(Tracer):
+    """
+    Tracer which records nothing, used when tracing is disabled.
+    """
+
+    def __init__(self):
+        super().__init__(os.devnull, level=WARNING + 1)
+
+    def IsEnabled(self, level: int) -> bool:
+        return False
+
+    def Event(self, level: int, event: str, **fields) -> None:
+        pass
+
+    def Flush(self) -> None:
+        pass
+
+
+class MemoryTracer(Tracer):
+    """
+    Tracer which keeps the events in {events}, as dictionaries, instead of writing them. Meant for benchmarks and scripts.
+    """
+
+    def __init__(self, level: int = INFO, context: Optional[Dict[str, Any]] = None):
+        super().__init__(os.devnull, level, context=context)
+        self.events = []
+
+    def Event(self, level: int, event: str, **fields) -> None:
+        if level < self.level:
+            return
+
+        self.events.append({"level": _LEVEL_NAMES.get(level, level), "event": event, **self.context, **fields})
+
+    def Flush(self) -> None:
+        pass
+
+
+NULL_TRACER = NullTracer()
+
+
+def GetTracer(tracer: Optional[Tracer] = None) -> Tracer:
+    """
+    This function returns {tracer}, or the tracer which records nothing if it is None.
+
+    Args:
+        tracer (Optional[Tracer]): the tracer given by the caller
+
+    Returns:
+        Tracer: the tracer to record the events with
+    """
+    return NULL_TRACER if tracer is None else tracer
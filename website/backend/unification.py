@@ -0,0 +1,198 @@
+from typing import Optional, Dict, Tuple, Iterable
+from .term import Term
+from .exceptions import TermRewritingError
+from .profiling import Profiled, UNIFICATION
+
+
+# reasons for which two terms can't be unified
+CLASH = "clash"               # two different function symbols (or arities) have to be equal
+OCCURS_CHECK = "occurs check" # a variable has to be equal to a term which strictly contains it
+
+
+class UnificationError(TermRewritingError, ValueError):
+    """
+    Raised when a unification problem has no solution.
+
+    Attributes:
+        reason (str): CLASH or OCCURS_CHECK
+        term1 (Term): the first of the two terms which couldn't be made equal
+        term2 (Term): the second of the two terms which couldn't be made equal
+    """
+
+    def __init__(self, reason: str, term1: Term, term2: Term):
+        super().__init__(f"Could not unify {term1} and {term2}: {reason}!")
+        self.reason = reason
+        self.term1 = term1
+        self.term2 = term2
+
+
+class _UnionFind:
+    """
+    Equivalence classes of terms, with union by size and path compression.
+    Every class remembers one of its non-variable terms (its schema), if it has any.
+    """
+    __slots__ = ("parent", "size", "schema")
+
+    def __init__(self):
+        self.parent = {} # term -> parent term, the representatives are their own parents
+        self.size = {}   # representative -> number of terms in its class
+        self.schema = {} # representative -> a function term of its class
+
+    def Find(self, term: Term) -> Term:
+        parent = self.parent.get(term)
+
+        if parent is None:
+            self.parent[term] = term
+            self.size[term] = 1
+            if not term.isVariable:
+                self.schema[term] = term
+            return term
+
+        root = term
+        while parent is not root:
+            root = parent
+            parent = self.parent[root]
+
+        while term is not root: # path compression
+            self.parent[term], term = root, self.parent[term]
+
+        return root
+
+    def Union(self, root1: Term, root2: Term) -> None:
+        if self.size[root1] < self.size[root2]:
+            root1, root2 = root2, root1
+
+        self.parent[root2] = root1
+        self.size[root1] += self.size.pop(root2)
+
+        schema = self.schema.pop(root2, None)
+        if schema is not None and root1 not in self.schema:
+            self.schema[root1] = schema
+
+
+def Unify(term1: Term, term2: Term) -> Dict[str, Term]:
+    """
+    This function returns the most general unifier of {term1} and {term2}.
+
+    Args:
+        term1 (Term): the first term
+        term2 (Term): the second term
+
+    Returns:
+        Dict[str, Term]: the idempotent most general unifier, from variable name to term
+
+    Raises:
+        UnificationError: if the terms can't be unified (clash or occurs check)
+    """
+    return UnifyAll([(term1, term2)])
+
+
+@Profiled(UNIFICATION)
+def UnifyAll(equations: Iterable[Tuple[Term, Term]]) -> Dict[str, Term]:
+    """
+    This function solves the unification problem {equations} with the Martelli-Montanari algorithm,
+    keeping the equivalence classes of the terms in a union-find structure.
+
+    Every pair of (interned) subterms is merged at most once, so the equations are solved in almost
+    linear time in the size of the terms. The occurs check is done once at the end, by looking for a
+    cycle in the graph of the classes, and the unifier is built sharing the instance of every class.
+
+    Args:
+        equations (Iterable[Tuple[Term, Term]]): the pairs of terms which have to be made equal
+
+    Returns:
+        Dict[str, Term]: the idempotent most general unifier, from variable name to term
+
+    Raises:
+        UnificationError: if the equations have no solution (clash or occurs check)
+    """
+    classes = _UnionFind()
+    variables = {} # every variable of the problem, in the order they are seen
+
+    stack = list(equations)
+    stack.reverse()
+    while stack:
+        term1, term2 = stack.pop()
+        if term1 is term2:
+            continue
+
+        for term in (term1, term2):
+            if term.isVariable:
+                variables[term] = None
+
+        root1 = classes.Find(term1)
+        root2 = classes.Find(term2)
+        if root1 is root2:
+            continue
+
+        schema1 = classes.schema.get(root1)
+        schema2 = classes.schema.get(root2)
+
+        if schema1 is not None and schema2 is not None:
+            if schema1.value != schema2.value or len(schema1.arguments) != len(schema2.arguments):
+                raise UnificationError(CLASH, schema1, schema2)
+
+            classes.Union(root1, root2)
+            stack.extend(reversed(tuple(zip(schema1.arguments, schema2.arguments))))
+        else:
+            classes.Union(root1, root2)
+
+    return _BuildUnifier(classes, variables)
+
+
+@Profiled(UNIFICATION)
+def MostGeneralUnifier(term1: Term, term2: Term) -> Optional[Dict[str, Term]]:
+    """
+    This function returns the most general unifier of {term1} and {term2}, or None if they can't be unified.
+
+    Args:
+        term1 (Term): the first term
+        term2 (Term): the second term
+
+    Returns:
+        Optional[Dict[str, Term]]: the most general unifier, from variable name to term
+    """
+    try:
+        return Unify(term1, term2)
+    except UnificationError:
+        return None
+
+
+def _BuildUnifier(classes: _UnionFind, variables: Dict[Term, None]) -> Dict[str, Term]:
+    # every class without a schema is represented by the first of its variables which was seen
+    names = {}
+    for variable in variables:
+        names.setdefault(classes.Find(variable), variable)
+
+    instances = {} # representative -> instance of its class under the unifier
+    visiting = set()
+
+    def Instantiate(term: Term) -> Term:
+        root = classes.Find(term)
+
+        instance = instances.get(root)
+        if instance is not None:
+            return instance
+
+        schema = classes.schema.get(root)
+        if schema is None:
+            instance = names.get(root, term)
+        else:
+            if root in visiting:
+                raise UnificationError(OCCURS_CHECK, term, schema)
+
+            visiting.add(root)
+            instance = Term(schema.value, tuple(Instantiate(argument) for argument in schema.arguments), False)
+            visiting.discard(root)
+
+        instances[root] = instance
+        return instance
+
+    unifier = {}
+    for variable in variables:
+        instance = Instantiate(variable)
+        if instance is not variable:
+            unifier[variable.value] = instance
+
+    return unifier
+
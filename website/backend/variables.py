@@ -1,6 +1,6 @@
-from flask import session, flash
+from flask import flash
 from .database import *
-from .representation_changes import FlattenList
+from .exceptions import NotFoundError, DuplicateError, SignatureError
 
 def ModifyVariable(old_variable_name: str, curr_variable_name: str) -> None:
     """
@@ -9,32 +9,36 @@ def ModifyVariable(old_variable_name: str, curr_variable_name: str) -> None:
     Args:
         old_variable_name (str): old name of the function (can be the same as curr_variable_name)
         curr_variable_name (str): current name of the function (can be the same as old_variable_name)
+
+    Raises:
+        NotFoundError: if there is no variable {old_variable_name}
+        DuplicateError: if there is already a variable {curr_variable_name}
+        SignatureError: if {curr_variable_name} is a function
     """
-    if "variables" not in session:
-        flash("ERROR: There are no variables loaded in the session.", category="error")
-        return
+    if not LoadVariables():
+        raise NotFoundError("There are no variables in the workspace.")
     
     variables = LoadVariables()
     
     if old_variable_name not in variables:
-        flash(f"ERROR: Could not find variable {old_variable_name} in our set!", category="error")
-        return
+        raise NotFoundError(f"Could not find variable {old_variable_name} in our set!")
 
     if old_variable_name != curr_variable_name: # modify the variable name if requsted
         functions = LoadFunctions()
         if curr_variable_name in functions:
-            flash(f"ERROR: There is already a function with the name {curr_variable_name}!", category="error")
-            return
+            raise SignatureError(f"There is already a function with the name {curr_variable_name}!")
+        
+        if curr_variable_name in variables:
+            raise DuplicateError(f"There is already a variable with the name {curr_variable_name}!")
         
-        DeleteVariable(old_variable_name, False)
-        AddVariable(curr_variable_name, False)
+        variables.remove(old_variable_name)
+        variables.add(curr_variable_name)
     
         SaveVariables(variables)
 
         flash(f"Successfully modified variable {old_variable_name} into variable {curr_variable_name}!")
-    
-    if CheckVariableInTerm(old_variable_name):
-        DeleteTerms()
+        
+        RenameSymbolInTerms(old_variable_name, curr_variable_name)
 
 
 def AddVariable(variable_name: str, verbose: bool = True) -> None:
@@ -44,17 +48,19 @@ def AddVariable(variable_name: str, verbose: bool = True) -> None:
     Args:
         variable_name (str): name of the variable to add
         verbose (bool): if True, will flash messages to website
+
+    Raises:
+        DuplicateError: if there is already a variable {variable_name}
+        SignatureError: if {variable_name} is a function
     """
     variables = LoadVariables()
 
     if variable_name in variables:
-        flash(f"ERROR: There is already a variable with the name {variable_name}!", category="error")
-        return
+        raise DuplicateError(f"There is already a variable with the name {variable_name}!")
 
     functions = LoadFunctions()
     if variable_name in functions:
-        flash(f"ERROR: There is already a function with the name {variable_name}!", category="error")
-        return
+        raise SignatureError(f"There is already a function with the name {variable_name}!")
 
     variables.add(variable_name)
     
@@ -71,12 +77,14 @@ def DeleteVariable(variable_name: str, verbose: bool = True) -> None:
     Args:
         variable_name (str): name of the variable to delete
         verbose (bool): if True, will flash messages to website
+
+    Raises:
+        NotFoundError: if there is no variable {variable_name}
     """
     variables = LoadVariables()
 
     if variable_name not in variables:
-        flash(f"ERROR: There is no variable with the name {variable_name}!", category="error")
-        return
+        raise NotFoundError(f"There is no variable with the name {variable_name}!")
 
     variables.remove(variable_name)
     
@@ -84,16 +92,10 @@ def DeleteVariable(variable_name: str, verbose: bool = True) -> None:
     
     if verbose:
         flash(f"Successfully deleted function {variable_name}!")
-        
-    if CheckVariableInTerm(variable_name):
-        DeleteTerms()
+    
+    deleted_terms = DeleteTermsWithSymbol(variable_name)
+    if deleted_terms:
+        flash(f"WARNING: Deleted the terms {', '.join(deleted_terms)} because they use variable {variable_name}!")
 
 def CheckVariableInTerm(var_name: str) -> bool:
-    terms = LoadAllTerms()
-    
-    for _, term in terms.values():
-        flatTerm = FlattenList(term)
-        if var_name in flatTerm:
-            return True
-    
-    return False
+    return bool(LoadTermNamesBySymbol(var_name))
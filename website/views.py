@@ -1,9 +1,42 @@
+import io
 import os
-from flask import Blueprint, render_template, redirect, url_for, request, session, current_app as app
+from flask import Blueprint, Response, render_template, redirect, url_for, request, session, jsonify, g, current_app as app
 from website.backend.backend import *
+from website.backend.jobs import GetJobManager, FINISHED
+from website.backend.trace import LEVELS
+from website.backend.profiling import Profile, StartProfile, StopProfile, GetProfiles, GetProfile
+from website.backend.theories import ReadTheory, FormatTheory, ImportTheory, ExportTheory, GuessTheoryFormat, TRS, JSON_LINES, THEORY_FORMATS
 
 views = Blueprint('views', __name__)
 
+@views.before_request
+def start_profile():
+    # any page can be profiled with ?profile=1 or the header "X-Profile: 1"; the counters are shown on /stats
+    if request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1':
+        g.profile_token = StartProfile(Profile(f"{request.method} {request.path}"))
+
+@views.after_request
+def stop_profile(response):
+    token = g.pop('profile_token', None)
+    if token is not None:
+        response.headers['X-Profile-Id'] = StopProfile(token).id
+    return response
+
+@views.teardown_request
+def stop_failed_profile(error):
+    token = g.pop('profile_token', None) # only left when the request failed before after_request
+    if token is not None:
+        StopProfile(token)
+
+@views.errorhandler(TermRewritingError)
+def term_rewriting_error(error):
+    flash(f"ERROR: {error}", category="error")
+    if request.method == 'POST':
+        return redirect(request.url) # back to the form which was submitted
+    if request.endpoint != 'views.home':
+        return redirect(url_for('views.home')) # the same GET would fail again
+    return render_template("base.html"), 400 # the home page itself failed, so the error is shown on an empty page
+
 @views.route('/', methods=['GET', 'POST'])
 def home():
     # functions = {"f": 2, "e": 0, "i": 1}
@@ -16,9 +49,8 @@ def home():
     functions = LoadFunctions()
     variables = LoadVariables()
     substitutions = LoadSubstitutions()
-    term_name = session["term_name"] if "term_name" in session else ""
-    term_string = session["term_string"] if "term_string" in session else ""
-    term_dictionary = session["terms"] if "terms" in session else {}
+    term_name, term_string = LoadDraftTerm()
+    term_dictionary = LoadAllTerms()
     terms = term_dictionary.keys()
     tree = ""
     term_selected = ""
@@ -120,7 +152,7 @@ def variables():
 def terms():
     functions = LoadFunctions()
     variables = LoadVariables()
-    term_dictionary = session["terms"] if "terms" in session else {}
+    term_dictionary = LoadAllTerms()
     terms = term_dictionary.keys()
     tree = ""
     term_selected = ""
@@ -132,16 +164,12 @@ def terms():
         if request.form.get('display'):
             term_name = request.form.get('term')
             term_selected = term_name
-            tree = LoadTerm(term_name)
-            if tree is not None:
-                tree = tree[1]
+            tree = LoadTerm(term_name)[1]
                 
         if request.form.get('ground'):
             term_name = request.form.get('term')
             term_selected = term_name
-            tree = LoadTerm(term_name)
-            if tree is not None:
-                tree = tree[1]
+            tree = LoadTerm(term_name)[1]
             if tree and IsTermGround(tree):
                 flash("The term \'" + term_name + "\' is ground!")
             elif tree:
@@ -152,8 +180,7 @@ def terms():
 
 @views.route('/createterm', methods=['GET', 'POST'])
 def createterm():
-    term_name = session["term_name"] if "term_name" in session else ""
-    term_string = session["term_string"] if "term_string" in session else ""
+    term_name, term_string = LoadDraftTerm()
     
     if request.method == 'POST':
         if request.form.get('home'):
@@ -161,8 +188,7 @@ def createterm():
         
         term_name = request.form.get('name')
         term_string = request.form.get('string')
-        session["term_name"] = term_name
-        session["term_string"] = term_string
+        SaveDraftTerm(term_name, term_string)
         
         if request.form.get('detect'):
             terms = LoadAllTerms()
@@ -280,13 +306,13 @@ def createterm():
     
     functions = LoadFunctions()
     variables = LoadVariables()
-    term_dictionary = session["terms"] if "terms" in session else {}
+    term_dictionary = LoadAllTerms()
     terms = term_dictionary.keys()
     return render_template("createterm.html", term_name = term_name, term_string = term_string, functions = functions, variables = variables, terms = terms)
 
 @views.route('/replace', methods=['GET', 'POST'])
 def replace():
-    term_dictionary = session["terms"] if "terms" in session else {}
+    term_dictionary = LoadAllTerms()
     terms = term_dictionary.keys()
     tree1 = ""
     term_selected1 = ""
@@ -303,16 +329,11 @@ def replace():
         if request.form.get('display'):
             term_name1 = request.form.get('term1')
             term_selected1 = term_name1
-            tree1 = LoadTerm(term_name1)
-            
-            if tree1 is not None:
-                tree1 = tree1[1]
+            tree1 = LoadTerm(term_name1)[1]
             
             term_name2 = request.form.get('term2')
             term_selected2 = term_name2
-            tree2 = LoadTerm(term_name2)
-            if tree2 is not None:
-                tree2 = tree2[1]
+            tree2 = LoadTerm(term_name2)[1]
             print(term_name1)
                 
         if request.form.get('replace'):
@@ -343,7 +364,7 @@ def replace():
             tree3 = CreateTree(term_string)
             tree3 = ChangeTreeToList(tree3)
             SaveTerm(tree3, term_string, term_name)
-            term_dictionary = session["terms"] if "terms" in session else {}
+            term_dictionary = LoadAllTerms()
             
             
     return render_template("replace.html", terms = terms, term_selected1 = term_selected1, term_selected2 = term_selected2, tree1 = tree1, tree2 = tree2, tree3 = tree3, term_string = term_string, term_name = term_name)
@@ -398,9 +419,10 @@ def unification():
             return redirect(url_for('views.home'))
         
         if request.form.get('unify'):
-            old_substitutions = substitutions
+            unifier = Unification(substitutions, Signature.FromSession())
             
-            substitutions = Unification(substitutions)
+            old_substitutions = substitutions
+            substitutions = unifier
     
     return render_template("unification.html", substitutions = substitutions, old_substitutions = old_substitutions)
 
@@ -409,41 +431,92 @@ def unification():
 def lpo():
     substitutions = LoadSubstitutions()
     old_substitutions = {}
+    functions = LoadFunctions()
+    comparisons = []
     
     if request.method == 'POST':
         if request.form.get('home'):
             return redirect(url_for('views.home'))
         
-        if request.form.get('lpo'):
-            old_substitutions = substitutions
-            new_substitutions = {}
+        if request.form.get('save'):
+            precedences = {}
+            weights = {}
             
-            for input in substitutions:
+            for function in functions:
+                precedence = request.form.get(f"precedence_{function}")
+                weight = request.form.get(f"weight_{function}")
+                
+                if not precedence or not weight or not precedence.lstrip("-").isdigit() or not weight.isdigit():
+                    flash(f"ERROR: The precedence and the weight of {function} must be integers!", category="error")
+                    break
+                
+                precedences[function] = int(precedence)
+                weights[function] = int(weight)
+            else:
+                SavePrecedences(precedences)
+                SaveWeights(weights)
+                if request.form.get("ordering"):
+                    SaveOrderingName(request.form.get("ordering"))
+                
+                try:
+                    LoadOrdering()
+                    flash("Saved the ordering!")
+                except OrderingError as e:
+                    flash(f"ERROR: {e}", category="error")
+        
+        if request.form.get('compare'):
+            try:
+                orderings = [LoadOrdering(name) for name in ORDERINGS]
+            except OrderingError as e:
+                flash(f"ERROR: {e}", category="error")
+                orderings = []
+            
+            for input in substitutions if orderings else []:
                 for output in substitutions[input]:
-                    substitution = (input, output)
-                    term1 = ChangeTreeToList(CreateTree(substitution[0]))
-                    term2 = ChangeTreeToList(CreateTree(substitution[1]))
-                    
-                    if LexicographicPathOrdering(term1, term2) == 1:
-                        str1 = CreateInputStringFromTree(ChangeListToTree(term1))
-                        str2 = CreateInputStringFromTree(ChangeListToTree(term2))
-                        
-                        if str1 in new_substitutions.keys():
-                            new_substitutions[str1].append(str2)
-                        else:
-                            new_substitutions[str1] = [str2]
-                    elif LexicographicPathOrdering(term2, term1) == 1:
-                        str1 = CreateInputStringFromTree(ChangeListToTree(term1))
-                        str2 = CreateInputStringFromTree(ChangeListToTree(term2))
-                        
-                        if str2 in new_substitutions.keys():
-                            new_substitutions[str2].append(str1)
-                        else:
-                            new_substitutions[str2] = [str1]
+                    term1 = ListToTerm(ChangeTreeToList(CreateTree(input)))
+                    term2 = ListToTerm(ChangeTreeToList(CreateTree(output)))
+                    comparisons.append((input, output, [ordering.Compare(term1, term2) for ordering in orderings]))
+        
+        if request.form.get('lpo'):
+            try:
+                ordering = LoadOrdering()
+            except OrderingError as e:
+                flash(f"ERROR: {e}", category="error")
+                ordering = None
+            
+            if ordering is not None:
+                old_substitutions = substitutions
+                new_substitutions = {}
                 
-            substitutions = new_substitutions
+                for input in substitutions:
+                    for output in substitutions[input]:
+                        substitution = (input, output)
+                        term1 = ChangeTreeToList(CreateTree(substitution[0]))
+                        term2 = ChangeTreeToList(CreateTree(substitution[1]))
+                        comparison = ordering.Compare(ListToTerm(term1), ListToTerm(term2))
+                        
+                        if comparison == GREATER:
+                            str1 = CreateInputStringFromTree(ChangeListToTree(term1))
+                            str2 = CreateInputStringFromTree(ChangeListToTree(term2))
+                            
+                            if str1 in new_substitutions.keys():
+                                new_substitutions[str1].append(str2)
+                            else:
+                                new_substitutions[str1] = [str2]
+                        elif comparison == LESS:
+                            str1 = CreateInputStringFromTree(ChangeListToTree(term1))
+                            str2 = CreateInputStringFromTree(ChangeListToTree(term2))
+                            
+                            if str2 in new_substitutions.keys():
+                                new_substitutions[str2].append(str1)
+                            else:
+                                new_substitutions[str2] = [str1]
+                    
+                substitutions = new_substitutions
     
-    return render_template("lpo.html", substitutions = substitutions, old_substitutions = old_substitutions)
+    return render_template("lpo.html", substitutions = substitutions, old_substitutions = old_substitutions, functions = functions,
+                           precedences = LoadPrecedences(), weights = LoadWeights(), orderings = ORDERINGS,
+                           ordering_selected = LoadOrderingName(), comparisons = comparisons)
 
 
 @views.route('/critpair', methods=['GET', 'POST'])
@@ -487,18 +560,24 @@ def critpair():
                 flash("ERROR: You need to select a subterm from the left term!", category="error")
             else:
                 replace_index = int(replace_index)
-                term1 = ChangeTreeToList(CreateTree(input_selected1))
-                term2 = ChangeTreeToList(CreateTree(input_selected2))
+                signature = Signature.FromSession()
+                term1 = ChangeTreeToList(CreateTree(input_selected1, signature))
+                term2 = ChangeTreeToList(CreateTree(input_selected2, signature))
                 replace_position = GetPositionFromListIndex(term1, replace_index)
                 
                 output_selected1 = rule1[(rule1.find(">") + 2):]
                 output_selected2 = rule2[(rule2.find(">") + 2):]
                 
+                # the two rules must not share variables
+                term2, newRule2 = ReplaceCoincidingVariables(GetUniqueVariables(term1, signature), GetUniqueVariables(term2, signature), 
+                                                             term2, (input_selected2, output_selected2), signature)
+                
                 critPair = GetCriticalPair(term1, 
                                             term2,
-                                            (input_selected1, output_selected1),
-                                            (input_selected2, output_selected2),
-                                            replace_position)
+                                            CompileRule((input_selected1, output_selected1), signature),
+                                            CompileRule(newRule2, signature),
+                                            replace_position,
+                                            signature)
                 
                 print(critPair)
                 
@@ -510,35 +589,118 @@ def critpair():
     return render_template("critpair.html", substitutions = substitutionsStr, input_selected1 = rule1, input_selected2 = rule2, tree1 = tree1, tree2 = tree2, critPairRep = critPairRep)
 
 
+def LoadJobManager():
+    return GetJobManager(app.config['JOBS_DATABASE'], app.config['TRACE_DIRECTORY'], LEVELS[app.config['TRACE_LEVEL']],
+                         app.config['JOB_PROCESSES'])
+
+
 @views.route('/complete', methods=['GET', 'POST'])
 def complete():
     substitutions = LoadSubstitutions()
-    rules = []
+    jobs = LoadJobManager()
+    job = jobs.store.Get(session["complete_job"]) if "complete_job" in session else None
+    rules = job["result"] if job and job["result"] else []
     
     if request.method == 'POST':
         if request.form.get('home'):
             return redirect(url_for('views.home'))
         
         if request.form.get('complete'):
+            if request.form.get("ordering"):
+                SaveOrderingName(request.form.get("ordering"))
+            signature = Signature.FromSession()
             new_substitutions = []
             
             for input in substitutions:
                 for output in substitutions[input]:
-                    substitution = (input, output)
+                    substitution = CompileRule((input, output), signature)
                     new_substitutions.append(substitution)
             
-            with open("out.txt", "w+") as f:
-                f.write(f"The input is: {new_substitutions}.\n")
-            res = DetermineCompleteness(new_substitutions, 25)
-            
-            rules = res[1]
-            with open("out.txt", "a") as f:
-                f.write(f"The output is: {rules}.")
-                
-            if res[0] == True:
-                flash(f"Found a convergent Term Rewriting System!")
-            else:
-                flash(f"ERROR: Couldn't find a convergent Term Rewriting System!", category="error")
+            session["complete_job"] = jobs.Submit(new_substitutions, 25, signature, ordering = LoadOrdering(signature = signature),
+                                                  profile = bool(request.form.get('profile')))
+            return redirect(url_for('views.complete'))
+        
+        if request.form.get('cancel') and job is not None:
+            jobs.Cancel(job["id"])
+            return redirect(url_for('views.complete'))
+    
+    return render_template("complete.html", substitutions = substitutions, rules = rules, job = job, finished = FINISHED,
+                           orderings = ORDERINGS, ordering_selected = LoadOrderingName(),
+                           job_profiled = job is not None and GetProfile(job["id"]) is not None)
+
+
+@views.route('/complete/jobs/<job_id>', methods=['GET'])
+def complete_job(job_id):
+    try:
+        return jsonify(LoadJobManager().Get(job_id))
+    except NotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+
+
+@views.route('/complete/jobs/<job_id>/trace', methods=['GET'])
+def complete_job_trace(job_id):
+    jobs = LoadJobManager()
+    try:
+        jobs.Get(job_id)
+    except NotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    
+    trace_path = jobs.TracePath(job_id)
+    if trace_path is None or not os.path.exists(trace_path):
+        return jsonify({"error": f"There is no trace of the completion job {job_id}!"}), 404
+    
+    with open(trace_path) as f:
+        return Response(f.read(), mimetype="application/x-ndjson")
+
+
+@views.route('/complete/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_complete_job(job_id):
+    try:
+        return jsonify(LoadJobManager().Cancel(job_id))
+    except NotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+
+
+@views.route('/stats', methods=['GET'])
+def stats():
+    profile_id = request.args.get('id')
+    if profile_id is None:
+        return jsonify({"profiles": GetProfiles()})
     
-    return render_template("complete.html", substitutions = substitutions, rules = rules)
+    profile = GetProfile(profile_id)
+    if profile is None:
+        return jsonify({"error": f"There is no profile with the id {profile_id}!"}), 404
+    
+    return jsonify(profile)
+
 
+@views.route('/import', methods=['POST'])
+def import_theory():
+    theory_file = request.files.get('theory')
+    
+    if theory_file is None or not theory_file.filename:
+        flash("ERROR: Choose a theory file to import!", category="error")
+        return redirect(url_for('views.home'))
+    
+    try:
+        theory = ReadTheory(io.TextIOWrapper(theory_file.stream, encoding="utf-8"), GuessTheoryFormat(theory_file.filename))
+        counts = ImportTheory(theory)
+    except (TermRewritingError, UnicodeDecodeError) as e:
+        flash(f"ERROR: {e}", category="error")
+        return redirect(url_for('views.home'))
+    
+    flash(f"Successfully imported {theory_file.filename}: " + ", ".join(f"{count} {name}" for name, count in counts.items()) + "!")
+    return redirect(url_for('views.home'))
+
+
+@views.route('/export', methods=['GET'])
+def export_theory():
+    format = request.args.get('format', TRS)
+    
+    if format not in THEORY_FORMATS:
+        return jsonify({"error": f"Unknown theory format {format}! Expected one of {', '.join(THEORY_FORMATS)}."}), 400
+    
+    theory = ExportTheory()
+    mimetype = "application/x-ndjson" if format == JSON_LINES else "text/plain"
+    return Response(FormatTheory(theory, format), mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename=workspace.{format}"})